@@ -1,10 +1,21 @@
 import os
+import json
+import sys
+import shutil
+import tempfile
+import subprocess
 import unittest
+import threading
+import functools
 import pandas as pd
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 import text2term
 from text2term import OntologyTermType
 from text2term import Mapper
 from text2term import OntologyTermCollector
+from text2term import OntologyLoader
+from text2term import OntologyDownloadCache
+from text2term import OntologyTermStore
 
 pd.set_option('display.max_columns', None)
 
@@ -51,6 +62,55 @@ class Text2TermTestSuite(unittest.TestCase):
         caches = text2term.cache_ontology_set(os.path.join("..", "text2term", "resources", "ontologies.csv"))
         assert len(caches) == nr_ontologies_in_registry
 
+    def test_caching_ontology_set_in_parallel(self):
+        nr_ontologies_in_registry = 8
+        # Test caching the set of ontologies specified in resources/ontologies.csv using multiple worker processes
+        errors = {}
+        caches = text2term.cache_ontology_set(os.path.join("..", "text2term", "resources", "ontologies.csv"),
+                                              workers=4, errors=errors)
+        assert len(caches) == nr_ontologies_in_registry and len(errors) == 0
+        assert all(cache.cache_exists() for cache in caches.values())
+
+    def test_caching_ontology_to_cache_folder(self):
+        # Test caching an ontology to a given cache folder, which is written through a temporary folder
+        cache_folder = tempfile.mkdtemp()
+        text2term.set_cache_folder(cache_folder)
+        try:
+            efo_cache = text2term.cache_ontology(ontology_url=self.EFO_URL, ontology_acronym="EFO")
+            assert efo_cache.cache_exists() and os.path.exists(os.path.join(cache_folder, "EFO", "EFO-manifest.json"))
+            assert not any(file_name.endswith(".tmp") for file_name in os.listdir(cache_folder))
+            assert efo_cache.map_terms(["asthma"]).size > 0
+        finally:
+            text2term.set_cache_folder()
+            shutil.rmtree(cache_folder)
+        assert text2term.get_cache_folder() == os.environ.get("TEXT2TERM_CACHE_FOLDER", "cache")
+
+    def test_command_line_with_cache_folder(self):
+        # Test caching an ontology to a given cache folder from the command line, and mapping terms to it
+        work_folder = tempfile.mkdtemp()
+        try:
+            ontology_file = os.path.join(work_folder, "onto.obo")
+            with open(ontology_file, "w") as document:
+                document.write("format-version: 1.2\n\n[Term]\nid: EX:0000001\nname: asthma\n\n[Term]\n"
+                               "id: EX:0000002\nname: food allergy\n")
+            terms_file = os.path.join(work_folder, "terms.txt")
+            with open(terms_file, "w") as terms:
+                terms.write("asthma\nfood allergy\n")
+            cache_folder = os.path.join(work_folder, "cache-folder")
+            output_file = os.path.join(work_folder, "mappings.csv")
+            environment = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.abspath(".."),
+                                                                       os.environ.get("PYTHONPATH", "")]))
+            subprocess.run([sys.executable, os.path.abspath(os.path.join("..", "text2term")), "-s", terms_file,
+                            "-t", ontology_file, "-l", "streaming", "-c", "EXCLI", "-cf", cache_folder,
+                            "-o", output_file],
+                           check=True, cwd=work_folder, env=environment)
+            assert os.path.exists(os.path.join(cache_folder, "EXCLI", "EXCLI-manifest.json"))
+            assert not os.path.exists(os.path.join(work_folder, "cache"))
+            mappings = pd.read_csv(output_file, comment="#")
+            assert list(mappings["Mapped Term Label"]) == ["asthma", "food allergy"]
+        finally:
+            shutil.rmtree(work_folder)
+
     def test_mapping_to_cached_ontology(self):
         self.ensure_cache_exists("EFO", self.EFO_URL)
         # Test mapping a list of terms to EFO loaded from cache
@@ -74,6 +134,52 @@ class Text2TermTestSuite(unittest.TestCase):
         print(f"...{mappings_match}")
         assert mappings_match is True
 
+    def test_updating_cached_ontology(self):
+        # Test that updating a cached ontology to a new version gives the same cache as caching the new version
+        ontology_folder = tempfile.mkdtemp()
+        try:
+            first_version = os.path.join(ontology_folder, "onto-v1.obo")
+            second_version = os.path.join(ontology_folder, "onto-v2.obo")
+            with open(first_version, "w") as document:
+                document.write("format-version: 1.2\n\n[Term]\nid: EX:0000001\nname: disease\n\n[Term]\n"
+                               "id: EX:0000002\nname: asthma\nis_a: EX:0000001\n\n[Term]\nid: EX:0000003\n"
+                               "name: food allergy\nis_a: EX:0000001\n")
+            with open(second_version, "w") as document:
+                document.write("format-version: 1.2\n\n[Term]\nid: EX:0000001\nname: disease\n\n[Term]\n"
+                               "id: EX:0000002\nname: asthma\nsynonym: \"bronchial asthma\" EXACT []\n"
+                               "is_a: EX:0000001\n\n[Term]\nid: EX:0000004\nname: peanut allergy\n"
+                               "is_a: EX:0000001\n")
+            text2term.cache_ontology(first_version, "EXUPDATE", loader=OntologyLoader.STREAMING)
+            text2term.update_cached_ontology("EXUPDATE", second_version)
+            text2term.cache_ontology(second_version, "EXFULL", loader=OntologyLoader.STREAMING)
+            update = text2term.get_cache_manifest("EXUPDATE")["update"]
+            assert update["added_terms"] == 1 and update["removed_terms"] == 1 and update["changed_label_terms"] == 2
+            source_terms = ["bronchial asthma", "peanut allergy", "food allergy", "disease"]
+            for mapper in [Mapper.TFIDF, Mapper.LEVENSHTEIN]:
+                updated_mappings = text2term.map_terms(source_terms, "EXUPDATE", use_cache=True, mapper=mapper)
+                full_mappings = text2term.map_terms(source_terms, "EXFULL", use_cache=True, mapper=mapper)
+                assert updated_mappings.drop(columns=[self.SOURCE_TERM_ID_COLUMN]).equals(
+                    full_mappings.drop(columns=[self.SOURCE_TERM_ID_COLUMN]))
+        finally:
+            text2term.clear_cache("EXUPDATE")
+            text2term.clear_cache("EXFULL")
+            shutil.rmtree(ontology_folder)
+
+    def test_mapping_to_cached_ontology_from_memory(self):
+        # Test that the terms and term mapper of a cached ontology are kept in memory and reused by later mappings
+        text2term.cache_ontology(ontology_url=self.EFO_URL, ontology_acronym="EFO")
+        memory_cache = text2term.get_memory_cache()
+        memory_cache.clear(include_pinned=True)
+        first_mappings = text2term.map_terms(["asthma", "disease location"], "EFO", use_cache=True)
+        second_mappings = text2term.map_terms(["asthma", "disease location"], "EFO", use_cache=True)
+        assert first_mappings.drop(columns=[self.SOURCE_TERM_ID_COLUMN]).equals(
+            second_mappings.drop(columns=[self.SOURCE_TERM_ID_COLUMN]))
+        key = ("EFO", (), "class", False, "tfidf")
+        entries = memory_cache.entries()
+        assert [entry["key"] for entry in entries] == [key] and entries[0]["hits"] == 1 and entries[0]["size"] > 0
+        assert memory_cache.pin(key) and memory_cache.clear() == 0
+        assert memory_cache.clear(include_pinned=True) == 1 and len(memory_cache) == 0
+
     def test_mapping_to_cached_ontology_using_syntactic_mapper(self):
         self.ensure_cache_exists("EFO", self.EFO_URL)
         # Test mapping a list of terms to cached EFO using Jaro-Winkler syntactic similarity metric
@@ -83,6 +189,93 @@ class Text2TermTestSuite(unittest.TestCase):
         print(f"{df}\n")
         assert df.size > 0
 
+    def test_mapping_session(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test mapping batches of terms to cached EFO using a mapping session that loads the ontology only once
+        print("Test mapping batches of terms to cached EFO using a mapping session...")
+        session = text2term.MappingSession("EFO", use_cache=True, term_type=OntologyTermType.ANY)
+        source_terms = ["asthma", "disease location", "food allergy"]
+        mappings_session = session.map(source_terms)
+        print(f"{mappings_session}\n")
+        mappings_efo_cache = text2term.map_terms(source_terms, target_ontology="EFO", use_cache=True,
+                                                 term_type=OntologyTermType.ANY)
+        mappings_match = self.check_df_equals(self.drop_source_term_ids(mappings_session),
+                                              self.drop_source_term_ids(mappings_efo_cache))
+        assert mappings_match is True
+
+        # Test mapping another batch of terms in the same session using a syntactic mapper
+        df = session.map(["protein level", "heart attack"], mapper=Mapper.JARO_WINKLER)
+        print(f"{df}\n")
+        assert df.size > 0
+
+    def test_mapping_candidates_using_syntactic_mapper(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test mapping to cached EFO with a syntactic mapper that scores only candidate terms retrieved by TF-IDF
+        print("Test mapping a list of terms to cached EFO scoring only candidate terms with a syntactic mapper...")
+        source_terms = ["asthma", "disease location", "food allergy", "protein level", "heart attack"]
+        session = text2term.MappingSession(target_ontology="EFO", use_cache=True, term_type=OntologyTermType.ANY)
+        df = session.map(source_terms, mapper=Mapper.LEVENSHTEIN, max_candidates=50)
+        print(f"{df}\n")
+        assert df.size > 0
+        recall = session.candidate_recall(source_terms, max_candidates=50, mapper=Mapper.LEVENSHTEIN)
+        print(f"Recall of 50 candidates: {recall}\n")
+        assert 0 < recall <= 1
+
+    def test_mapping_in_chunks(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test mapping a list of terms to cached EFO one chunk of terms at a time, which yields the same TF-IDF scores
+        # as mapping all terms at once
+        print("Test mapping a list of terms to cached EFO one chunk of terms at a time...")
+        source_terms = ["asthma", "disease location", "food allergy", "protein level", "heart attack"]
+        chunks = list(text2term.map_terms_iter(source_terms, target_ontology="EFO", use_cache=True,
+                                               mapper=Mapper.TFIDF, term_type=OntologyTermType.ANY, chunk_size=2))
+        assert len(chunks) == 3
+        mappings_chunks = pd.concat(chunks, ignore_index=True)
+        print(f"{mappings_chunks}\n")
+        mappings_efo_cache = text2term.map_terms(source_terms, target_ontology="EFO", use_cache=True,
+                                                 mapper=Mapper.TFIDF, term_type=OntologyTermType.ANY)
+        mappings_match = self.check_df_equals(self.drop_source_term_ids(mappings_chunks),
+                                              self.drop_source_term_ids(mappings_efo_cache))
+        assert mappings_match is True
+
+    def test_mapping_duplicate_source_terms(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test mapping a list of terms with repeated terms, which are mapped once and expanded to each source term
+        print("Test mapping a list of terms with repeated terms to cached EFO...")
+        source_terms = ["asthma", "food allergy", "asthma", "Asthma"]
+        source_term_ids = ["ID1", "ID2", "ID3", "ID4"]
+        df = text2term.map_terms(source_terms, target_ontology="EFO", use_cache=True, source_terms_ids=source_term_ids,
+                                 term_type=OntologyTermType.ANY)
+        print(f"{df}\n")
+        assert list(pd.unique(df[self.SOURCE_TERM_ID_COLUMN])) == source_term_ids
+        mapped_curies = df.groupby(self.SOURCE_TERM_ID_COLUMN)[self.MAPPED_TERM_CURIE_COLUMN].apply(list)
+        assert mapped_curies["ID1"] == mapped_curies["ID3"] == mapped_curies["ID4"]
+        assert (df[df[self.SOURCE_TERM_ID_COLUMN] == "ID4"]["Source Term"] == "Asthma").all()
+
+    def test_mapping_duplicate_source_terms_scores(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test that repeated terms get the same TF-IDF scores as when each term is mapped on its own
+        print("Test that mapping repeated terms to cached EFO yields the scores of mapping each term once...")
+        source_terms = ["heart attack", "protein level", "heart attack", "food allergy", "protein level"]
+        df = text2term.map_terms(source_terms, target_ontology="EFO", use_cache=True, mapper=Mapper.TFIDF,
+                                 term_type=OntologyTermType.ANY)
+        print(f"{df}\n")
+        expected_df = pd.concat([text2term.map_terms([term], target_ontology="EFO", use_cache=True, mapper=Mapper.TFIDF,
+                                                     term_type=OntologyTermType.ANY) for term in source_terms],
+                                ignore_index=True)
+        mappings_match = self.check_df_equals(self.drop_source_term_ids(df), self.drop_source_term_ids(expected_df))
+        assert mappings_match is True
+
+    def test_mapping_exact_matches(self):
+        self.ensure_cache_exists("EFO", self.EFO_URL)
+        # Test that source terms matching an ontology term label/synonym, once normalized, are mapped with score 1
+        print("Test mapping terms that exactly match EFO labels, skipping fuzzy scoring for those terms...")
+        df = text2term.map_terms(["asthma", "Asthma!"], target_ontology="EFO", use_cache=True,
+                                 source_terms_ids=["ID1", "ID2"], skip_fuzzy_if_exact=True)
+        print(f"{df}\n")
+        assert set(df[self.SOURCE_TERM_ID_COLUMN]) == {"ID1", "ID2"}
+        assert (df[self.MAPPING_SCORE_COLUMN] == 1).all()
+
     def test_mapping_using_ontology_acronym(self):
         # Test mapping a list of terms by specifying the target ontology acronym, which gets resolved by bioregistry
         print(
@@ -195,6 +388,145 @@ class Text2TermTestSuite(unittest.TestCase):
         terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri], term_type=OntologyTermType.PROPERTY)
         assert len(terms) == expected_nr_properties_with_efo_iri
 
+    def test_term_collector_bulk(self):
+        # Test that collecting terms in bulk from the quadstore gives the same terms as collecting them term by term
+        efo_base_iri = "http://www.ebi.ac.uk/efo/"
+        efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL)
+        bulk_terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri], bulk=True)
+        terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri], bulk=False)
+        assert list(bulk_terms.keys()) == list(terms.keys())
+        for iri, term in terms.items():
+            bulk_term = bulk_terms[iri]
+            assert bulk_term.labels == term.labels and bulk_term.synonyms == term.synonyms
+            assert bulk_term.definitions == term.definitions and bulk_term.deprecated == term.deprecated
+            assert bulk_term.parents == term.parents and bulk_term.restrictions == term.restrictions
+            assert bulk_term.children == term.children and bulk_term.instances == term.instances
+
+    def test_term_collector_lean(self):
+        # Test that the details of lean ontology terms, loaded on first access, are those collected eagerly
+        efo_base_iri = "http://www.ebi.ac.uk/efo/"
+        efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL)
+        terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri])
+        lean_terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri], lean=True)
+        assert list(lean_terms.keys()) == list(terms.keys())
+        for iri, term in terms.items():
+            lean_term = lean_terms[iri]
+            assert lean_term.labels == term.labels and lean_term.synonyms == term.synonyms
+            assert lean_term.definitions == term.definitions and lean_term.deprecated == term.deprecated
+            assert lean_term.parents == term.parents and lean_term.restrictions == term.restrictions
+            assert lean_term.children == term.children and lean_term.instances == term.instances
+        efo_term_collector.close()
+
+    def test_term_collector_persistent_world(self):
+        # Test that reopening the persistent world of an ontology gives the same terms as parsing the ontology
+        efo_base_iri = "http://www.ebi.ac.uk/efo/"
+        world_folder = tempfile.mkdtemp()
+        try:
+            efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL, world_folder=world_folder)
+            parsed_terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri])
+            efo_term_collector.close()
+            assert len([file_name for file_name in os.listdir(world_folder) if file_name.endswith(".sqlite3")]) == 1
+            efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL, world_folder=world_folder)
+            reopened_terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri])
+            efo_term_collector.close()
+            assert list(reopened_terms.keys()) == list(parsed_terms.keys())
+            for iri, term in parsed_terms.items():
+                assert reopened_terms[iri].labels == term.labels and reopened_terms[iri].synonyms == term.synonyms
+                assert reopened_terms[iri].parents == term.parents and reopened_terms[iri].children == term.children
+        finally:
+            shutil.rmtree(world_folder)
+
+    def test_term_collector_streaming_loader(self):
+        # Test that streaming the terms of an ontology gives the same term details needed for mapping as loading it
+        efo_base_iri = "http://www.ebi.ac.uk/efo/"
+        efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL)
+        terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri])
+        efo_term_collector.close()
+        efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL, loader=OntologyLoader.STREAMING)
+        streamed_terms = efo_term_collector.get_ontology_terms(base_iris=[efo_base_iri])
+        assert set(streamed_terms.keys()) == set(terms.keys())
+        for iri, term in terms.items():
+            streamed_term = streamed_terms[iri]
+            assert streamed_term.labels == set(map(str, term.labels))
+            assert streamed_term.synonyms == set(map(str, term.synonyms))
+            assert streamed_term.parents.keys() == term.parents.keys()
+            assert streamed_term.deprecated == term.deprecated
+
+    def test_term_store(self):
+        # Test that the ontology terms read from a term store are those written to it, filtered likewise
+        efo_base_iri = "http://www.ebi.ac.uk/efo/"
+        efo_term_collector = OntologyTermCollector(ontology_iri=self.EFO_URL)
+        terms = efo_term_collector.get_ontology_terms()
+        efo_term_collector.close()
+        store_folder = tempfile.mkdtemp()
+        try:
+            OntologyTermStore.save(terms, store_folder)
+            stored_terms = OntologyTermStore(store_folder).get_ontology_terms(
+                base_iris=[efo_base_iri], exclude_deprecated=True, term_type=OntologyTermType.CLASS)
+            filtered_terms = text2term.filter_terms(terms, (efo_base_iri,), True, OntologyTermType.CLASS)
+            assert list(stored_terms.keys()) == list(filtered_terms.keys())
+            for iri, term in filtered_terms.items():
+                stored_term = stored_terms[iri]
+                assert stored_term.labels == set(map(str, term.labels))
+                assert stored_term.synonyms == set(map(str, term.synonyms))
+                assert stored_term.definitions == set(map(str, term.definitions))
+                assert stored_term.parents == {parent: str(label) for parent, label in term.parents.items()}
+                assert stored_term.children == {child: str(label) for child, label in term.children.items()}
+                assert stored_term.deprecated == term.deprecated and stored_term.term_type == term.term_type
+        finally:
+            shutil.rmtree(store_folder)
+
+    def test_download_cache(self):
+        # Test that a cached ontology document is revalidated with the server, and downloaded again once it changes
+        server_folder = tempfile.mkdtemp()
+        download_folder = tempfile.mkdtemp()
+        response_codes = []
+
+        class RequestHandler(SimpleHTTPRequestHandler):
+            def log_request(self, code='-', size='-'):
+                response_codes.append(int(code))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                     functools.partial(RequestHandler, directory=server_folder))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            document_file = os.path.join(server_folder, "onto.obo")
+            with open(document_file, "w") as document:
+                document.write("format-version: 1.2\n\n[Term]\nid: EX:0000001\nname: asthma\n")
+            url = "http://127.0.0.1:%i/onto.obo" % server.server_address[1]
+            download_cache = OntologyDownloadCache(download_folder)
+            local_copy = download_cache.get_document(url)
+            assert local_copy.endswith(".obo") and download_cache.get_document(url) == local_copy
+            assert response_codes == [200, 304]
+            with open(document_file, "a") as document:
+                document.write("\n[Term]\nid: EX:0000002\nname: food allergy\n")
+            os.utime(document_file, (os.path.getmtime(document_file) + 10,) * 2)
+            new_local_copy = download_cache.get_document(url)
+            assert new_local_copy != local_copy and not os.path.exists(local_copy)
+            assert response_codes == [200, 304, 200]
+            term_collector = OntologyTermCollector(ontology_iri=url, loader=OntologyLoader.STREAMING,
+                                                   download_folder=download_folder)
+            terms = term_collector.get_ontology_terms()
+            assert len(terms) == 2 and response_codes == [200, 304, 200, 304]
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(server_folder)
+            shutil.rmtree(download_folder)
+
+    def test_cache_manifest(self):
+        # Test that a cached ontology records its manifest, and is rebuilt when its manifest shows it is stale
+        efo_cache = text2term.cache_ontology(ontology_url=self.EFO_URL, ontology_acronym="EFO")
+        manifest = efo_cache.manifest()
+        assert manifest["source"] == self.EFO_URL and manifest["ontology_iri"] == "http://www.ebi.ac.uk/efo/efo.owl"
+        assert manifest["version_iri"] is not None and manifest["term_count"] > 0
+        manifest["text2term_version"] = "0.0.0"
+        with open(os.path.join(text2term.get_cache_folder(), "EFO", "EFO-manifest.json"), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        mappings = efo_cache.map_terms(["asthma"])
+        assert mappings.size > 0
+        assert text2term.get_cache_manifest("EFO")["text2term_version"] == text2term.config.VERSION
+
     def test_mapping_with_min_score_filter(self):
         self.ensure_cache_exists("EFO", self.EFO_URL)
         min_score = 0.6
@@ -215,6 +547,15 @@ class Text2TermTestSuite(unittest.TestCase):
                                        term_type=OntologyTermType.ANY, min_score=min_score)
         assert (df_leven[self.MAPPING_SCORE_COLUMN] >= min_score).all()
 
+        print("Test mapping to cached EFO using Jaccard similarity metric and min_score filter...")
+        df_jaccard = text2term.map_terms(search_terms, target_ontology="EFO", use_cache=True, mapper=Mapper.JACCARD,
+                                         term_type=OntologyTermType.ANY, min_score=min_score)
+        df_jaccard_all = text2term.map_terms(search_terms, target_ontology="EFO", use_cache=True,
+                                             mapper=Mapper.JACCARD, term_type=OntologyTermType.ANY, min_score=0)
+        df_jaccard_all = df_jaccard_all[df_jaccard_all[self.MAPPING_SCORE_COLUMN] >= min_score]
+        assert self.check_df_equals(self.drop_source_term_ids(df_jaccard).reset_index(drop=True),
+                                    self.drop_source_term_ids(df_jaccard_all).reset_index(drop=True))
+
     def test_mapping_with_min_score_filter_empty_results(self):
         self.ensure_cache_exists("EFO", self.EFO_URL)
         print("Test mapping to EFO using TFIDF similarity metric and min_score filter that results in no mappings...")
@@ -1,13 +1,25 @@
 from .t2t import map_terms
+from .t2t import map_terms_iter
 from .t2t import cache_ontology
+from .t2t import update_cached_ontology
+from .mapping_session import MappingSession
 from .onto_cache import cache_ontology_set
 from .onto_cache import cache_exists
 from .onto_cache import clear_cache
+from .onto_cache import get_cache_manifest
+from .onto_cache import set_cache_folder
+from .onto_cache import get_cache_folder
 from .mapper import Mapper
 from .preprocess import preprocess_terms
 from .preprocess import preprocess_tagged_terms
 from .tagged_term import TaggedTerm
 from .term_collector import OntologyTermCollector
 from .term_collector import filter_terms
+from .term_streamer import OntologyTermStreamer
+from .term_store import OntologyTermStore
+from .ontology_loader import OntologyLoader
+from .download_cache import OntologyDownloadCache
+from .memory_cache import OntologyMemoryCache
+from .memory_cache import get_memory_cache
 from .term import OntologyTermType
 from .term import OntologyTerm
@@ -2,8 +2,10 @@ import argparse
 import os
 import sys
 from t2t import map_terms, cache_ontology
-from onto_cache import cache_exists
+# the cache module used by t2t (a top-level 'onto_cache' import would be another copy, whose cache folder t2t ignores)
+from t2t import onto_cache
 from mapper import Mapper
+from ontology_loader import OntologyLoader
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='A tool for mapping free-text descriptions of (biomedical) '
@@ -44,26 +46,53 @@ if __name__ == "__main__":
                         help="Include all unmapped terms in the output")
     parser.add_argument('-bp', "--bioportal_apikey", required=False, type=str, default="",
                         help="BioPortal API Key to use along with the BioPortal mapper option")
+    parser.add_argument('-j', "--n_jobs", required=False, type=int, default=1,
+                        help="Number of threads used by the TF-IDF and syntactic mappers to compute mapping scores "
+                             "(-1 to use all processors; default=1)")
+    parser.add_argument('-ex', "--skip_fuzzy_if_exact", required=False, default=False, action="store_true",
+                        help="Map source terms that exactly match an ontology term label or synonym only to the "
+                             "exactly matching ontology terms (default=False)")
+    parser.add_argument('-cand', "--max_candidates", required=False, type=int, default=0,
+                        help="Number of candidate ontology terms, retrieved by TF-IDF score, that syntactic mappers "
+                             "score per source term (default=0, to score all ontology terms)")
+    parser.add_argument('-wf', "--world_folder", required=False, type=str, default=None,
+                        help="Folder of persistent owlready2 worlds, where the target ontology is parsed once and "
+                             "reopened by later runs instead of being parsed again")
+    parser.add_argument('-l', "--loader", required=False, type=str, default="owlready2",
+                        help="Way of reading the terms of the target ontology. One of: " + str(OntologyLoader.list()) +
+                             " (default=owlready2)")
+    parser.add_argument('-df', "--download_folder", required=False, type=str, default=None,
+                        help="Folder of downloaded ontology documents, where a target ontology given by URL is "
+                             "downloaded once and revalidated by later runs instead of being downloaded again")
+    parser.add_argument('-cf', "--cache_folder", required=False, type=str, default=None,
+                        help="Folder of the ontology cache (default is the folder given by the TEXT2TERM_CACHE_FOLDER "
+                             "environment variable, or else 'cache' in the current working directory)")
 
     arguments = parser.parse_args()
     if not os.path.exists(arguments.source):
         parser.error("The file '{}' does not exist".format(arguments.source))
         sys.exit(1)
     mapper = Mapper(arguments.mapper)
+    loader = OntologyLoader(arguments.loader)
     iris = arguments.base_iris
     if len(iris) > 0:
         iris = tuple(iris.split(','))
     csv_columns = arguments.csv_input
     if len(csv_columns) > 0:
         csv_columns = tuple(csv_columns.split(','))
+    if arguments.cache_folder is not None:
+        onto_cache.set_cache_folder(arguments.cache_folder)
     target = arguments.target
     acronym = arguments.store_in_cache
     if acronym != "":
-        cache_ontology(target, acronym, iris)
+        cache_ontology(target, acronym, iris, world_folder=arguments.world_folder, loader=loader,
+                       download_folder=arguments.download_folder)
         target = acronym
     map_terms(arguments.source, target, output_file=arguments.output, csv_columns=csv_columns,
               excl_deprecated=arguments.excl_deprecated, mapper=mapper, max_mappings=arguments.top_mappings,
               min_score=arguments.min_score, base_iris=iris, save_graphs=arguments.save_term_graphs,
-              save_mappings=True, separator=arguments.separator, use_cache=cache_exists(target),
+              save_mappings=True, separator=arguments.separator, use_cache=onto_cache.cache_exists(target),
               term_type=arguments.term_type, incl_unmapped=arguments.incl_unmapped,
-              bioportal_apikey=arguments.bioportal_apikey)
+              bioportal_apikey=arguments.bioportal_apikey, n_jobs=arguments.n_jobs,
+              skip_fuzzy_if_exact=arguments.skip_fuzzy_if_exact, max_candidates=arguments.max_candidates,
+              world_folder=arguments.world_folder, loader=loader, download_folder=arguments.download_folder)
@@ -0,0 +1,148 @@
+"""Provides OntologyDownloadCache class"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import requests
+from urllib.parse import urlparse
+from text2term import onto_utils
+
+CHUNK_SIZE = 1 << 20
+REQUEST_TIMEOUT = 60
+
+_DOCUMENT_SUFFIX = re.compile(r"(\.[A-Za-z0-9]{1,8}){1,2}$")
+
+
+class OntologyDownloadCache:
+
+    def __init__(self, cache_folder, log_level=logging.INFO):
+        """
+        Construct a download cache of ontology documents in the given folder. Documents are stored under the SHA-256
+        hash of their content, and each downloaded URL has a record of the document it resolved to along with the
+        ETag and Last-Modified validators sent by the server. Processes that share the cache folder lock each URL
+        while downloading it, and documents and records are written to temporary files that are then renamed, so a
+        document is never read while it is partially written
+        :param cache_folder: Folder of the downloaded ontology documents
+        """
+        self.logger = onto_utils.get_logger(__name__, level=log_level)
+        self.cache_folder = cache_folder
+        self._documents_folder = os.path.join(cache_folder, "documents")
+        self._records_folder = os.path.join(cache_folder, "urls")
+        os.makedirs(self._documents_folder, exist_ok=True)
+        os.makedirs(self._records_folder, exist_ok=True)
+
+    def get_document(self, url):
+        """
+        Get the local copy of the ontology document at the given URL, downloading it if it is not in the cache. A
+        cached document is revalidated with the server, using a conditional request, when the server sent an ETag or
+        Last-Modified validator for it, and downloaded again only if it has changed. The cached document is used as is
+        when the server sent no validators, or when it cannot be reached
+        :param url: HTTP(S) URL of the ontology document
+        :return: Path of the local copy of the ontology document
+        """
+        url_key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        record_file = os.path.join(self._records_folder, url_key + ".json")
+        with onto_utils.lock_file(record_file + ".lock"):
+            record = self._read_record(record_file)
+            if record is not None and not os.path.exists(self._get_document_file(record)):
+                self.logger.info("Cached document of %s is missing; downloading it again", url)
+                record = None
+            if record is None:
+                self.logger.info("Downloading ontology document %s...", url)
+                return self._download(url, record_file, dict(), None)
+            headers = dict()
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+            if len(headers) == 0:
+                self.logger.info("Using cached document of %s (the server sent no validators)", url)
+                return self._get_document_file(record)
+            self.logger.info("Revalidating cached document of %s...", url)
+            try:
+                return self._download(url, record_file, headers, record)
+            except requests.RequestException as err:
+                self.logger.warning("...unable to revalidate cached document (%s); using the cached document", err)
+                return self._get_document_file(record)
+
+    def _download(self, url, record_file, headers, record):
+        """
+        Request the document at the given URL with the given (conditional request) headers, and store the document
+        in the cache unless the server responds that the cached document given by the record has not been modified
+        """
+        start = time.time()
+        with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            if response.status_code == 304 and record is not None:
+                self.logger.info("...cached document is up to date")
+                return self._get_document_file(record)
+            response.raise_for_status()
+            content_hash, temp_file = self._write_document(response)
+            suffix = _DOCUMENT_SUFFIX.search(os.path.basename(urlparse(url).path))
+            document_file = os.path.join(self._documents_folder,
+                                         content_hash + ("" if suffix is None else suffix.group(0)))
+            new_record = {"url": url, "sha256": content_hash, "file": os.path.basename(document_file),
+                          "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                          "downloaded": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        # documents are shared by the URLs whose content is the same, so a document is stored (or removed) only while
+        # holding the lock of the documents folder
+        with onto_utils.lock_file(os.path.join(self._documents_folder, ".lock")):
+            os.replace(temp_file, document_file)
+            onto_utils.write_atomically(record_file, json.dumps(new_record, indent=1).encode("utf-8"))
+            if record is not None and record["file"] != new_record["file"]:
+                self._remove_unused_document(record)
+        end = time.time()
+        self.logger.info("...done: stored document %s (download time: %.2fs)", new_record["file"], end - start)
+        return document_file
+
+    def _write_document(self, response):
+        """
+        Write the body of the given response to a temporary file in the documents folder while hashing it
+        :return: SHA-256 hash of the document and path of the temporary file
+        """
+        digest = hashlib.sha256()
+        file_descriptor, temp_file = tempfile.mkstemp(dir=self._documents_folder, suffix=".part")
+        try:
+            with os.fdopen(file_descriptor, "wb") as document:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    document.write(chunk)
+        except BaseException:
+            os.remove(temp_file)
+            raise
+        return digest.hexdigest(), temp_file
+
+    def _remove_unused_document(self, record):
+        """
+        Remove the cached document of the given (superseded) record if no other URL record refers to it
+        """
+        for file_name in os.listdir(self._records_folder):
+            if file_name.endswith(".json"):
+                other_record = self._read_record(os.path.join(self._records_folder, file_name))
+                if other_record is not None and other_record["file"] == record["file"]:
+                    return
+        self.logger.info("...removing superseded document %s", record["file"])
+        try:
+            os.remove(self._get_document_file(record))
+        except FileNotFoundError:
+            pass
+
+    def _read_record(self, record_file):
+        try:
+            with open(record_file, "r") as record:
+                return json.load(record)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self.logger.warning("Ignoring unreadable download cache record %s", record_file)
+            return None
+
+    def _get_document_file(self, record):
+        return os.path.join(self._documents_folder, record["file"])
+
+
+def is_url(ontology_iri):
+    return urlparse(ontology_iri).scheme in ("http", "https")
@@ -0,0 +1,48 @@
+"""Provides ExactMapper class"""
+
+import logging
+import numpy as np
+from text2term import onto_utils
+from text2term.label_index import LabelIndex
+from text2term.term_mapping import TermMappingCollection
+
+EXACT_MATCH_SCORE = 1.0
+
+
+class ExactMapper:
+
+    def __init__(self, target_ontology_terms, index=None):
+        """
+        :param target_ontology_terms: Collection of ontology terms to be mapped against
+        :param index: Index of the normalized labels and synonyms previously built for (a superset of) the given
+                        ontology terms, e.g. the index stored in the ontology cache. If not given, the index is built
+                        from the given ontology terms
+        """
+        self.logger = onto_utils.get_logger(__name__, logging.INFO)
+        self.target_ontology_terms = target_ontology_terms
+        if index is None:
+            index = LabelIndex(target_ontology_terms, normalize=onto_utils.normalize)
+        self.index, _ = index.subset(target_ontology_terms)
+
+    def map(self, source_terms, source_terms_ids, max_mappings=3):
+        """
+        Map the given source terms to the ontology terms that have a label or synonym identical to the source term,
+        once both are normalized. Exact mappings have a mapping score of 1
+        :param source_terms: List of source terms to be mapped with ontology terms
+        :param source_terms_ids: List of identifiers for the given source terms
+        :param max_mappings: The maximum number of ontology term mappings that should be returned per source term
+        :return: Data frame containing the exact mappings, and a boolean array indicating the source terms mapped
+        """
+        label_positions = self.index.find(source_terms)
+        is_mapped = label_positions >= 0
+        mapped_rows = np.flatnonzero(is_mapped)
+        positions, terms = self.index.label_terms(label_positions[mapped_rows])
+        rows = mapped_rows[positions]
+        # keep the first 'max_mappings' ontology terms of each source term
+        row_starts = np.searchsorted(rows, rows)
+        top = (np.arange(len(rows)) - row_starts) < max_mappings
+        rows, terms = rows[top], terms[top]
+        mappings_df = TermMappingCollection.from_arrays(self.target_ontology_terms, source_terms, source_terms_ids,
+                                                        rows, np.asarray(self.index.term_iris, dtype=object)[terms],
+                                                        np.full(len(rows), EXACT_MATCH_SCORE))
+        return mappings_df, is_mapped
@@ -0,0 +1,77 @@
+"""Provides JaccardIndex class"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class JaccardIndex:
+
+    def __init__(self, labels, ngram_length=1):
+        """
+        Build a binary matrix of the character sets (or character n-gram sets) of the given labels/synonyms, so that the
+        Jaccard similarities of a batch of source terms and all labels are computed at once by a sparse product
+        :param labels: List of labels/synonyms
+        :param ngram_length: The length of the character n-grams in the set of each string. The default length 1 uses
+                                the set of characters of each string. Strings shorter than the n-gram length are used as
+                                their only n-gram
+        """
+        self.ngram_length = ngram_length
+        self.vocabulary = dict()
+        self.label_matrix, self.label_set_sizes = self._transform(labels, add_features=True)
+        self._label_matrix_t = self.label_matrix.transpose().tocsr()
+
+    def scores(self, source_terms):
+        """
+        Compute the Jaccard similarities of the given source terms and all labels/synonyms in this index
+        :param source_terms: List of source terms
+        :return: Sparse matrix with one row per source term and one column per label, which contains the similarities
+                    of the pairs that share at least one character (n-gram); all other pairs have a similarity of 0
+        """
+        source_mtx, source_set_sizes = self._transform(source_terms)
+        intersections = (source_mtx @ self._label_matrix_t).tocoo()
+        unions = source_set_sizes[intersections.row] + self.label_set_sizes[intersections.col] - intersections.data
+        return csr_matrix((intersections.data / unions, (intersections.row, intersections.col)),
+                          shape=intersections.shape, dtype=np.float64)
+
+    def pair_scores(self, source_terms, rows, labels):
+        """
+        Compute the Jaccard similarity of each (source term, label/synonym) pair, given by source term rows and label
+        positions
+        :param source_terms: List of source terms
+        :param rows: Array of positions in the given source terms
+        :param labels: Array of label positions in this index
+        :return: Array containing the similarity of each pair
+        """
+        source_mtx, source_set_sizes = self._transform(source_terms)
+        intersections = np.asarray(source_mtx[rows].multiply(self.label_matrix[labels]).sum(axis=1)).ravel()
+        unions = source_set_sizes[rows] + self.label_set_sizes[labels] - intersections
+        return np.divide(intersections, unions, out=np.zeros(len(rows), dtype=np.float64), where=unions > 0)
+
+    def _transform(self, strings, add_features=False):
+        """
+        Encode the character (n-gram) sets of the given strings as rows of a binary matrix over the vocabulary of this
+        index. Features that are not in the vocabulary are left out of the matrix, but are counted in the set sizes
+        :return: Pair containing the binary matrix and an array with the size of the set of each string
+        """
+        indptr, indices = [0], []
+        set_sizes = np.zeros(len(strings), dtype=np.int64)
+        for position, string in enumerate(strings):
+            features = self._get_features(string)
+            set_sizes[position] = len(features)
+            for feature in features:
+                if add_features:
+                    indices.append(self.vocabulary.setdefault(feature, len(self.vocabulary)))
+                elif feature in self.vocabulary:
+                    indices.append(self.vocabulary[feature])
+            indptr.append(len(indices))
+        indices = np.asarray(indices, dtype=np.int32)
+        matrix = csr_matrix((np.ones(len(indices), dtype=np.int32), indices, np.asarray(indptr, dtype=np.int64)),
+                            shape=(len(strings), len(self.vocabulary)))
+        return matrix, set_sizes
+
+    def _get_features(self, string):
+        if self.ngram_length == 1:
+            return set(string)
+        if len(string) < self.ngram_length:
+            return {string} if len(string) > 0 else set()
+        return {string[start:start + self.ngram_length] for start in range(len(string) - self.ngram_length + 1)}
@@ -0,0 +1,187 @@
+"""Provides LabelIndex class"""
+
+import copy
+import pickle
+import logging
+import numpy as np
+from text2term import onto_utils
+
+
+class LabelIndex:
+
+    def __init__(self, ontology_terms, normalize=None, term_labels=None):
+        """
+        Build a table of the distinct labels and synonyms of the given ontology terms, along with a postings list of
+        the ontology terms that own each label/synonym
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :param normalize: Function applied to the labels/synonyms before they are deduplicated (e.g., to collapse case
+                            and punctuation variants). If None, labels/synonyms are deduplicated as they are
+        :param term_labels: Dictionary of ontology term IRIs and the (normalized) labels/synonyms of those terms, which
+                            are used instead of the labels/synonyms of those terms in the given ontology terms
+        """
+        self.logger = onto_utils.get_logger(__name__, logging.INFO)
+        self.normalize = normalize
+        self.term_iris = list(ontology_terms.keys())
+        if term_labels is None:
+            term_labels = dict()
+        label_positions = dict()
+        label_postings = []
+        for term_position, (iri, term) in enumerate(ontology_terms.items()):
+            labels = term_labels.get(iri)
+            if labels is None:
+                labels = self._get_term_labels(term)
+                if normalize is not None:
+                    labels = map(normalize, labels)
+            for label in labels:
+                if len(label) == 0:
+                    continue
+                if label not in label_positions:
+                    label_positions[label] = len(label_postings)
+                    label_postings.append([])
+                postings = label_postings[label_positions[label]]
+                if len(postings) == 0 or postings[-1] != term_position:
+                    postings.append(term_position)
+        self.labels = list(label_positions.keys())
+        self.label_positions = label_positions
+        self.postings_indptr = np.zeros(len(self.labels) + 1, dtype=np.int64)
+        np.cumsum([len(postings) for postings in label_postings], out=self.postings_indptr[1:])
+        self.postings = np.fromiter((term for postings in label_postings for term in postings), dtype=np.int64,
+                                    count=self.postings_indptr[-1])
+        self._set_posting_labels()
+
+    @property
+    def label_count(self):
+        return len(self.labels)
+
+    @property
+    def term_count(self):
+        return len(self.term_iris)
+
+    def find(self, labels):
+        """
+        Find the given labels in this index, after normalizing them with the normalization function of this index
+        :param labels: List of labels to be found
+        :return: Array containing the position of each given label in this index, or -1 if the label is not found
+        """
+        nr_labels = len(labels)
+        if self.normalize is not None:
+            labels = (self.normalize(label) for label in labels)
+        return np.fromiter((self.label_positions.get(label, -1) for label in labels), dtype=np.int64,
+                           count=nr_labels)
+
+    def label_terms(self, label_indices):
+        """
+        Expand the given label positions into the positions of the ontology terms that own each label
+        :param label_indices: Array of label positions
+        :return: Pair of arrays: for each (label, term) pair, the position in the given array and the term position
+        """
+        return _expand(self.postings_indptr, self.postings, label_indices)
+
+    def term_labels(self, term_indices):
+        """
+        Expand the given ontology term positions into the positions of the labels/synonyms of each term
+        :param term_indices: Array of ontology term positions
+        :return: Pair of arrays: for each (term, label) pair, the position in the given array and the label position
+        """
+        return _expand(self._term_postings_indptr, self.posting_labels[self._term_postings_order], term_indices)
+
+    def term_scores(self, label_scores):
+        """
+        Aggregate the given label scores into ontology term scores, where the score of a term is the maximum score of
+        its labels/synonyms (or 0 if the term has no labels)
+        :param label_scores: Array containing a score for each label, or a matrix with a row of label scores per
+                                source term
+        :return: Array (or matrix) containing a score for each ontology term
+        """
+        label_scores = np.asarray(label_scores)
+        scores = np.zeros(label_scores.shape[:-1] + (self.term_count,), dtype=np.float64)
+        if len(self.postings) > 0:
+            term_postings = label_scores[..., self.posting_labels[self._term_postings_order]]
+            scores[..., self._labeled_terms] = np.maximum.reduceat(term_postings, self._term_postings_starts, axis=-1)
+        return scores
+
+    def subset(self, ontology_terms):
+        """
+        Get an index restricted to the given ontology terms. Labels owned only by other terms are dropped
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :return: Pair containing the restricted LabelIndex and a boolean array that indicates the labels kept
+        """
+        kept_terms = np.fromiter((iri in ontology_terms for iri in self.term_iris), dtype=bool,
+                                 count=len(self.term_iris))
+        if kept_terms.all():
+            return self, np.ones(self.label_count, dtype=bool)
+        new_term_positions = np.cumsum(kept_terms) - 1
+        kept_postings = kept_terms[self.postings]
+        label_counts = np.bincount(self.posting_labels[kept_postings], minlength=self.label_count)
+        kept_labels = label_counts > 0
+        index = copy.copy(self)
+        index.term_iris = [iri for iri, keep in zip(self.term_iris, kept_terms) if keep]
+        index.labels = [label for label, keep in zip(self.labels, kept_labels) if keep]
+        index.label_positions = {label: position for position, label in enumerate(index.labels)}
+        index.postings = new_term_positions[self.postings[kept_postings]]
+        index.postings_indptr = np.zeros(len(index.labels) + 1, dtype=np.int64)
+        np.cumsum(label_counts[kept_labels], out=index.postings_indptr[1:])
+        index._set_posting_labels()
+        return index, kept_labels
+
+    def update(self, ontology_terms, changed_iris):
+        """
+        Build the index of the given ontology terms, which are a new version of the ontology terms of this index. The
+        (normalized) labels/synonyms of the terms of this index that are not among the given changed terms are reused
+        rather than normalized again
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :param changed_iris: Set of the IRIs of the ontology terms whose labels or synonyms have changed
+        :return: LabelIndex
+        """
+        term_positions, label_indices = self.term_labels(np.arange(self.term_count))
+        label_bounds = np.searchsorted(term_positions, np.arange(self.term_count + 1)).tolist()
+        label_indices = label_indices.tolist()
+        term_labels = dict()
+        for position, iri in enumerate(self.term_iris):
+            if iri not in changed_iris:
+                labels = label_indices[label_bounds[position]:label_bounds[position + 1]]
+                term_labels[iri] = [self.labels[label] for label in labels]
+        return LabelIndex(ontology_terms, normalize=self.normalize, term_labels=term_labels)
+
+    def save(self, file_path):
+        with open(file_path, 'wb+') as out_file:
+            pickle.dump(self, out_file)
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, 'rb') as in_file:
+            return pickle.load(in_file)
+
+    def _set_posting_labels(self):
+        # the label position of each posting
+        self.posting_labels = np.repeat(np.arange(self.label_count), np.diff(self.postings_indptr))
+        # the postings ordered by term, and the start of the postings of each term (and of each term that has labels)
+        self._term_postings_order = np.argsort(self.postings, kind='stable')
+        self._term_postings_indptr = np.zeros(self.term_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.postings, minlength=self.term_count), out=self._term_postings_indptr[1:])
+        self._labeled_terms = np.flatnonzero(np.diff(self._term_postings_indptr))
+        self._term_postings_starts = self._term_postings_indptr[self._labeled_terms]
+
+    def _get_term_labels(self, ontology_term):
+        for label in ontology_term.labels:
+            if not isinstance(label, str):
+                self.logger.debug(f"ontology term label {label} is not a string")
+            else:
+                yield label
+        for synonym in ontology_term.synonyms:
+            if not isinstance(synonym, str):
+                self.logger.debug(f"ontology term synonym {synonym} is not a string")
+            else:
+                yield synonym
+
+
+def _expand(indptr, values, indices):
+    """
+    Expand the given indices into their values, where the values of index i are values[indptr[i]:indptr[i+1]]
+    :return: Pair of arrays: for each value, the position of its index in the given indices, and the value
+    """
+    starts = indptr[indices]
+    counts = indptr[np.asarray(indices) + 1] - starts
+    positions = np.repeat(np.arange(len(indices)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return positions, values[np.repeat(starts, counts) + offsets]
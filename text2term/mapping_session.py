@@ -0,0 +1,122 @@
+"""Provides MappingSession class"""
+
+import logging
+from text2term import onto_utils
+from text2term import t2t
+from text2term.exact_mapper import ExactMapper
+from text2term.mapper import Mapper
+from text2term.ontology_loader import OntologyLoader
+from text2term.term import OntologyTermType
+
+
+class MappingSession:
+
+    def __init__(self, target_ontology, base_iris=(), excl_deprecated=False, term_type=OntologyTermType.CLASS,
+                 use_cache=False, world_folder=None, loader=OntologyLoader.OWLREADY2,
+                 download_folder=None):
+        """
+        Load the given target ontology once, to map multiple batches of source terms to it. The term mappers (and
+        their indexes) are built on first use and kept for subsequent batches
+        :param target_ontology: Filepath or URL of the 'target' ontology to map the source terms to, or the name of
+                                a previously cached ontology
+        :param base_iris: Map only to ontology terms whose IRIs start with one of the strings given in this tuple
+        :param excl_deprecated: Exclude ontology terms stated as deprecated via `owl:deprecated true`
+        :param term_type: The type(s) of ontology terms to map to, which can be 'class' or 'property' or 'any'
+        :param use_cache: Use a previously cached ontology
+        :param world_folder: Folder of persistent owlready2 worlds, where the target ontology is parsed once and
+                                reopened by later sessions (see `map_terms`)
+        :param loader: Way of reading the terms of the target ontology, which can be 'owlready2' or 'streaming' (see
+                        `map_terms`)
+        :param download_folder: Folder of downloaded ontology documents, where a target ontology given by URL is
+                                downloaded once and revalidated by later sessions (see `map_terms`)
+        """
+        self.logger = onto_utils.get_logger(__name__, logging.INFO)
+        self._target_ontology = target_ontology
+        self._base_iris = base_iris
+        self._excl_deprecated = excl_deprecated
+        self._term_type = term_type
+        self._use_cache = use_cache
+        self._ontology_terms = t2t._load_ontology(target_ontology, base_iris, excl_deprecated, use_cache, term_type,
+                                                  world_folder=world_folder, loader=loader,
+                                                  download_folder=download_folder)
+        self._term_mappers = dict()
+        self._exact_mapper = None
+
+    @property
+    def target_ontology(self):
+        return self._target_ontology
+
+    @property
+    def ontology_terms(self):
+        """
+        Returns the dictionary of ontology term IRIs and their respective details that source terms are mapped to
+        :return: dict
+        """
+        return self._ontology_terms
+
+    def map(self, source_terms, source_terms_ids=(), mapper=Mapper.TFIDF, max_mappings=3, min_score=0.3,
+            csv_columns=(), separator=',', incl_unmapped=False, save_mappings=False, output_file='', n_jobs=1,
+            skip_fuzzy_if_exact=False, max_candidates=0):
+        """
+        Map the given source terms to the ontology of this session. The arguments have the same meaning as the
+        homonymous arguments of `text2term.map_terms`
+        :return: Data frame containing the generated ontology mappings
+        """
+        if mapper in t2t.WEB_MAPPERS:
+            raise ValueError("Mapping sessions do not support Web API-based mappers: " + mapper)
+        term_mapper = self._get_term_mapper(mapper)
+        if max_candidates > 0 and mapper in t2t.SYNTACTIC_MAPPERS:
+            term_mapper.candidate_mapper = self._get_term_mapper(Mapper.TFIDF)
+        source_terms, source_terms_ids, tags = t2t._get_source_terms(source_terms, source_terms_ids, csv_columns,
+                                                                     separator)
+        self.logger.info(f"Mapping {len(source_terms)} source terms to {self.target_ontology}")
+        mappings_df = t2t._do_mapping(source_terms, source_terms_ids, self.ontology_terms, mapper, max_mappings,
+                                      min_score, tags, incl_unmapped, bioportal_apikey="",
+                                      term_mapper=term_mapper, n_jobs=n_jobs, exact_mapper=self._get_exact_mapper(),
+                                      skip_fuzzy_if_exact=skip_fuzzy_if_exact, max_candidates=max_candidates)
+        if save_mappings:
+            if output_file == '':
+                output_file = t2t._default_output_file()
+            t2t._save_mappings(mappings_df, output_file, min_score, mapper, self.target_ontology, self._base_iris,
+                               self._excl_deprecated, max_mappings, self._term_type, source_terms, incl_unmapped)
+        return mappings_df
+
+    def candidate_recall(self, source_terms, max_candidates, mapper=Mapper.LEVENSHTEIN, max_mappings=3, n_jobs=1):
+        """
+        Measure how many of the mappings of a syntactic mapper are still found when only the top `max_candidates`
+        ontology terms of each source term by TF-IDF score are scored, rather than all ontology terms
+        :param source_terms: List of source terms, e.g. a sample of the source terms to be mapped
+        :param max_candidates: The number of candidate ontology terms scored per source term
+        :param mapper: Syntactic mapper whose mappings are compared
+        :param max_mappings: Maximum number of (top scoring) ontology term mappings per source term
+        :param n_jobs: The number of threads used to compute the similarity scores (-1 to use all processors)
+        :return: Fraction of the mappings obtained by scoring all ontology terms that are also obtained by scoring only
+                    the candidate ontology terms
+        """
+        if mapper not in t2t.SYNTACTIC_MAPPERS:
+            raise ValueError("Candidate recall can only be measured for syntactic mappers: " + mapper)
+        term_mapper = self._get_term_mapper(mapper)
+        term_mapper.candidate_mapper = self._get_term_mapper(Mapper.TFIDF)
+        return term_mapper.candidate_recall(source_terms, max_candidates, mapper=mapper, max_mappings=max_mappings,
+                                            n_jobs=n_jobs)
+
+    def save_graphs(self, output_file):
+        """
+        Save vis.js graphs representing the neighborhood of each ontology term of this session
+        :param output_file: Path prefix of the output file, to which '-term-graphs.json' is appended
+        """
+        t2t._save_graphs(self.ontology_terms, output_file)
+
+    def _get_term_mapper(self, mapper):
+        if mapper not in self._term_mappers:
+            tfidf_index = None
+            if self._use_cache and mapper == Mapper.TFIDF:
+                tfidf_index = t2t._load_tfidf_index(self.target_ontology)
+            self._term_mappers[mapper] = t2t._get_term_mapper(mapper, self.ontology_terms, tfidf_index=tfidf_index)
+        return self._term_mappers[mapper]
+
+    def _get_exact_mapper(self):
+        if self._exact_mapper is None:
+            label_index = t2t._load_label_index(self.target_ontology) if self._use_cache else None
+            self._exact_mapper = ExactMapper(self.ontology_terms, index=label_index)
+        return self._exact_mapper
@@ -0,0 +1,222 @@
+"""Provides OntologyMemoryCache class"""
+
+import os
+import sys
+import mmap
+import time
+import types
+import itertools
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from text2term import onto_utils
+
+MAX_BYTES_VARIABLE = "TEXT2TERM_MEMORY_CACHE_BYTES"
+DEFAULT_MAX_BYTES = 1 << 30
+
+# number of elements of a large container whose size is estimated
+SAMPLE_SIZE = 1000
+
+_memory_cache = None
+
+
+class OntologyMemoryCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, log_level=logging.INFO):
+        """
+        Construct a least-recently-used cache of the ontology terms and mapper indexes loaded in this process, so that
+        repeated mappings to the same cached ontology do not load the ontology, or build its indexes, again. Entries
+        are evicted, least recently used first, once the estimated size of all entries exceeds the given budget.
+        Pinned entries are never evicted, and count toward the budget
+        :param max_bytes: Budget of the estimated size of the entries of the cache, in bytes (0 disables the cache)
+        """
+        self.logger = onto_utils.get_logger(__name__, level=log_level)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, version=None):
+        """
+        Get the value of the given entry, which becomes the most recently used entry
+        :param key: Key of the entry
+        :param version: Version of the source of the value (e.g., the creation time of a cached ontology). An entry of
+                        another version is removed rather than returned
+        :return: Value of the entry, or None if there is no such entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["version"] != version:
+                self.logger.info("Removing outdated entry from the memory cache: %s", _format_key(key))
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            return entry["value"]
+
+    def put(self, key, value, version=None, size=None):
+        """
+        Add the given entry as the most recently used entry, replacing any entry with the same key (while keeping
+        it pinned), and evict least recently used entries that are not pinned until the cache is within its budget
+        :param key: Key of the entry
+        :param value: Value of the entry
+        :param version: Version of the source of the value (see `get`)
+        :param size: Size of the value in bytes, which is estimated if not given
+        """
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            previous_entry = self._entries.pop(key, None)
+            pinned = previous_entry is not None and previous_entry["pinned"]
+            if self.max_bytes <= 0 and not pinned:
+                return
+            self._entries[key] = {"value": value, "version": version, "size": size, "pinned": pinned, "hits": 0,
+                                  "last_used": time.time()}
+            self._evict()
+
+    def pin(self, key):
+        """
+        Pin the given entry, so that it is never evicted
+        :return: True if the entry exists, False otherwise
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries[key]["pinned"] = True
+            return True
+
+    def unpin(self, key):
+        """
+        Unpin the given entry, which may then be evicted if the cache is over its budget
+        :return: True if the entry exists, False otherwise
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries[key]["pinned"] = False
+            self._evict()
+            return key in self._entries
+
+    def clear(self, ontology=None, include_pinned=False):
+        """
+        Remove the entries of the given ontology, or all entries if no ontology is given
+        :param ontology: Name of the ontology (the first element of the keys of its entries)
+        :param include_pinned: Remove pinned entries as well
+        :return: Number of entries removed
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if (ontology is None or key[0] == ontology) and (include_pinned or not entry["pinned"])]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def entries(self):
+        """
+        Describe the entries of the cache, from least to most recently used
+        :return: List of dictionaries with the key, estimated size (in bytes), pinned status, number of hits and last
+                    use time of each entry
+        """
+        with self._lock:
+            return [{"key": key, "size": entry["size"], "pinned": entry["pinned"], "hits": entry["hits"],
+                     "last_used": entry["last_used"]} for key, entry in self._entries.items()]
+
+    def size(self):
+        """
+        Get the estimated size of all entries of the cache, in bytes
+        """
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        total_size = sum(entry["size"] for entry in self._entries.values())
+        for key in list(self._entries):
+            if total_size <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if not entry["pinned"]:
+                self.logger.info("Evicting entry from the memory cache: %s (%i bytes)", _format_key(key), entry["size"])
+                total_size -= entry["size"]
+                del self._entries[key]
+
+
+def get_memory_cache():
+    """
+    Get the memory cache of this process, whose budget is given by the TEXT2TERM_MEMORY_CACHE_BYTES environment
+    variable (1 GiB by default)
+    """
+    global _memory_cache
+    if _memory_cache is None:
+        _memory_cache = OntologyMemoryCache(max_bytes=int(os.environ.get(MAX_BYTES_VARIABLE, DEFAULT_MAX_BYTES)))
+    return _memory_cache
+
+
+def estimate_size(value):
+    """
+    Estimate the memory used by the given value and all objects reachable from it. NumPy arrays count their buffers,
+    except memory-mapped arrays and memory maps, whose pages belong to the page cache. The elements of large
+    containers (e.g., the terms of an ontology) are sampled, and the size of the sampled elements is extrapolated
+    """
+    return _estimate_size(value, set())
+
+
+def _estimate_size(obj, seen):
+    if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        if _is_memory_mapped(obj):
+            return 0
+        return sys.getsizeof(obj) if obj.base is None else obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += _estimate_elements_size(obj.keys(), len(obj), seen) + \
+                _estimate_elements_size(obj.values(), len(obj), seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += _estimate_elements_size(obj, len(obj), seen)
+    if hasattr(obj, "__dict__"):
+        size += _estimate_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += _estimate_size(getattr(obj, slot), seen)
+    return size
+
+
+def _estimate_elements_size(elements, count, seen):
+    if count == 0:
+        return 0
+    stride = max(1, count // SAMPLE_SIZE)
+    sampled_count, sampled_size = 0, 0
+    for element in itertools.islice(elements, 0, None, stride):
+        sampled_count += 1
+        sampled_size += _estimate_size(element, seen)
+    return sampled_size * count // sampled_count
+
+
+def _is_memory_mapped(array):
+    base = array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def _format_key(key):
+    return ", ".join(str(getattr(part, "value", part)) for part in key)
+
+
+# objects that are shared by the whole process (or hold no data), which are not counted in the size of a value
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+                 logging.Logger, mmap.mmap)
@@ -1,47 +1,139 @@
 import os
+import re
 import sys
+import json
+import time
+import hashlib
+import tempfile
+import logging
 import text2term
 import owlready2
 import pandas as pd
+from text2term import onto_utils
+from text2term.config import VERSION
 from text2term.term import OntologyTermType
 from text2term.mapper import Mapper
 from shutil import rmtree
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 CACHE_FOLDER = "cache"
+CACHE_FOLDER_VARIABLE = "TEXT2TERM_CACHE_FOLDER"
+MANIFEST_VERSION = 1
+
+_cache_folder = None
+
+LOGGER = onto_utils.get_logger(__name__, level=logging.INFO)
 
 """
 CACHING FUNCTIONS -- Public
 """
 
 
-# Caches many ontologies from a csv
-def cache_ontology_set(ontology_registry_path):
+# Sets the folder of the ontology cache. By default, the cache is in the folder given by the TEXT2TERM_CACHE_FOLDER
+# environment variable, or else in a 'cache' folder in the current working directory
+def set_cache_folder(cache_folder=None):
+    global _cache_folder
+    _cache_folder = cache_folder
+
+
+# Gets the folder of the ontology cache
+def get_cache_folder():
+    if _cache_folder is not None:
+        return _cache_folder
+    return os.environ.get(CACHE_FOLDER_VARIABLE) or CACHE_FOLDER
+
+
+# Caches many ontologies from a csv, optionally in multiple worker processes. The error of each ontology that could not
+# be cached is added to the given errors dictionary (if any) under the acronym of the ontology
+def cache_ontology_set(ontology_registry_path, workers=1, errors=None):
     registry = pd.read_csv(ontology_registry_path)
+    ontologies = list(zip(registry.acronym, registry.url))
+    if errors is None:
+        errors = {}
     cache_set = {}
-    for index, row in registry.iterrows():
-        try:
-            cache = text2term.cache_ontology(row.url, row.acronym)
-            cache_set.update({row.acronym: cache})
-        except Exception as err:
-            err_message = "Could not cache ontology " + row.acronym + " due to error: " + str(err)
-            sys.stderr.write(err_message)
-        owlready2.default_world.ontologies.clear()
-    return cache_set
+    if workers > 1 and len(ontologies) > 1:
+        LOGGER.info(f"Caching {len(ontologies)} ontologies using {min(workers, len(ontologies))} worker processes")
+        # each worker process loads ontologies into its own owlready2 world, so ontologies that reference the same
+        # terms do not interfere with each other while they are cached concurrently
+        # worker processes may not inherit the cache folder set in this process, so it is set in each worker
+        with ProcessPoolExecutor(max_workers=min(workers, len(ontologies)), initializer=set_cache_folder,
+                                 initargs=(get_cache_folder(),)) as executor:
+            futures = {executor.submit(_cache_registry_ontology, url, acronym): acronym for acronym, url in ontologies}
+            for future in as_completed(futures):
+                acronym = futures[future]
+                try:
+                    cache, error = future.result()
+                except Exception as err:  # the worker process terminated abruptly
+                    cache, error = None, str(err)
+                _collect_cache_result(acronym, cache, error, cache_set, errors)
+    else:
+        for acronym, url in ontologies:
+            cache, error = _cache_registry_ontology(url, acronym)
+            _collect_cache_result(acronym, cache, error, cache_set, errors)
+    # order the caches as the ontologies in the registry, regardless of the order in which the workers completed them
+    return {acronym: cache_set[acronym] for acronym, _ in ontologies if acronym in cache_set}
 
 
 # Will check if an acronym exists in the cache
 def cache_exists(ontology_acronym=''):
-    return os.path.exists(os.path.join(CACHE_FOLDER, ontology_acronym))
+    return os.path.exists(os.path.join(get_cache_folder(), ontology_acronym))
+
+
+# Checks the manifest of a cached ontology, and rebuilds the cached ontology if it is stale
+def validate_cache(ontology_acronym, base_iris=()):
+    cache_dir = _cache_dir(ontology_acronym)
+    with _cache_lock(ontology_acronym, shared=True):
+        manifest = get_cache_manifest(ontology_acronym)
+        if manifest is None:
+            if os.path.exists(os.path.join(cache_dir, ontology_acronym + "-term-details.pickle")) and \
+                    not os.path.exists(os.path.join(cache_dir, ontology_acronym + "-term-store")):
+                LOGGER.warning(f"Cached ontology {ontology_acronym} was cached by an earlier version of text2term "
+                               f"and cannot be validated; cache it again to record its manifest")
+                return
+            raise RuntimeError(f"Cached ontology {ontology_acronym} has no manifest: it does not exist or its caching "
+                               f"did not complete; cache it again")
+        stale_reasons, document_version = _get_stale_reasons(ontology_acronym, manifest)
+        stale_reasons = "; ".join(stale_reasons)
+    if document_version is not None:
+        _record_document_version(ontology_acronym, manifest, document_version)
+    if len(stale_reasons) > 0:
+        LOGGER.warning(f"Cached ontology {ontology_acronym} is stale ({stale_reasons}), rebuilding it from: "
+                       f"{manifest['source']}")
+        try:
+            text2term.cache_ontology(manifest["source"], ontology_acronym, base_iris=tuple(manifest["base_iris"]),
+                                     loader=manifest["loader"])
+        except Exception as err:
+            raise RuntimeError(f"Cached ontology {ontology_acronym} is stale ({stale_reasons}) and could not be "
+                               f"rebuilt from {manifest['source']}: {err}") from err
+    cached_base_iris = tuple(manifest["base_iris"])
+    if len(cached_base_iris) > 0 and (len(base_iris) == 0 or
+                                      not all(iri.startswith(cached_base_iris) for iri in base_iris)):
+        LOGGER.warning(f"Cached ontology {ontology_acronym} only holds the terms whose IRIs start with: "
+                       f"{', '.join(cached_base_iris)}")
+
+
+# Gets the manifest of a cached ontology, or None if it has no manifest
+def get_cache_manifest(ontology_acronym):
+    try:
+        with open(_manifest_file(_cache_dir(ontology_acronym), ontology_acronym), "r") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
 
 
 # Clears the cache
 def clear_cache(ontology_acronym=''):
-    cache_dir = CACHE_FOLDER
+    cache_dir = get_cache_folder()
     if ontology_acronym != '':
-        cache_dir = os.path.join(CACHE_FOLDER, ontology_acronym)
+        cache_dir = _cache_dir(ontology_acronym)
     # Is equivalent to: rm -r cache_dir
     try:
-        rmtree(cache_dir)
+        if ontology_acronym != '' and os.path.exists(cache_dir):
+            # wait for any process that is caching or loading the ontology
+            with _build_lock(ontology_acronym), _cache_lock(ontology_acronym):
+                rmtree(cache_dir)
+        else:
+            rmtree(cache_dir)
         sys.stderr.write("Cache has been cleared successfully\n")
     except OSError as error:
         sys.stderr.write("Cache cannot be removed:")
@@ -52,7 +144,7 @@ def clear_cache(ontology_acronym=''):
 class OntologyCache:
     def __init__(self, ontology_acronym):
         self.acronym = ontology_acronym
-        self.ontology = os.path.join(CACHE_FOLDER, ontology_acronym)
+        self.ontology = _cache_dir(ontology_acronym)
 
     def map_terms(self, source_terms, base_iris=(), excl_deprecated=False, max_mappings=3, min_score=0.3,
                   mapper=Mapper.TFIDF, output_file='', save_graphs=False, save_mappings=False, source_terms_ids=(),
@@ -71,3 +163,171 @@ class OntologyCache:
 
     def acronym(self):
         return self.acronym
+
+    def manifest(self):
+        return get_cache_manifest(self.acronym)
+
+
+"""
+CACHING FUNCTIONS -- Private
+"""
+
+
+# Caches an ontology of a registry, returning the cache or the error message if the ontology could not be cached
+def _cache_registry_ontology(url, acronym):
+    try:
+        return text2term.cache_ontology(url, acronym), None
+    except Exception as err:
+        return None, str(err)
+    finally:
+        owlready2.default_world.ontologies.clear()
+
+
+def _collect_cache_result(acronym, cache, error, cache_set, errors):
+    if error is None:
+        cache_set[acronym] = cache
+    else:
+        errors[acronym] = error
+        err_message = "Could not cache ontology " + acronym + " due to error: " + error + "\n"
+        sys.stderr.write(err_message)
+
+
+# Writes the manifest of a cached ontology to the given cache directory, recording the ontology document it was built
+# from and how
+def _write_manifest(cache_dir, ontology_acronym, source, ontology_metadata, base_iris, loader, term_count, update=None):
+    if os.path.isfile(ontology_metadata["document"]):
+        ontology_metadata["document"] = os.path.abspath(ontology_metadata["document"])
+    manifest = {"manifest_version": MANIFEST_VERSION, "text2term_version": VERSION, "acronym": ontology_acronym,
+                "source": source, "document": ontology_metadata["document"],
+                "ontology_iri": ontology_metadata["ontology_iri"], "version_iri": ontology_metadata["version_iri"],
+                "base_iris": list(base_iris), "loader": loader, "term_count": term_count,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    manifest.update(_get_document_version(ontology_metadata["document"]))
+    if update is not None:  # the cached ontology was updated from its previous version (see update_cached_ontology)
+        manifest["update"] = update
+    onto_utils.write_atomically(_manifest_file(cache_dir, ontology_acronym),
+                                json.dumps(manifest, indent=1).encode("utf-8"))
+
+
+# Gets the manifest of the given ontology if it was cached with the given source, base IRIs and loader after the given
+# time (e.g., by another process while this process waited to cache the same ontology), or else None
+def _get_recent_manifest(ontology_acronym, source, base_iris, loader, since):
+    manifest = get_cache_manifest(ontology_acronym)
+    if manifest is None or manifest.get("created", "") < time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(since)):
+        return None
+    if manifest.get("source") != source or manifest.get("base_iris") != list(base_iris) or \
+            manifest.get("loader") != loader:
+        return None
+    stale_reasons, document_version = _get_stale_reasons(ontology_acronym, manifest)
+    if document_version is not None:
+        _record_document_version(ontology_acronym, manifest, document_version)
+    return manifest if len(stale_reasons) == 0 else None
+
+
+# Creates a temporary directory in the cache folder, where a cached ontology is built before it replaces its previous
+# version (if any) at once. Temporary directories left behind by interrupted processes are removed first
+def _make_temp_cache_dir(ontology_acronym):
+    cache_folder = get_cache_folder()
+    prefix = "." + os.path.basename(ontology_acronym) + "."
+    temp_dir_name = re.compile(re.escape(prefix) + r"[a-z0-9_]{8}\.(tmp|old)")
+    for file_name in os.listdir(cache_folder):
+        if temp_dir_name.fullmatch(file_name):
+            rmtree(os.path.join(cache_folder, file_name), ignore_errors=True)
+    return tempfile.mkdtemp(dir=cache_folder, prefix=prefix, suffix=".tmp")
+
+
+# Replaces the cache directory of the given ontology with the given (complete) temporary cache directory. Readers of
+# the cached ontology hold a shared lock on it, so they never see the cache directory while it is being replaced
+def _replace_cache_dir(ontology_acronym, temp_cache_dir):
+    cache_dir = _cache_dir(ontology_acronym)
+    old_cache_dir = None
+    with _cache_lock(ontology_acronym):
+        if os.path.exists(cache_dir):
+            old_cache_dir = temp_cache_dir[:-len(".tmp")] + ".old"
+            os.replace(cache_dir, old_cache_dir)
+        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+        os.replace(temp_cache_dir, cache_dir)
+    if old_cache_dir is not None:
+        rmtree(old_cache_dir, ignore_errors=True)
+
+
+# Gets the reasons why a cached ontology is stale, given its manifest, and the current version of its ontology document
+# if the document was only touched (see _record_document_version), or else None
+def _get_stale_reasons(ontology_acronym, manifest):
+    reasons, document_version = [], None
+    if manifest.get("manifest_version") != MANIFEST_VERSION:
+        reasons.append(f"unsupported manifest version {manifest.get('manifest_version')}")
+        return reasons, document_version
+    if manifest["text2term_version"] != VERSION:
+        reasons.append(f"cached with text2term {manifest['text2term_version']}")
+    if not os.path.exists(os.path.join(_cache_dir(ontology_acronym), ontology_acronym + "-term-store")):
+        reasons.append("missing term store")
+    # the ontology document is compared with its cached version only when it is a local file (e.g., a document in a
+    # download cache folder)--a document at a URL would have to be downloaded again to be compared
+    document = manifest["document"]
+    if manifest.get("document_sha256") is not None and os.path.isfile(document):
+        document_stat = os.stat(document)
+        if document_stat.st_size != manifest["document_size"] or \
+                document_stat.st_mtime_ns != manifest["document_mtime_ns"]:
+            if _get_checksum(document) != manifest["document_sha256"]:
+                reasons.append(f"the ontology document {document} has changed")
+            else:  # the document was only touched
+                document_version = _get_document_version(document)
+    return reasons, document_version
+
+
+# Records the current version of the ontology document of a cached ontology whose document was only touched, so that
+# the document is not hashed again. The manifest is rewritten under the exclusive lock of the cached ontology (the
+# caller must not hold its shared lock), unless the cached ontology was replaced in the meantime
+def _record_document_version(ontology_acronym, manifest, document_version):
+    with _cache_lock(ontology_acronym):
+        current_manifest = get_cache_manifest(ontology_acronym)
+        if current_manifest is None or current_manifest.get("created") != manifest.get("created") or \
+                current_manifest.get("document_sha256") != document_version["document_sha256"]:
+            return
+        current_manifest.update(document_version)
+        onto_utils.write_atomically(_manifest_file(_cache_dir(ontology_acronym), ontology_acronym),
+                                    json.dumps(current_manifest, indent=1).encode("utf-8"))
+
+
+# Gets the checksum, size and modification time of an ontology document, which are None if it is not a local file
+def _get_document_version(document):
+    if not os.path.isfile(document):
+        return {"document_sha256": None, "document_size": None, "document_mtime_ns": None}
+    document_stat = os.stat(document)
+    return {"document_sha256": _get_checksum(document), "document_size": document_stat.st_size,
+            "document_mtime_ns": document_stat.st_mtime_ns}
+
+
+def _get_checksum(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_file(cache_dir, ontology_acronym):
+    return os.path.join(cache_dir, ontology_acronym + "-manifest.json")
+
+
+def _cache_dir(ontology_acronym):
+    return os.path.join(get_cache_folder(), ontology_acronym)
+
+
+# Locks the given cached ontology: readers of the cached ontology hold a shared lock, and a process that replaces or
+# removes the cached ontology holds an exclusive lock. The lock files are outside the cache directory of the ontology,
+# which is replaced when the ontology is cached again
+def _cache_lock(ontology_acronym, shared=False):
+    return onto_utils.lock_file(_lock_file(ontology_acronym, ".lock"), shared=shared)
+
+
+# Locks the given cached ontology while it is being built, which takes turns between processes that cache the same
+# ontology without blocking the readers of its previous version
+def _build_lock(ontology_acronym):
+    return onto_utils.lock_file(_lock_file(ontology_acronym, ".build.lock"))
+
+
+def _lock_file(ontology_acronym, suffix):
+    os.makedirs(get_cache_folder(), exist_ok=True)
+    return os.path.join(get_cache_folder(), "." + os.path.basename(ontology_acronym) + suffix)
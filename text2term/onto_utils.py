@@ -1,10 +1,20 @@
+import os
 import logging
+import tempfile
+import itertools
 import pandas as pd
 import bioregistry
 import shortuuid
+from contextlib import contextmanager
 from owlready2 import *
 from gensim.parsing import strip_non_alphanum, strip_multiple_whitespaces
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 
 BASE_IRI = "http://ccb.hms.harvard.edu/t2t/"
 
@@ -109,6 +119,71 @@ def get_logger(name, level=logging.INFO):
     return logger
 
 
+def get_thread_count(n_jobs):
+    """
+    Gets the number of threads to be used for the given number of jobs, which is -1 to use all processors
+    :param n_jobs: Number of jobs, either a positive integer or -1
+    :return: Number of threads
+    """
+    if n_jobs == -1:
+        return os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError(f"The number of jobs must be a positive integer or -1 (to use all processors), not {n_jobs}")
+    return n_jobs
+
+
+@contextmanager
+def lock_file(lock_file_path, shared=False, blocking=True):
+    """
+    Holds a lock on the given lock file, which blocks other processes that lock the same file. An exclusive lock blocks
+    all other locks, while a shared lock only blocks exclusive locks (on Windows, all locks are exclusive)
+    :param lock_file_path: Path of the lock file, which is created if it does not exist
+    :param shared: Hold a shared lock rather than an exclusive lock
+    :param blocking: Wait for the lock if it is held by another process. If False, BlockingIOError is raised instead
+    """
+    with open(lock_file_path, "a+b") as lock:
+        if fcntl is not None:
+            # a non-blocking lock that is held by another process raises BlockingIOError
+            operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.flock(lock.fileno(), operation if blocking else operation | fcntl.LOCK_NB)
+        else:
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError as err:  # msvcrt gives up after 10 attempts
+                    if not blocking:
+                        raise BlockingIOError(f"Lock file {lock_file_path} is locked by another process") from err
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_atomically(file_path, content):
+    """
+    Writes the given content to a temporary file in the folder of the given file, and renames it to the given file, so
+    that readers of the file never see it partially written
+    :param file_path: Path of the file
+    :param content: Bytes to be written
+    """
+    file_descriptor, temp_file = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".part")
+    try:
+        with os.fdopen(file_descriptor, "wb") as output:
+            output.write(content)
+        os.replace(temp_file, file_path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
 def parse_list_file(file_path):
     file = open(file_path)
     lines = file.read().splitlines()
@@ -116,8 +191,36 @@ def parse_list_file(file_path):
     return lines
 
 
+def parse_list_file_chunks(file_path, chunk_size):
+    """
+    Read the lines of the given file in chunks of (at most) the given size, without reading the whole file into memory
+    :return: Generator of lists of lines
+    """
+    with open(file_path) as file:
+        while True:
+            lines = [line.rstrip("\r\n") for line in itertools.islice(file, chunk_size)]
+            if len(lines) == 0:
+                break
+            yield lines
+
+
 def parse_csv_file(file_path, term_column_name, term_id_column_name, separator=','):
     data = pd.read_csv(file_path, sep=separator, engine='python')
+    return _get_terms_and_ids(data, term_column_name, term_id_column_name)
+
+
+def parse_csv_file_chunks(file_path, term_column_name, term_id_column_name, chunk_size, separator=','):
+    """
+    Read the terms (and term IDs) in the given table in chunks of (at most) the given number of rows, without reading
+    the whole table into memory
+    :return: Generator of pairs of arrays of terms and term IDs
+    """
+    with pd.read_csv(file_path, sep=separator, engine='python', chunksize=chunk_size) as reader:
+        for data in reader:
+            yield _get_terms_and_ids(data, term_column_name, term_id_column_name)
+
+
+def _get_terms_and_ids(data, term_column_name, term_id_column_name):
     data = data.dropna(subset=[term_column_name, term_id_column_name])
     if term_column_name not in data.columns:
         raise ValueError("Could not find specified column name for input terms: " + term_column_name)
@@ -0,0 +1,13 @@
+"""Provides OntologyLoader enum"""
+
+from enum import Enum
+
+
+class OntologyLoader(str, Enum):
+    """ Enumeration of the ways of reading the terms of an ontology document """
+    OWLREADY2 = 'owlready2'
+    STREAMING = 'streaming'
+
+    @classmethod
+    def list(cls):
+        return list(map(lambda c: c.value, cls))
@@ -1,56 +1,301 @@
 """Provides SyntacticMapper class"""
 
 import logging
-import nltk
+import numpy as np
 import rapidfuzz
 from tqdm import tqdm
 from text2term import onto_utils
+from text2term.jaccard_index import JaccardIndex
+from text2term.label_index import LabelIndex
 from text2term.mapper import Mapper
 from text2term.term_mapping import TermMapping, TermMappingCollection
+from text2term.tfidf_mapper import TFIDFMapper
+
+
+# Maximum number of (source term, target label/synonym) scores computed at once; source terms are scored in batches
+MAX_BATCH_SCORES = 10000000
+
+# Tolerance used when comparing string lengths with the lengths bounds implied by a minimum similarity score
+LENGTH_TOLERANCE = 1e-9
 
 
 class SyntacticMapper:
 
-    def __init__(self, target_ontology_terms):
+    def __init__(self, target_ontology_terms, candidate_mapper=None, jaccard_ngram_length=1):
         """
         :param target_ontology_terms: Collection of ontology terms to be mapped against
+        :param candidate_mapper: TFIDFMapper of the given ontology terms, used to retrieve the candidate ontology terms
+                                    that are rescored when 'max_candidates' is given. If not given, it is built from
+                                    the given ontology terms when first needed
+        :param jaccard_ngram_length: The length of the character n-grams whose sets are compared by the Jaccard mapper.
+                                    The default length 1 compares the sets of characters of the strings
         """
         self.logger = onto_utils.get_logger(__name__, logging.INFO)
         self.target_ontology_terms = target_ontology_terms
+        self.candidate_mapper = candidate_mapper
+        # labels/synonyms shared by multiple ontology terms are compared with each source term only once
+        self.label_index = LabelIndex(target_ontology_terms)
+        self.target_term_iris = np.asarray(self.label_index.term_iris, dtype=object)
+        self._term_positions = None
+        self.jaccard_ngram_length = jaccard_ngram_length
+        self._jaccard_index = None
+        # label/synonym lengths, and the labels/synonyms sorted by length, to skip labels of out of reach lengths
+        self.label_lengths = np.fromiter((len(label) for label in self.label_index.labels), dtype=np.int64,
+                                         count=self.label_index.label_count)
+        self._length_order = np.argsort(self.label_lengths, kind='stable')
+        self._sorted_label_lengths = self.label_lengths[self._length_order]
+        self._sorted_labels = [self.label_index.labels[label] for label in self._length_order]
 
-    def map(self, source_terms, source_terms_ids, mapper=Mapper.JARO_WINKLER, max_mappings=3):
+    def map(self, source_terms, source_terms_ids, mapper=Mapper.JARO_WINKLER, max_mappings=3, n_jobs=1,
+            max_candidates=0, min_score=0):
         """
         :param source_terms: List of source terms to be mapped with ontology terms
         :param source_terms_ids: List of identifiers for the given source terms
         :param mapper: Mapping method to be used for matching
         :param max_mappings: Maximum number of (top scoring) ontology term mappings that should be returned
+        :param n_jobs: The number of threads used to compute the similarity scores (-1 to use all processors)
+        :param max_candidates: If greater than 0, score only the top 'max_candidates' ontology terms of each source term
+                                by TF-IDF score, rather than all ontology terms
+        :param min_score: The lower-bound threshold for keeping a candidate term mapping, between 0-1. Similarities
+                            below this threshold are not fully computed, and only mappings that reach it are returned
+        """
+        n_jobs = onto_utils.get_thread_count(n_jobs)
+        if max_candidates > 0:
+            batch_size = max(1, MAX_BATCH_SCORES // max_candidates)
+        else:
+            batch_size = max(1, MAX_BATCH_SCORES // max(self.label_index.label_count, 1))
+        top_rows, top_terms, top_scores = [], [], []
+        with tqdm(total=len(source_terms)) as progress:
+            for batch_start in range(0, len(source_terms), batch_size):
+                batch = source_terms[batch_start:batch_start + batch_size]
+                if max_candidates > 0:
+                    rows, terms, scores = self._map_candidates(batch, mapper, max_mappings, max_candidates, min_score,
+                                                               n_jobs)
+                else:
+                    rows, terms, scores = self._map_batch(batch, mapper, max_mappings, min_score, n_jobs)
+                top_rows.append(rows + batch_start)
+                top_terms.append(terms)
+                top_scores.append(scores)
+                progress.update(len(batch))
+        if len(top_rows) == 0:
+            return TermMappingCollection([]).mappings_df()
+        return TermMappingCollection.from_arrays(self.target_ontology_terms, source_terms, source_terms_ids,
+                                                 np.concatenate(top_rows),
+                                                 self.target_term_iris[np.concatenate(top_terms)],
+                                                 np.concatenate(top_scores))
+
+    def candidate_recall(self, source_terms, max_candidates, mapper=Mapper.JARO_WINKLER, max_mappings=3, n_jobs=1):
+        """
+        Compare the mappings obtained by scoring only the top 'max_candidates' ontology terms of each source term by
+        TF-IDF score with those obtained by scoring all ontology terms
+        :param source_terms: List of source terms to be mapped with ontology terms, e.g. a sample of the source terms
+        :param max_candidates: The number of candidate ontology terms scored per source term
+        :param mapper: Mapping method to be used for matching
+        :param max_mappings: Maximum number of (top scoring) ontology term mappings per source term
+        :param n_jobs: The number of threads used to compute the similarity scores (-1 to use all processors)
+        :return: Fraction of the mappings obtained by scoring all ontology terms that are also obtained by scoring only
+                    the candidate ontology terms
+        """
+        source_terms_ids = list(range(len(source_terms)))
+        all_mappings = self.map(source_terms, source_terms_ids, mapper, max_mappings, n_jobs=n_jobs)
+        if all_mappings.empty:
+            return 1.0
+        candidate_mappings = self.map(source_terms, source_terms_ids, mapper, max_mappings, n_jobs=n_jobs,
+                                      max_candidates=max_candidates)
+        mapping_columns = [TermMapping.SRC_TERM_ID, TermMapping.TGT_TERM_IRI]
+        found_mappings = all_mappings[mapping_columns].merge(candidate_mappings[mapping_columns], how='inner')
+        recall = len(found_mappings) / len(all_mappings)
+        self.logger.info("Scoring %i candidate ontology terms per source term recalls %i of %i mappings (%.3f)",
+                         max_candidates, len(found_mappings), len(all_mappings), recall)
+        return recall
+
+    def _map_batch(self, source_terms, mapper, max_matches, min_score=0, n_jobs=1):
+        """
+        Score the given source terms against all target labels/synonyms, and get the top 'max_matches' ontology terms of
+        each source term, where the score of an ontology term is the highest score of its labels/synonyms. When
+        'min_score' is given, only ontology terms that score at least 'min_score' are returned
+        :return: Arrays of source term rows, ontology term positions and scores, ordered by row and decreasing score
+        """
+        if min_score > 0:
+            rows, labels, scores = self._score_labels_above(source_terms, mapper, min_score, n_jobs)
+            positions, terms = self.label_index.label_terms(labels)
+            return self._top_terms_of_pairs(rows[positions], terms, scores[positions], max_matches)
+        if mapper == Mapper.JACCARD:
+            label_scores = self._get_jaccard_index().scores(source_terms).toarray()
+        else:
+            scorer, max_score = self._get_scorer(mapper)
+            label_scores = rapidfuzz.process.cdist(source_terms, self.label_index.labels, scorer=scorer,
+                                                   dtype=np.float64, workers=n_jobs)
+            if max_score != 1:
+                label_scores /= max_score
+        term_scores = self.label_index.term_scores(label_scores)
+        rows, terms = [], []
+        for row, row_scores in enumerate(term_scores):
+            top = self._top_terms(row_scores, max_matches)
+            rows.append(np.full(len(top), row))
+            terms.append(top)
+        rows, terms = np.concatenate(rows), np.concatenate(terms)
+        return rows, terms, term_scores[rows, terms]
+
+    def _map_candidates(self, source_terms, mapper, max_matches, max_candidates, min_score=0, n_jobs=1):
+        """
+        Score the given source terms against the labels/synonyms of their top 'max_candidates' ontology terms by TF-IDF
+        score, and get the top 'max_matches' of those ontology terms of each source term. When 'min_score' is given,
+        only ontology terms that score at least 'min_score' are returned
+        :return: Arrays of source term rows, ontology term positions and scores, ordered by row and decreasing score
+        """
+        rows, candidate_iris = self._get_candidate_mapper().get_candidates(source_terms, max_candidates, n_jobs=n_jobs)
+        terms = np.fromiter((self._term_positions[iri] for iri in candidate_iris), dtype=np.int64,
+                            count=len(candidate_iris))
+        positions, labels = self.label_index.term_labels(terms)
+        rows, terms = rows[positions], terms[positions]
+        scores = self._score_pairs(source_terms, rows, labels, mapper, min_score, n_jobs)
+        if min_score > 0:
+            above = scores >= min_score
+            rows, terms, scores = rows[above], terms[above], scores[above]
+        return self._top_terms_of_pairs(rows, terms, scores, max_matches)
+
+    def _top_terms_of_pairs(self, rows, terms, scores, max_matches):
+        """
+        Get the top 'max_matches' ontology terms of each source term, given the scores of (source term row, ontology
+        term) pairs ordered by row, where an ontology term may occur multiple times per row (once per label/synonym)
+        :return: Arrays of source term rows, ontology term positions and scores, ordered by row and decreasing score
+        """
+        # sort the pairs of each source term by decreasing score, with ties ordered by ontology term position
+        order = np.lexsort((terms, -scores, rows))
+        rows, terms, scores = rows[order], terms[order], scores[order]
+        # keep only the best scoring label/synonym of each ontology term
+        _, first_indices = np.unique(rows * self.label_index.term_count + terms, return_index=True)
+        first_indices.sort()
+        rows, terms, scores = rows[first_indices], terms[first_indices], scores[first_indices]
+        # keep the top 'max_matches' ontology terms of each source term
+        ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        top = ranks < max_matches
+        return rows[top], terms[top], scores[top]
+
+    def _score_labels_above(self, source_terms, mapper, min_score, n_jobs=1):
+        """
+        Compute the similarities of at least 'min_score' between the given source terms and the target labels/synonyms.
+        For the Levenshtein and Indel mappers, labels/synonyms whose length difference with a source term rules out
+        reaching 'min_score' are skipped
+        :return: Arrays of source term rows, label positions and scores, ordered by row
+        """
+        if mapper == Mapper.JACCARD:
+            # only the pairs that share at least one character (n-gram) have a non-zero similarity
+            label_scores = self._get_jaccard_index().scores(source_terms)
+            label_scores.data[label_scores.data < min_score] = 0
+            label_scores.eliminate_zeros()
+            label_scores = label_scores.tocoo()
+            return label_scores.row.astype(np.int64), label_scores.col.astype(np.int64), label_scores.data
+        scorer, max_score = self._get_scorer(mapper)
+        source_lengths = np.fromiter((len(term) for term in source_terms), dtype=np.int64, count=len(source_terms))
+        range_starts, range_ends = self._get_label_ranges(source_lengths, mapper, min_score)
+        self.logger.debug("Computing %i of %i similarity scores", (range_ends - range_starts).sum(),
+                          len(source_terms) * self.label_index.label_count)
+        # compute the scores of the source terms that share a range against the labels/synonyms in that range
+        ranges, range_index = np.unique(np.stack([range_starts, range_ends]), axis=1, return_inverse=True)
+        all_rows, all_labels, all_scores = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+        for range_position, (range_start, range_end) in enumerate(ranges.T):
+            if range_start >= range_end:
+                continue
+            rows = np.flatnonzero(range_index == range_position)
+            scores = rapidfuzz.process.cdist([source_terms[row] for row in rows],
+                                             self._sorted_labels[range_start:range_end], scorer=scorer,
+                                             score_cutoff=min_score * max_score, dtype=np.float64, workers=n_jobs)
+            score_rows, score_columns = np.nonzero(scores >= min_score * max_score)
+            all_rows.append(rows[score_rows])
+            all_labels.append(self._length_order[range_start + score_columns])
+            all_scores.append(scores[score_rows, score_columns] / max_score)
+        rows, labels, scores = np.concatenate(all_rows), np.concatenate(all_labels), np.concatenate(all_scores)
+        order = np.argsort(rows, kind='stable')
+        return rows[order], labels[order], scores[order]
+
+    def _score_pairs(self, source_terms, rows, labels, mapper, min_score=0, n_jobs=1):
         """
-        mappings = []
-        for term, term_id in tqdm(zip(source_terms, source_terms_ids), total=len(source_terms)):
-            matches = self._map(term, term_id, mapper, max_mappings)
-            mappings.extend(matches)
-        return TermMappingCollection(mappings).mappings_df()
-
-    def _map(self, source_term, source_term_id, mapper, max_matches=3):
-        self.logger.debug("Matching %s...", source_term)
-        term_matches = []
-        for term in self.target_ontology_terms.values():
-            highest_similarity = 0.0
-            for target_name in self._term_names(term):
-                similarity = self.compare(source_term, target_name, mapper)
-                self.logger.debug("%s -> %s (%.2f)", source_term, target_name, similarity)
-                if similarity > highest_similarity:
-                    highest_similarity = similarity
-            term_matches.append(TermMapping(source_term, source_term_id, term.label, term.iri, highest_similarity))
-        matches_sorted = sorted(term_matches, key=lambda x: x.mapping_score, reverse=True)
-        del matches_sorted[max_matches:]
-        return matches_sorted
-
-    def _term_names(self, ontology_term):
-        lbls_syns = []
-        lbls_syns.extend(ontology_term.labels)
-        lbls_syns.extend(ontology_term.synonyms)
-        return lbls_syns
+        Compute the similarity of each (source term, label/synonym) pair, given by the source term rows and label
+        positions. For the Levenshtein and Indel mappers, pairs whose length difference rules out reaching 'min_score'
+        are skipped
+        :return: Array containing the score of each pair
+        """
+        if mapper == Mapper.JACCARD:
+            return self._get_jaccard_index().pair_scores(source_terms, rows, labels)
+        scorer, max_score = self._get_scorer(mapper)
+        source_lengths = np.fromiter((len(source_terms[row]) for row in rows), dtype=np.int64, count=len(rows))
+        range_starts, range_ends = self._get_label_ranges(source_lengths, mapper, min_score)
+        label_ranks = np.searchsorted(self._sorted_label_lengths, self.label_lengths[labels])
+        in_reach = np.flatnonzero((label_ranks >= range_starts) & (label_ranks < range_ends))
+        scores = np.zeros(len(rows), dtype=np.float64)
+        if len(in_reach) > 0:
+            scores[in_reach] = rapidfuzz.process.cpdist(
+                [source_terms[row] for row in rows[in_reach]],
+                [self.label_index.labels[label] for label in labels[in_reach]], scorer=scorer,
+                score_cutoff=min_score * max_score, dtype=np.float64, workers=n_jobs)
+        if max_score != 1:
+            scores /= max_score
+        return scores
+
+    def _get_label_ranges(self, source_lengths, mapper, min_score):
+        """
+        Get the range of the labels/synonyms sorted by length that each source term, given its length, can reach
+        'min_score' with. The normalized Levenshtein similarity of strings of lengths m <= n is at most m/n, and their
+        normalized Indel similarity is at most 2m/(m+n). Other mappers are not bounded by the lengths of the strings
+        :return: Pair of arrays with the start and end of the range of each source term
+        """
+        source_lengths = source_lengths.astype(np.float64)
+        if mapper == Mapper.LEVENSHTEIN and min_score > 0:
+            min_lengths, max_lengths = source_lengths * min_score, source_lengths / min_score
+        elif mapper == Mapper.INDEL and min_score > 0:
+            min_lengths = source_lengths * min_score / (2 - min_score)
+            max_lengths = source_lengths * (2 - min_score) / min_score
+        else:
+            nr_sources = len(source_lengths)
+            return np.zeros(nr_sources, dtype=np.int64), np.full(nr_sources, len(self._sorted_labels), dtype=np.int64)
+        # allow for floating point errors at the boundaries of the ranges
+        return (np.searchsorted(self._sorted_label_lengths, min_lengths - LENGTH_TOLERANCE, side='left'),
+                np.searchsorted(self._sorted_label_lengths, max_lengths + LENGTH_TOLERANCE, side='right'))
+
+    def _get_candidate_mapper(self):
+        if self.candidate_mapper is None:
+            self.logger.info("Building TF-IDF index to retrieve candidate ontology terms...")
+            self.candidate_mapper = TFIDFMapper(self.target_ontology_terms)
+        if self._term_positions is None:
+            self._term_positions = {iri: position for position, iri in enumerate(self.label_index.term_iris)}
+        return self.candidate_mapper
+
+    def _get_jaccard_index(self):
+        if self._jaccard_index is None:
+            self._jaccard_index = JaccardIndex(self.label_index.labels, ngram_length=self.jaccard_ngram_length)
+        return self._jaccard_index
+
+    @staticmethod
+    def _top_terms(scores, k):
+        """Get the positions of the top k scores, in decreasing order of score, with ties ordered by position"""
+        if k < len(scores):
+            kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+            candidates = np.flatnonzero(scores >= kth_score)
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
+
+    def _get_scorer(self, mapper):
+        """
+        Get the function that computes the similarity of two strings for the given mapper
+        :return: Pair containing the similarity function and the maximum similarity it returns
+        """
+        if mapper == Mapper.LEVENSHTEIN:
+            return rapidfuzz.distance.Levenshtein.normalized_similarity, 1
+        elif mapper == Mapper.JARO:
+            return rapidfuzz.distance.Jaro.normalized_similarity, 1
+        elif mapper == Mapper.JARO_WINKLER:
+            return rapidfuzz.distance.JaroWinkler.normalized_similarity, 1
+        elif mapper == Mapper.INDEL:
+            return rapidfuzz.distance.Indel.normalized_similarity, 1
+        elif mapper == Mapper.FUZZY:
+            return rapidfuzz.fuzz.WRatio, 100
+        elif mapper == Mapper.JACCARD:
+            return _jaccard_similarity, 1
+        else:
+            raise ValueError("Unsupported mapping method: " + str(mapper))
 
     def compare(self, s1, s2, mapper):
         """
@@ -95,7 +340,7 @@ class SyntacticMapper:
         Calculates the Jaro-Winkler similarity between s1 and s2.
         :return similarity between s1 and s2 as a float between 0 and 1
         """
-        similarity = rapidfuzz.distance.Jaro.normalized_similarity(s1, s2)
+        similarity = rapidfuzz.distance.JaroWinkler.normalized_similarity(s1, s2)
         return similarity
 
     def compare_indel(self, s1, s2):
@@ -120,5 +365,15 @@ class SyntacticMapper:
         Calculates a Jaccard-based similarity between s1 and s2.
         :return similarity between s1 and s2 as a float between 0 and 1
         """
-        similarity = 1-nltk.jaccard_distance(set(s1), set(s2))
+        similarity = _jaccard_similarity(s1, s2)
         return similarity
+
+
+def _jaccard_similarity(s1, s2, score_cutoff=None, **kwargs):
+    """Jaccard similarity of the sets of characters of s1 and s2, with the rapidfuzz scorer signature"""
+    s1, s2 = set(s1), set(s2)
+    union_size = len(s1 | s2)
+    similarity = len(s1 & s2) / union_size if union_size > 0 else 0
+    if score_cutoff is not None and similarity < score_cutoff:
+        return 0
+    return similarity
@@ -1,6 +1,7 @@
 import os
 import json
 import pickle
+import shutil
 import logging
 import datetime
 import time
@@ -8,14 +9,20 @@ import pandas as pd
 from text2term import onto_utils
 from text2term import onto_cache
 from text2term.mapper import Mapper
+from text2term.ontology_loader import OntologyLoader
 from text2term.term import OntologyTermType
 from text2term.term_collector import OntologyTermCollector
 from text2term.term_collector import filter_terms
+from text2term.term_store import OntologyTermStore
 from text2term.term_graph_generator import TermGraphGenerator
+from text2term.exact_mapper import ExactMapper
+from text2term.label_index import LabelIndex
 from text2term.bioportal_mapper import BioPortalAnnotatorMapper
 from text2term.syntactic_mapper import SyntacticMapper
 from text2term.tfidf_mapper import TFIDFMapper
+from text2term.tfidf_index import TFIDFIndex
 from text2term.zooma_mapper import ZoomaMapper
+from text2term.memory_cache import get_memory_cache
 from text2term.config import VERSION
 from text2term.tagged_term import TaggedTerm
 from text2term.term_mapping import TermMapping
@@ -24,6 +31,8 @@ IGNORE_TAGS = ["ignore", "Ignore", "ignore ", "Ignore "]
 UNMAPPED_TAG = "unmapped"
 OUTPUT_COLUMNS = ["Source Term", "Source Term ID", "Mapped Term Label",
                   "Mapped Term CURIE", "Mapped Term IRI", "Mapping Score", "Tags"]
+WEB_MAPPERS = {Mapper.ZOOMA, Mapper.BIOPORTAL}
+SYNTACTIC_MAPPERS = {Mapper.LEVENSHTEIN, Mapper.JARO, Mapper.JARO_WINKLER, Mapper.INDEL, Mapper.FUZZY, Mapper.JACCARD}
 
 LOGGER = onto_utils.get_logger(__name__, level=logging.INFO)
 
@@ -31,7 +40,8 @@ LOGGER = onto_utils.get_logger(__name__, level=logging.INFO)
 def map_terms(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_deprecated=False, max_mappings=3,
               min_score=0.3, mapper=Mapper.TFIDF, output_file='', save_graphs=False, save_mappings=False,
               source_terms_ids=(), separator=',', use_cache=False, term_type=OntologyTermType.CLASS,
-              incl_unmapped=False, bioportal_apikey=""):
+              incl_unmapped=False, bioportal_apikey="", n_jobs=1, skip_fuzzy_if_exact=False, max_candidates=0,
+              world_folder=None, loader=OntologyLoader.OWLREADY2, download_folder=None):
     """
     Maps the terms in the given list to the specified target ontology.
 
@@ -64,7 +74,8 @@ def map_terms(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_
     output_file : str
         Path to desired output file for the mappings
     save_graphs : bool
-        Save vis.js graphs representing the neighborhood of each ontology term
+        Save vis.js graphs representing the neighborhood of each ontology term. Otherwise, only the term details needed
+        for mapping (labels, synonyms, deprecation flags and term types) are collected from the target ontology
     save_mappings : bool
         Save the generated mappings to a file (specified by `output_file`)
     separator : str
@@ -77,6 +88,27 @@ def map_terms(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_
         Include unmapped terms in the output data frame
     bioportal_apikey : str
         BioPortal API Key to use along with the BioPortal mapper option
+    n_jobs : int
+        Number of threads used by the TF-IDF and syntactic mappers to compute mapping scores (-1 to use all processors)
+        Other values below 1 raise a ValueError
+    skip_fuzzy_if_exact : bool
+        Map source terms that exactly match a label or synonym of an ontology term (once both are normalized) only to
+        the exactly matching ontology terms, without computing the similarity scores of other ontology terms
+    max_candidates : int
+        When greater than 0, syntactic mappers score only the top `max_candidates` ontology terms of each source term
+        by TF-IDF score, rather than all ontology terms, which is much faster for large ontologies
+    world_folder : str
+        Folder of persistent owlready2 worlds (SQLite files). When given, the target ontology is parsed once into a
+        world file in this folder, keyed by the ontology IRI and document version, and subsequent calls open that
+        world file instead of parsing the ontology again
+    loader : ontology_loader.OntologyLoader
+        Way of reading the terms of the target ontology. One of: owlready2 (load the ontology and its imports into
+        owlready2), streaming (read only the term details needed for mapping from the ontology document, which needs
+        far less memory for large ontologies in RDF/XML, OBO or OWL functional syntax)
+    download_folder : str
+        Folder of downloaded ontology documents. When given, a target ontology given by URL (or by a bioregistry
+        acronym) is downloaded once into this folder, and later calls read the local copy, which is revalidated with the
+        server (using the ETag and Last-Modified headers of the download) and downloaded again only if it has changed
 
     Returns
     ----------
@@ -84,28 +116,21 @@ def map_terms(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_
         Data frame containing the generated ontology mappings
     """
     # Parse the possible source terms options and tags
-    source_terms, source_term_ids, tags = _parse_source_terms(source_terms, source_terms_ids, csv_columns, separator)
-    # Create source term IDs if they are not provided
-    if len(source_terms_ids) != len(source_terms):
-        if len(source_terms_ids) > 0:
-            LOGGER.warning(f"The number of Source Term IDs provided ({len(source_terms_ids)}) is different than the "
-                           f"number of Source Terms ({len(source_terms)}). New Source Term IDs will be used instead.")
-        source_terms_ids = onto_utils.generate_iris(len(source_terms))
+    source_terms, source_terms_ids, tags = _get_source_terms(source_terms, source_terms_ids, csv_columns, separator)
     # Create the output file
     if output_file == '':
-        timestamp = datetime.datetime.now().strftime("%d-%m-%YT%H-%M-%S")
-        output_file = "t2t-mappings-" + timestamp + ".csv"
-    # Load the ontology for either Zooma, Bioportal, or directly
-    if mapper in {Mapper.ZOOMA, Mapper.BIOPORTAL}:
-        target_terms = '' if target_ontology.lower() == 'all' else target_ontology
-    else:
-        target_terms = _load_ontology(target_ontology, base_iris, excl_deprecated, use_cache, term_type)
+        output_file = _default_output_file()
+    # Load the ontology for either Zooma, Bioportal, or directly, and the term mappers
+    target_terms, term_mapper, exact_mapper = _load_target(target_ontology, base_iris, excl_deprecated, use_cache,
+                                                           term_type, mapper, max_candidates, bioportal_apikey,
+                                                           world_folder, loader, download_folder,
+                                                           lean=not save_graphs)
     # Run the mapper
     LOGGER.info(f"Mapping {len(source_terms)} source terms to {target_ontology}")
     mappings_df = _do_mapping(source_terms, source_terms_ids, target_terms, mapper, max_mappings, min_score, tags,
-                              incl_unmapped, bioportal_apikey)
-    if not mappings_df.empty:
-        mappings_df["Mapping Score"] = mappings_df["Mapping Score"].astype(float).round(decimals=3)
+                              incl_unmapped, bioportal_apikey, term_mapper=term_mapper, n_jobs=n_jobs,
+                              exact_mapper=exact_mapper, skip_fuzzy_if_exact=skip_fuzzy_if_exact,
+                              max_candidates=max_candidates)
     if save_mappings:
         _save_mappings(mappings_df, output_file, min_score, mapper, target_ontology, base_iris,
                        excl_deprecated, max_mappings, term_type, source_terms, incl_unmapped)
@@ -114,17 +139,133 @@ def map_terms(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_
     return mappings_df
 
 
+def map_terms_iter(source_terms, target_ontology, base_iris=(), csv_columns=(), excl_deprecated=False, max_mappings=3,
+                   min_score=0.3, mapper=Mapper.TFIDF, source_terms_ids=(), separator=',', use_cache=False,
+                   term_type=OntologyTermType.CLASS, incl_unmapped=False, bioportal_apikey="", n_jobs=1,
+                   skip_fuzzy_if_exact=False, max_candidates=0, chunk_size=50000, world_folder=None,
+                   loader=OntologyLoader.OWLREADY2, download_folder=None):
+    """
+    Maps the given source terms to the specified target ontology in chunks, reading and mapping one chunk of source
+    terms at a time, so that memory use is bounded by the chunk size rather than by the number of source terms.
+    The target ontology is loaded, and the term mapper is built, only once.
+
+    Parameters
+    ----------
+    chunk_size : int
+        Maximum number of source terms read and mapped at a time
+    All other parameters have the same meaning as the homonymous parameters of `map_terms`
+
+    Returns
+    ----------
+    generator
+        Generator of data frames containing the ontology mappings generated for each chunk of source terms
+    """
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be a positive integer")
+    target_terms, term_mapper, exact_mapper = _load_target(target_ontology, base_iris, excl_deprecated, use_cache,
+                                                           term_type, mapper, max_candidates, bioportal_apikey,
+                                                           world_folder, loader, download_folder, lean=True)
+    for chunk, chunk_ids in _iter_source_terms(source_terms, source_terms_ids, csv_columns, separator, chunk_size):
+        if len(chunk) == 0:
+            continue
+        chunk_terms, chunk_ids, tags = _get_source_terms(chunk, chunk_ids)
+        LOGGER.info(f"Mapping {len(chunk_terms)} source terms to {target_ontology}")
+        yield _do_mapping(chunk_terms, chunk_ids, target_terms, mapper, max_mappings, min_score, tags, incl_unmapped,
+                          bioportal_apikey, term_mapper=term_mapper, n_jobs=n_jobs, exact_mapper=exact_mapper,
+                          skip_fuzzy_if_exact=skip_fuzzy_if_exact, max_candidates=max_candidates)
+
+
 # Caches a single ontology
-def cache_ontology(ontology_url, ontology_acronym="", base_iris=()):
+def cache_ontology(ontology_url, ontology_acronym="", base_iris=(), world_folder=None,
+                   loader=OntologyLoader.OWLREADY2, download_folder=None):
     if ontology_acronym == "":
         ontology_acronym = ontology_url
-    ontology_terms = _load_ontology(ontology_url, base_iris, exclude_deprecated=False, term_type=OntologyTermType.ANY)
-    cache_dir = os.path.join("cache", ontology_acronym)
-    LOGGER.info(f"Caching ontology {ontology_url} to: {cache_dir}")
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-    _serialize_ontology(ontology_terms, ontology_acronym, cache_dir)
-    _save_graphs(ontology_terms, output_file=os.path.join(cache_dir, ontology_acronym))
+    loader = OntologyLoader(loader)
+    requested = time.time()
+    # processes that cache the same ontology concurrently take turns, and a process that waited for another one to cache
+    # the ontology from the same source uses that cached ontology rather than caching it again
+    with onto_cache._build_lock(ontology_acronym):
+        if onto_cache._get_recent_manifest(ontology_acronym, ontology_url, base_iris, loader.value,
+                                           requested) is not None:
+            LOGGER.info(f"Ontology {ontology_url} was cached by another process to: "
+                        f"{onto_cache._cache_dir(ontology_acronym)}")
+            return onto_cache.OntologyCache(ontology_acronym)
+        ontology_metadata = dict()
+        ontology_terms = _load_ontology(ontology_url, base_iris, exclude_deprecated=False,
+                                        term_type=OntologyTermType.ANY, world_folder=world_folder, loader=loader,
+                                        download_folder=download_folder, ontology_metadata=ontology_metadata)
+        LOGGER.info(f"Caching ontology {ontology_url} to: {onto_cache._cache_dir(ontology_acronym)}")
+        # the cached ontology is built in a temporary directory that then replaces the cache directory at once, so
+        # readers never see a partially cached ontology
+        temp_cache_dir = onto_cache._make_temp_cache_dir(ontology_acronym)
+        try:
+            _serialize_ontology(ontology_terms, ontology_acronym, temp_cache_dir)
+            label_index = _serialize_label_index(ontology_terms, ontology_acronym, temp_cache_dir)
+            _serialize_tfidf_index(ontology_terms, ontology_acronym, temp_cache_dir, label_index=label_index)
+            _save_graphs(ontology_terms, output_file=os.path.join(temp_cache_dir, ontology_acronym))
+            onto_cache._write_manifest(temp_cache_dir, ontology_acronym, ontology_url, ontology_metadata, base_iris,
+                                       loader.value, len(ontology_terms))
+            onto_cache._replace_cache_dir(ontology_acronym, temp_cache_dir)
+        except BaseException:
+            shutil.rmtree(temp_cache_dir, ignore_errors=True)
+            raise
+    ontology_terms.clear()
+    return onto_cache.OntologyCache(ontology_acronym)
+
+
+# Updates a cached ontology to a new version of the ontology, e.g., a new release. The new version is diffed against the
+# cached terms by IRI, labels, synonyms and (parent, child and instance) relations, and only the label and TF-IDF index
+# entries and the term graphs of the changed terms are rebuilt
+def update_cached_ontology(ontology_acronym, ontology_url=None, world_folder=None, loader=None, download_folder=None):
+    manifest = onto_cache.get_cache_manifest(ontology_acronym)
+    if manifest is None:
+        raise RuntimeError(f"Cached ontology {ontology_acronym} has no manifest, so it cannot be updated; cache it "
+                           f"again using cache_ontology")
+    if ontology_url is None:
+        ontology_url = manifest["source"]
+    loader = OntologyLoader(manifest["loader"] if loader is None else loader)
+    base_iris = tuple(manifest["base_iris"])
+    cache_dir = onto_cache._cache_dir(ontology_acronym)
+    cached_files = (_term_store_folder(ontology_acronym, cache_dir), _label_index_file(ontology_acronym, cache_dir),
+                    _tfidf_index_file(ontology_acronym, cache_dir), _graphs_file(ontology_acronym, cache_dir))
+    if manifest["text2term_version"] != VERSION or not all(os.path.exists(file) for file in cached_files):
+        LOGGER.info(f"Cached ontology {ontology_acronym} was cached by another text2term version or is missing files; "
+                    f"caching it again")
+        return cache_ontology(ontology_url, ontology_acronym, base_iris=base_iris, world_folder=world_folder,
+                              loader=loader, download_folder=download_folder)
+    with onto_cache._build_lock(ontology_acronym):
+        ontology_metadata = dict()
+        ontology_terms = _load_ontology(ontology_url, base_iris, exclude_deprecated=False,
+                                        term_type=OntologyTermType.ANY, world_folder=world_folder, loader=loader,
+                                        download_folder=download_folder, ontology_metadata=ontology_metadata)
+        LOGGER.info(f"Comparing ontology {ontology_url} with cached ontology {ontology_acronym}...")
+        cached_terms = OntologyTermStore(cached_files[0]).get_ontology_terms()
+        changed_labels, changed_graphs, removed = _diff_ontology_terms(cached_terms, ontology_terms)
+        LOGGER.info(f"...done: {len(set(ontology_terms) - set(cached_terms))} terms added, {len(removed)} removed, "
+                    f"and {len(changed_labels)} with changed labels or synonyms; {len(changed_graphs)} term graphs "
+                    f"changed")
+        update = {"previous_source": manifest["source"], "previous_version_iri": manifest["version_iri"],
+                  "previous_created": manifest["created"], "added_terms": len(set(ontology_terms) - set(cached_terms)),
+                  "removed_terms": len(removed), "changed_label_terms": len(changed_labels),
+                  "changed_graphs": len(changed_graphs)}
+        temp_cache_dir = onto_cache._make_temp_cache_dir(ontology_acronym)
+        try:
+            # the term store is columnar, so it is written again rather than patched
+            _serialize_ontology(ontology_terms, ontology_acronym, temp_cache_dir)
+            LOGGER.info("Updating the cached label and TF-IDF indexes of the changed ontology terms...")
+            label_index = LabelIndex.load(cached_files[1]).update(ontology_terms, changed_labels)
+            label_index.save(_label_index_file(ontology_acronym, temp_cache_dir))
+            TFIDFIndex.load(cached_files[2]).update(label_index).save(_tfidf_index_file(ontology_acronym,
+                                                                                        temp_cache_dir))
+            LOGGER.info("Updating the cached term graphs of the changed ontology terms...")
+            _update_graphs(ontology_terms, changed_graphs, cached_files[3],
+                           _graphs_file(ontology_acronym, temp_cache_dir))
+            onto_cache._write_manifest(temp_cache_dir, ontology_acronym, ontology_url, ontology_metadata, base_iris,
+                                       loader.value, len(ontology_terms), update=update)
+            onto_cache._replace_cache_dir(ontology_acronym, temp_cache_dir)
+        except BaseException:
+            shutil.rmtree(temp_cache_dir, ignore_errors=True)
+            raise
     ontology_terms.clear()
     return onto_cache.OntologyCache(ontology_acronym)
 
@@ -134,6 +275,52 @@ PRIVATE/HELPER FUNCTIONS
 """
 
 
+# Parses the source terms and creates source term IDs if they are not provided
+def _get_source_terms(source_terms, source_terms_ids=(), csv_columns=(), separator=','):
+    source_terms, source_term_ids, tags = _parse_source_terms(source_terms, source_terms_ids, csv_columns, separator)
+    source_terms_ids = _check_source_term_ids(source_terms, source_terms_ids)
+    if len(source_terms_ids) != len(source_terms):
+        source_terms_ids = onto_utils.generate_iris(len(source_terms))
+    return source_terms, source_terms_ids, tags
+
+
+# Gets the given source term IDs if there is one per source term, or else an empty tuple (so that new source term IDs
+# are generated), warning about any mismatched source term IDs given
+def _check_source_term_ids(source_terms, source_terms_ids):
+    if len(source_terms_ids) == len(source_terms):
+        return source_terms_ids
+    if len(source_terms_ids) > 0:
+        LOGGER.warning(f"The number of Source Term IDs provided ({len(source_terms_ids)}) is different than the "
+                       f"number of Source Terms ({len(source_terms)}). New Source Term IDs will be used instead.")
+    return ()
+
+
+# Yields chunks of the source terms (as lists or dictionaries of tagged terms) and their respective IDs
+def _iter_source_terms(source_terms, source_terms_ids, csv_columns, separator, chunk_size):
+    if isinstance(source_terms, str):
+        if len(csv_columns) >= 1:
+            term_id_col_name = csv_columns[1] if len(csv_columns) == 2 else ""
+            yield from onto_utils.parse_csv_file_chunks(source_terms, term_column_name=csv_columns[0],
+                                                        term_id_column_name=term_id_col_name,
+                                                        chunk_size=chunk_size, separator=separator)
+        else:
+            for terms in onto_utils.parse_list_file_chunks(source_terms, chunk_size):
+                yield terms, ()
+        return
+    source_terms_ids = _check_source_term_ids(source_terms, source_terms_ids)
+    items = list(source_terms.items()) if isinstance(source_terms, dict) else source_terms
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        if isinstance(source_terms, dict):
+            chunk = dict(chunk)
+        yield chunk, source_terms_ids[start:start + chunk_size]
+
+
+def _default_output_file():
+    timestamp = datetime.datetime.now().strftime("%d-%m-%YT%H-%M-%S")
+    return "t2t-mappings-" + timestamp + ".csv"
+
+
 # Parses the source terms and returns what is to be mapped, the term ids, and the tags
 def _parse_source_terms(source_terms, source_terms_ids=(), csv_columns=(), separator=','):
     # If source_terms is a string, we assume it is a file location
@@ -161,8 +348,140 @@ def _parse_source_terms(source_terms, source_terms_ids=(), csv_columns=(), separ
 
 
 def _serialize_ontology(ontology_terms, ontology_acronym, cache_dir):
-    with open(os.path.join(cache_dir, ontology_acronym + "-term-details.pickle"), 'wb+') as out_file:
-        pickle.dump(ontology_terms, out_file)
+    LOGGER.info("Writing the ontology term details to a columnar term store...")
+    OntologyTermStore.save(ontology_terms, _term_store_folder(ontology_acronym, cache_dir))
+
+
+def _serialize_label_index(ontology_terms, ontology_acronym, cache_dir):
+    LOGGER.info("Building index of the normalized ontology term labels and synonyms...")
+    label_index = LabelIndex(ontology_terms, normalize=onto_utils.normalize)
+    label_index.save(_label_index_file(ontology_acronym, cache_dir))
+    return label_index
+
+
+def _serialize_tfidf_index(ontology_terms, ontology_acronym, cache_dir, label_index=None):
+    LOGGER.info("Building TF-IDF index of the ontology term labels and synonyms...")
+    TFIDFIndex(ontology_terms, label_index=label_index).save(_tfidf_index_file(ontology_acronym, cache_dir))
+
+
+# Loads the cached indexes of the given ontology used by the given mapper
+def _load_indexes(ontology, mapper, use_cache, max_candidates=0):
+    label_index, tfidf_index = None, None
+    if use_cache and mapper not in WEB_MAPPERS:
+        # syntactic mappers use the TF-IDF index to retrieve candidate terms
+        if mapper == Mapper.TFIDF or max_candidates > 0:
+            tfidf_index = _load_tfidf_index(ontology)
+        # the TF-IDF index holds the index of the normalized labels and synonyms
+        if tfidf_index is not None:
+            label_index = tfidf_index.label_index
+        else:
+            label_index = _load_label_index(ontology)
+    return label_index, tfidf_index
+
+
+def _load_label_index(ontology):
+    index_file = _label_index_file(ontology, onto_cache._cache_dir(ontology))
+    with onto_cache._cache_lock(ontology, shared=True):
+        if not os.path.exists(index_file):
+            LOGGER.info(f"No cached label index found for {ontology}; the index will be built from the ontology terms")
+            return None
+        LOGGER.info(f"Loading cached label index from: {index_file}")
+        return LabelIndex.load(index_file)
+
+
+def _load_tfidf_index(ontology):
+    index_file = _tfidf_index_file(ontology, onto_cache._cache_dir(ontology))
+    with onto_cache._cache_lock(ontology, shared=True):
+        if not os.path.exists(index_file):
+            LOGGER.info(f"No cached TF-IDF index found for {ontology}; the index will be built from the ontology terms")
+            return None
+        LOGGER.info(f"Loading cached TF-IDF index from: {index_file}")
+        return TFIDFIndex.load(index_file)
+
+
+def _label_index_file(ontology_acronym, cache_dir):
+    return os.path.join(cache_dir, ontology_acronym + "-label-index.pickle")
+
+
+def _tfidf_index_file(ontology_acronym, cache_dir):
+    return os.path.join(cache_dir, ontology_acronym + "-tfidf-index.pickle")
+
+
+def _term_store_folder(ontology_acronym, cache_dir):
+    return os.path.join(cache_dir, ontology_acronym + "-term-store")
+
+
+def _graphs_file(ontology_acronym, cache_dir):
+    return os.path.join(cache_dir, ontology_acronym + "-term-graphs.json")
+
+
+# Compares the cached terms of an ontology with the terms of a new version of the ontology, and gets the IRIs of the
+# new terms whose labels or synonyms have changed, of the new terms whose term graphs have changed, and of the removed
+# terms. The term graph of a term holds its labels, parents, children and instances, and the parents of its ancestors
+def _diff_ontology_terms(cached_terms, ontology_terms):
+    changed_labels, changed_graphs, changed_parents = set(), set(), set()
+    for iri, term in ontology_terms.items():
+        if iri not in cached_terms:
+            changed_labels.add(iri)
+            changed_graphs.add(iri)
+            changed_parents.add(iri)
+            continue
+        cached_term = cached_terms[iri]
+        labels_changed = _as_strings(term.labels) != cached_term.labels
+        if labels_changed or _as_strings(term.synonyms) != cached_term.synonyms:
+            changed_labels.add(iri)
+        if _as_string_dict(term.parents) != cached_term.parents:
+            changed_parents.add(iri)
+        elif labels_changed or _as_string_dict(term.children) != cached_term.children or \
+                _as_string_dict(term.instances) != cached_term.instances:
+            changed_graphs.add(iri)
+    removed = {iri for iri in cached_terms if iri not in ontology_terms}
+    # the term graphs of the descendants of the terms whose parents have changed, or that were added or removed, have
+    # changed as well
+    children = dict()
+    for iri, term in ontology_terms.items():
+        for parent_iri in term.parents:
+            children.setdefault(parent_iri, []).append(iri)
+    pending = list(changed_parents | removed)
+    while len(pending) > 0:
+        iri = pending.pop()
+        for child_iri in children.get(iri, ()):
+            if child_iri not in changed_parents:
+                changed_parents.add(child_iri)
+                pending.append(child_iri)
+    changed_graphs |= changed_parents & ontology_terms.keys()
+    return changed_labels, changed_graphs, removed
+
+
+def _as_strings(values):
+    return {str(value) for value in values}
+
+
+def _as_string_dict(dictionary):
+    return {str(key): str(value) for key, value in dictionary.items()}
+
+
+# Writes the term graphs of the given ontology terms to the given output file, reusing the term graphs in the given
+# graphs file (as written by `_save_graphs`) of the terms whose graphs have not changed
+def _update_graphs(terms, changed_iris, graphs_file, output_file):
+    cached_graphs = dict()
+    with open(graphs_file, "r") as json_file:
+        content = json_file.read()
+    # the term graphs are written with an indent of 2, so the graphs are separated by closing braces at that indent
+    if content.startswith("[\n  {\n") and content.endswith("\n  }\n]"):
+        for graph in content[len("[\n"):-len("\n  }\n]")].split("\n  },\n"):
+            iri_line = graph.split("\n", 2)[1].strip()
+            cached_graphs[json.loads(iri_line[len('"iri": '):-1])] = graph + "\n  }"
+    graph_generator = TermGraphGenerator(terms)
+    graphs = []
+    for iri, term in terms.items():
+        graph = cached_graphs.get(iri)
+        if graph is None or iri in changed_iris:
+            # indent the graph as an element of the list of term graphs
+            graph = "  " + json.dumps(graph_generator.graph(term).as_dict(), indent=2).replace("\n", "\n  ")
+        graphs.append(graph)
+    with open(output_file, "w") as json_file:
+        json_file.write(("[\n" + ",\n".join(graphs) + "\n]") if len(graphs) > 0 else "[]")
 
 
 def _load_data(input_file_path, csv_column_names, separator):
@@ -179,17 +498,31 @@ def _load_data(input_file_path, csv_column_names, separator):
     return terms, term_ids
 
 
-def _load_ontology(ontology, iris, exclude_deprecated, use_cache=False, term_type=OntologyTermType.CLASS):
+def _load_ontology(ontology, iris, exclude_deprecated, use_cache=False, term_type=OntologyTermType.CLASS,
+                   world_folder=None, loader=OntologyLoader.OWLREADY2, download_folder=None, lean=False,
+                   ontology_metadata=None):
     if use_cache:
-        pickle_file = os.path.join("cache", ontology, ontology + "-term-details.pickle")
-        LOGGER.info(f"Loading cached ontology from: {pickle_file}")
-        with open(pickle_file, "rb") as cached_ontology_pickle:
-            onto_terms_unfiltered = pickle.load(cached_ontology_pickle)
-            onto_terms = filter_terms(onto_terms_unfiltered, iris, exclude_deprecated, term_type)
+        onto_cache.validate_cache(ontology, iris)
+        cache_dir = onto_cache._cache_dir(ontology)
+        store_folder = _term_store_folder(ontology, cache_dir)
+        pickle_file = os.path.join(cache_dir, ontology + "-term-details.pickle")
+        # the term store is memory mapped, so it remains readable once opened even if the ontology is cached again
+        with onto_cache._cache_lock(ontology, shared=True):
+            if os.path.exists(store_folder) or not os.path.exists(pickle_file):
+                LOGGER.info(f"Loading cached ontology from: {store_folder}")
+                onto_terms = OntologyTermStore(store_folder).get_ontology_terms(iris, exclude_deprecated, term_type)
+            else:  # ontologies cached by earlier versions of text2term
+                LOGGER.info(f"Loading cached ontology from: {pickle_file}")
+                with open(pickle_file, "rb") as cached_ontology_pickle:
+                    onto_terms_unfiltered = pickle.load(cached_ontology_pickle)
+                    onto_terms = filter_terms(onto_terms_unfiltered, iris, exclude_deprecated, term_type)
     else:
-        term_collector = OntologyTermCollector(ontology_iri=ontology)
+        term_collector = OntologyTermCollector(ontology_iri=ontology, world_folder=world_folder, loader=loader,
+                                               download_folder=download_folder)
         onto_terms = term_collector.get_ontology_terms(base_iris=iris, exclude_deprecated=exclude_deprecated,
-                                                       term_type=term_type)
+                                                       term_type=term_type, lean=lean)
+        if ontology_metadata is not None:
+            ontology_metadata.update(term_collector.get_ontology_metadata())
         term_collector.close()
     LOGGER.info(f"Filtered ontology terms to those of type: {term_type}")
     if len(onto_terms) == 0:
@@ -197,27 +530,112 @@ def _load_ontology(ontology, iris, exclude_deprecated, use_cache=False, term_typ
     return onto_terms
 
 
-def _do_mapping(source_terms, source_term_ids, ontology_terms, mapper, max_mappings, min_score, tags, incl_unmapped,
-                bioportal_apikey):
-    to_map, tags = _process_tags(source_terms, tags)
-    start = time.time()
+# Loads the terms of the target ontology and builds the term mappers used by the given mapper. The terms and term
+# mappers of a cached ontology are kept in the memory cache of this process, and reused by later calls for the same
+# ontology, filters and mapper
+def _load_target(target_ontology, base_iris, excl_deprecated, use_cache, term_type, mapper, max_candidates,
+                 bioportal_apikey, world_folder, loader, download_folder, lean):
+    if mapper in WEB_MAPPERS:
+        target_terms = '' if target_ontology.lower() == 'all' else target_ontology
+        return target_terms, _get_term_mapper(mapper, target_terms, bioportal_apikey), None
+    memory_cache, key = get_memory_cache(), None
+    if use_cache:
+        key = _memory_cache_key(target_ontology, base_iris, term_type, excl_deprecated, mapper)
+        if key in memory_cache:
+            # the cached ontology may have been cached again since its terms were kept in memory
+            onto_cache.validate_cache(target_ontology, base_iris)
+            target = memory_cache.get(key, version=_get_cache_version(target_ontology))
+            if target is not None:
+                LOGGER.info(f"Using the ontology terms and term mappers of {target_ontology} kept in memory")
+                term_mapper = target["term_mapper"]
+                if mapper in SYNTACTIC_MAPPERS and max_candidates > 0 and term_mapper.candidate_mapper is None:
+                    tfidf_index = _load_tfidf_index(target_ontology)
+                    if tfidf_index is not None:
+                        term_mapper.candidate_mapper = TFIDFMapper(target["terms"], index=tfidf_index)
+                        memory_cache.put(key, target, version=_get_cache_version(target_ontology))
+                return target["terms"], term_mapper, target["exact_mapper"]
+    target_terms = _load_ontology(target_ontology, base_iris, excl_deprecated, use_cache, term_type,
+                                  world_folder=world_folder, loader=loader, download_folder=download_folder, lean=lean)
+    # Load the label and TF-IDF indexes of the ontology, if they have been cached
+    label_index, tfidf_index = _load_indexes(target_ontology, mapper, use_cache, max_candidates)
+    term_mapper = _get_term_mapper(mapper, target_terms, bioportal_apikey, tfidf_index)
+    exact_mapper = _get_exact_mapper(mapper, target_terms, label_index)
+    if key is not None:
+        memory_cache.put(key, {"terms": target_terms, "term_mapper": term_mapper, "exact_mapper": exact_mapper},
+                         version=_get_cache_version(target_ontology))
+    return target_terms, term_mapper, exact_mapper
+
+
+# Gets the key of the memory cache entry of the given cached ontology, filters and mapper
+def _memory_cache_key(ontology, base_iris, term_type, excl_deprecated, mapper):
+    if isinstance(base_iris, str):
+        base_iris = (base_iris,)
+    return (ontology, tuple(base_iris), getattr(term_type, "value", term_type), bool(excl_deprecated),
+            getattr(mapper, "value", mapper))
+
+
+# Gets the version of the given cached ontology, which is the time it was cached (if it has a manifest)
+def _get_cache_version(ontology):
+    manifest = onto_cache.get_cache_manifest(ontology)
+    return None if manifest is None else manifest["created"]
+
+
+def _get_term_mapper(mapper, ontology_terms, bioportal_apikey="", tfidf_index=None):
     if mapper == Mapper.TFIDF:
-        term_mapper = TFIDFMapper(ontology_terms)
-        mappings_df = term_mapper.map(to_map, source_term_ids, max_mappings=max_mappings, min_score=min_score)
+        return TFIDFMapper(ontology_terms, index=tfidf_index)
     elif mapper == Mapper.ZOOMA:
-        term_mapper = ZoomaMapper()
-        mappings_df = term_mapper.map(to_map, source_term_ids, ontologies=ontology_terms, max_mappings=max_mappings)
+        return ZoomaMapper()
     elif mapper == Mapper.BIOPORTAL:
-        if bioportal_apikey == "":
-            LOGGER.error("A BioPortal API Key must be specified via the parameter `bioportal_apikey`")
-            return pd.DataFrame()
-        term_mapper = BioPortalAnnotatorMapper(bioportal_apikey)
-        mappings_df = term_mapper.map(to_map, source_term_ids, ontologies=ontology_terms, max_mappings=max_mappings)
-    elif mapper in {Mapper.LEVENSHTEIN, Mapper.JARO, Mapper.JARO_WINKLER, Mapper.INDEL, Mapper.FUZZY, Mapper.JACCARD}:
-        term_mapper = SyntacticMapper(ontology_terms)
-        mappings_df = term_mapper.map(to_map, source_term_ids, mapper, max_mappings=max_mappings)
+        return BioPortalAnnotatorMapper(bioportal_apikey)
+    elif mapper in SYNTACTIC_MAPPERS:
+        candidate_mapper = None if tfidf_index is None else TFIDFMapper(ontology_terms, index=tfidf_index)
+        return SyntacticMapper(ontology_terms, candidate_mapper=candidate_mapper)
     else:
         raise ValueError("Unsupported mapper: " + mapper)
+
+
+# Gets the mapper of source terms to ontology terms with identical (normalized) labels, or None for Web API mappers
+def _get_exact_mapper(mapper, ontology_terms, label_index=None):
+    if mapper in WEB_MAPPERS:
+        return None
+    return ExactMapper(ontology_terms, index=label_index)
+
+
+# Maps the given source terms with the given prebuilt term mapper and exact mapper (None for Web API mappers)
+def _do_mapping(source_terms, source_term_ids, ontology_terms, mapper, max_mappings, min_score, tags, incl_unmapped,
+                bioportal_apikey, term_mapper, exact_mapper, n_jobs=1, skip_fuzzy_if_exact=False, max_candidates=0):
+    to_map, tags = _process_tags(source_terms, tags)
+    if mapper == Mapper.BIOPORTAL and bioportal_apikey == "":
+        LOGGER.error("A BioPortal API Key must be specified via the parameter `bioportal_apikey`")
+        return pd.DataFrame()
+    start = time.time()
+    # Map each distinct source term once, identified by its position in the list of distinct terms
+    to_map_pairs = list(zip(to_map, source_term_ids))
+    unique_terms, occurrences = _get_unique_source_terms([term for term, _ in to_map_pairs], mapper)
+    unique_term_ids = list(range(len(unique_terms)))
+    LOGGER.debug("Mapping %i distinct source terms...", len(unique_terms))
+    # Resolve the source terms that exactly match ontology term labels/synonyms
+    exact_mappings_df = None
+    if exact_mapper is not None:
+        exact_mappings_df, is_exact = exact_mapper.map(unique_terms, unique_term_ids, max_mappings=max_mappings)
+        LOGGER.debug("Found exact mappings for %i distinct source terms", is_exact.sum())
+        if skip_fuzzy_if_exact:
+            unique_terms = [term for term, exact in zip(unique_terms, is_exact) if not exact]
+            unique_term_ids = [term_id for term_id, exact in zip(unique_term_ids, is_exact) if not exact]
+    if len(unique_terms) == 0:
+        mappings_df = pd.DataFrame()
+    elif mapper == Mapper.TFIDF:
+        mappings_df = term_mapper.map(unique_terms, unique_term_ids, max_mappings=max_mappings, min_score=min_score,
+                                      n_jobs=n_jobs)
+    elif mapper in WEB_MAPPERS:
+        mappings_df = term_mapper.map(unique_terms, unique_term_ids, ontologies=ontology_terms,
+                                      max_mappings=max_mappings)
+    else:
+        mappings_df = term_mapper.map(unique_terms, unique_term_ids, mapper, max_mappings=max_mappings,
+                                      n_jobs=n_jobs, max_candidates=max_candidates, min_score=min_score)
+    if exact_mappings_df is not None:
+        mappings_df = _add_exact_mappings(mappings_df, exact_mappings_df, max_mappings)
+    mappings_df = _expand_mappings(mappings_df, to_map_pairs, occurrences)
     LOGGER.info("...done (mapping time: %.2fs seconds)", time.time() - start)
 
     # Filter terms by the mapping score specified
@@ -237,15 +655,72 @@ def _do_mapping(source_terms, source_term_ids, ontology_terms, mapper, max_mappi
         mappings_df = _add_unmapped_terms(mappings_df, tags, source_terms, source_term_ids)
         LOGGER.debug("...done (adding unmapped time: %.2fs seconds)", time.time() - start_unmapped)
 
-    # Add tags
+    # Add tags and round the mapping scores
     if not mappings_df.empty:
         LOGGER.debug("Adding tags...")
         start_tagging = time.time()
         mappings_df = _add_tags_to_df(mappings_df, tags)
         LOGGER.debug("...done (adding tags time: %.2fs seconds)", time.time() - start_tagging)
+        mappings_df["Mapping Score"] = mappings_df["Mapping Score"].astype(float).round(decimals=3)
     return mappings_df
 
 
+def _get_unique_source_terms(source_terms, mapper):
+    """
+    Get the distinct source terms to be mapped. The TF-IDF mapper compares normalized strings, so source terms that
+    have the same normalized string are mapped once. The other mappers compare source terms as they are given
+    :return: List of distinct source terms, and the position in that list of each of the given source terms
+    """
+    unique_positions = dict()
+    unique_terms, occurrences = [], []
+    for term in source_terms:
+        key = onto_utils.normalize(term) if mapper == Mapper.TFIDF else term
+        if key not in unique_positions:
+            unique_positions[key] = len(unique_terms)
+            unique_terms.append(term)
+        occurrences.append(unique_positions[key])
+    return unique_terms, occurrences
+
+
+def _expand_mappings(mappings_df, source_term_pairs, occurrences):
+    """
+    Expand the mappings of the distinct source terms, whose IDs are their positions in the list of distinct terms, into
+    the mappings of each of the given source terms, in the order of the given source terms
+    :param mappings_df: Data frame containing the mappings of the distinct source terms
+    :param source_term_pairs: List of (source term, source term ID) pairs
+    :param occurrences: Position in the list of distinct source terms of each of the given source terms
+    """
+    if mappings_df.empty:
+        return mappings_df
+    occurrences_df = pd.DataFrame({
+        "Distinct Term": occurrences,
+        TermMapping.SRC_TERM: [term for term, _ in source_term_pairs],
+        TermMapping.SRC_TERM_ID: [term_id for _, term_id in source_term_pairs]
+    })
+    distinct_mappings_df = mappings_df.drop(columns=TermMapping.SRC_TERM)
+    distinct_mappings_df = distinct_mappings_df.rename(columns={TermMapping.SRC_TERM_ID: "Distinct Term"})
+    # an inner merge keeps the order of the source terms, and the order of the mappings of each source term
+    expanded_df = occurrences_df.merge(distinct_mappings_df, on="Distinct Term", how="inner")
+    return expanded_df[mappings_df.columns]
+
+
+def _add_exact_mappings(mappings_df, exact_mappings_df, max_mappings):
+    """
+    Add the given exact mappings to the mappings of the same source terms, so that the exactly matching ontology terms
+    rank first, and keep the top 'max_mappings' distinct ontology terms of each source term. The source term IDs are
+    the positions of the distinct source terms, so sorting by ID keeps the order of the source terms
+    """
+    if exact_mappings_df.empty:
+        return mappings_df
+    if mappings_df.empty:
+        return exact_mappings_df
+    all_mappings_df = pd.concat([exact_mappings_df, mappings_df[exact_mappings_df.columns]], ignore_index=True)
+    all_mappings_df = all_mappings_df.sort_values([TermMapping.SRC_TERM_ID, TermMapping.MAPPING_SCORE],
+                                                  ascending=[True, False], kind="stable")
+    all_mappings_df = all_mappings_df.drop_duplicates([TermMapping.SRC_TERM_ID, TermMapping.TGT_TERM_IRI])
+    return all_mappings_df.groupby(TermMapping.SRC_TERM_ID, sort=False).head(max_mappings).reset_index(drop=True)
+
+
 # Takes in the tags and source terms and processes them accordingly
 def _process_tags(source_terms, tags):
     to_map = []
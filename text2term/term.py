@@ -12,7 +12,7 @@ class OntologyTermType(str, Enum):
 class OntologyTerm:
 
     def __init__(self, iri, labels, definitions=(), synonyms=(), parents=(), children=(), instances=(), restrictions=(),
-                 deprecated=False, term_type=OntologyTermType.CLASS):
+                 deprecated=False, term_type=OntologyTermType.CLASS, details_loader=None):
         """
         Constructor for a succinct representation of an ontology term
         :param iri: IRI of the ontology term
@@ -25,6 +25,10 @@ class OntologyTerm:
         :param restrictions: Dictionary containing complex class restrictions (such as located_in.Hand) on this term
         :param deprecated: true if term is stated to be owl:deprecated, false otherwise
         :param term_type: Type of term: class or property
+        :param details_loader: Function that takes the IRI of the term and returns a dictionary with the definitions,
+                                parents, children, instances and restrictions of the term (keyed by those names). If
+                                given, these details are loaded by calling this function on first access to any of them,
+                                instead of being given here
         """
         self._iri = iri
         self._labels = labels
@@ -36,6 +40,7 @@ class OntologyTerm:
         self._restrictions = restrictions
         self._deprecated = deprecated
         self._term_type = term_type
+        self._details_loader = details_loader
 
     @property
     def iri(self):
@@ -60,6 +65,7 @@ class OntologyTerm:
          IAO:0000115 ('definition') annotation properties
         :return: set
         """
+        self._load_details()
         return self._definitions
 
     @property
@@ -76,6 +82,7 @@ class OntologyTerm:
         Returns a dictionary containing the IRIs of parent terms as keys, and their respective labels as values
         :return: dict
         """
+        self._load_details()
         return self._parents
 
     @property
@@ -84,6 +91,7 @@ class OntologyTerm:
         Returns a dictionary containing the IRIs of child terms as keys, and their respective labels as values
         :return: dict
         """
+        self._load_details()
         return self._children
 
     @property
@@ -92,6 +100,7 @@ class OntologyTerm:
         Returns a dictionary containing the IRIs of instance terms as keys, and their respective labels as values
         :return: dict
         """
+        self._load_details()
         return self._instances
 
     @property
@@ -105,6 +114,7 @@ class OntologyTerm:
         {':has_disease_location': ':pancreas | :liver'}
         :return: dict
         """
+        self._load_details()
         return self._restrictions
 
     @property
@@ -131,6 +141,22 @@ class OntologyTerm:
         """
         return self._term_type
 
+    def _load_details(self):
+        # terms pickled by earlier versions of text2term have no details loader
+        if getattr(self, "_details_loader", None) is not None:
+            details = self._details_loader(self._iri)
+            self._details_loader = None
+            self._definitions = details["definitions"]
+            self._parents = details["parents"]
+            self._children = details["children"]
+            self._instances = details["instances"]
+            self._restrictions = details["restrictions"]
+
+    def __getstate__(self):
+        # the details loader is not picklable, so the details of lean terms are loaded before pickling them
+        self._load_details()
+        return self.__dict__
+
     def __eq__(self, other):
         if isinstance(other, OntologyTerm):
             return self._iri == other._iri
@@ -3,53 +3,135 @@
 from owlready2 import *
 from text2term import onto_utils
 from text2term.term import OntologyTerm, OntologyTermType
+from text2term.term_streamer import OntologyTermStreamer
+from text2term.ontology_loader import OntologyLoader
+from text2term.download_cache import OntologyDownloadCache, is_url
+import os
+import hashlib
 import logging
 import bioregistry
+from contextlib import ExitStack
 
 
 class OntologyTermCollector:
 
-    def __init__(self, ontology_iri, use_reasoning=False, log_level=logging.INFO):
+    def __init__(self, ontology_iri, use_reasoning=False, log_level=logging.INFO, world_folder=None,
+                 loader=OntologyLoader.OWLREADY2, download_folder=None):
         """
         Construct an ontology term collector for the ontology at the given IRI
         :param ontology_iri: IRI of the ontology (e.g., path of ontology document in the local file system, URL)
         :param use_reasoning: Use a reasoner to compute inferred class hierarchy
+        :param world_folder: Folder of persistent owlready2 worlds (SQLite quadstores). If given, the ontology is parsed
+                                into a world file in this folder, keyed by the ontology IRI and the version of the
+                                ontology document, and collectors of the same ontology version open that world file
+                                instead of parsing the ontology again. If not given, the ontology is parsed into the
+                                in-memory default world of owlready2
+        :param loader: Way of reading the ontology terms: 'owlready2' loads the ontology (and its imports) into
+                        owlready2, while 'streaming' reads only the term details needed for mapping from the ontology
+                        document (RDF/XML, OBO or OWL functional syntax, optionally gzipped) with an
+                        OntologyTermStreamer, which needs far less memory for large ontologies. The streaming loader
+                        does not support reasoning, and ignores the world folder
+        :param download_folder: Folder of an OntologyDownloadCache. If given, an ontology document at a URL (or at the
+                                download URL of an ontology acronym in bioregistry) is read from its local copy in this
+                                folder, which is downloaded only if it is missing or has changed on the server.
+                                Imported ontologies are not cached
         """
         self.logger = onto_utils.get_logger(__name__, level=log_level)
-        self.ontology = self._load_ontology(ontology_iri)
+        if download_folder is not None:
+            ontology_iri = self._get_cached_document(ontology_iri, download_folder, log_level)
+        self.world_folder = world_folder
+        # shared lock on the world files of the ontology, held while this collector has its world file open
+        self._world_lock = ExitStack()
+        self.loader = OntologyLoader(loader)
+        if self.loader == OntologyLoader.STREAMING:
+            if use_reasoning:
+                raise ValueError("Reasoning requires the ontology to be loaded with the 'owlready2' loader")
+            self.ontology = None
+            self._term_streamer = OntologyTermStreamer(ontology_iri, log_level=log_level)
+        else:
+            self.ontology = self._load_ontology(ontology_iri)
         if use_reasoning:
             self._classify_ontology(self.ontology)
+        # annotation values and subjects read in bulk from the quadstore of the ontology during a bulk collection
+        self._bulk_ontology = None
+        self._bulk_values = dict()
+        self._bulk_subjects = dict()
+        self._bulk_iris = dict()
+        self._lean = False
+        self._closed = False
 
-    def get_ontology_terms(self, base_iris=(), exclude_deprecated=False, term_type=OntologyTermType.ANY):
+    def get_ontology_terms(self, base_iris=(), exclude_deprecated=False, term_type=OntologyTermType.ANY, bulk=True,
+                           lean=False):
         """
         Collect the terms described in the ontology at the specified IRI
         :param base_iris: Limit ontology term collection to terms whose IRIs start with any IRI given in this tuple
         :param exclude_deprecated: Exclude ontology terms stated as deprecated using owl:deprecated 'true'
         :param term_type: Type of term--can be 'class' or 'property' or 'any' (individuals may be added in the future)
+        :param bulk: Read the labels, synonyms, definitions, deprecation flags, children and instances of all terms
+                        with one query per annotation property (or relation) against the owlready2 quadstore, rather
+                        than with several queries per term. The collected terms are the same either way
+        :param lean: Collect only the term details needed for mapping (labels, synonyms, deprecation flag and term
+                        type). The other details of each term (parents, restrictions, children, instances and
+                        definitions) are collected from the ontology on first access, which requires this collector to
+                        be open. The streaming loader always collects all term details
         :return: Dictionary of ontology term IRIs and their respective details in the specified ontology
         """
+        if self.loader == OntologyLoader.STREAMING:
+            return self._term_streamer.get_ontology_terms(base_iris, exclude_deprecated, term_type)
         self.logger.info("Collecting ontology term details...")
         start = time.time()
+        if bulk:
+            self._bulk_ontology = self.ontology
+        self._lean = lean
+        try:
+            ontology_terms = self._collect_ontology_terms(base_iris, exclude_deprecated, term_type)
+        finally:
+            self._lean = False
+            self._bulk_ontology = None
+            self._bulk_values, self._bulk_subjects, self._bulk_iris = dict(), dict(), dict()
+        end = time.time()
+        self.logger.info("...done: collected %i ontology terms (collection time: %.2fs)", len(ontology_terms),
+                         end - start)
+        return ontology_terms
+
+    def filter_terms(self, onto_terms, iris=(), excl_deprecated=False, term_type=OntologyTermType.ANY):
+        return filter_terms(onto_terms, iris, excl_deprecated, term_type)
+
+    def get_ontology_metadata(self):
+        """
+        Get the document the ontology of this collector was read from, and the IRI and version IRI declared in it. With
+        the 'streaming' loader, the IRIs are only known once the ontology terms have been collected
+        :return: Dictionary with the 'document' (path or URL), 'ontology_iri' and 'version_iri' (or None) of the
+                    ontology
+        """
+        if self.ontology is None:
+            return {"document": self._term_streamer.ontology_iri, "ontology_iri": self._term_streamer.declared_iri,
+                    "version_iri": self._term_streamer.version_iri}
+        world = self.ontology.world
+        version_iri = None
+        version_iri_property = world._abbreviate("http://www.w3.org/2002/07/owl#versionIRI", False)
+        if version_iri_property is not None:
+            version_iri = world._get_obj_triple_sp_o(self.ontology.storid, version_iri_property)
+            if version_iri is not None:
+                version_iri = world._unabbreviate(version_iri)
+        return {"document": self._ontology_document, "ontology_iri": world._unabbreviate(self.ontology.storid),
+                "version_iri": version_iri}
+
+    def _collect_ontology_terms(self, base_iris, exclude_deprecated, term_type):
         ontology_terms = dict()
         if len(base_iris) > 0:
             for iri in base_iris:
                 iri = iri.strip()
                 query = iri + "*"
                 self.logger.info("...collecting terms with IRIs starting in: " + iri)
-                iris = list(default_world.search(iri=query))
+                iris = list(self.ontology.world.search(iri=query))
                 ontology_terms = ontology_terms | self._get_ontology_terms(iris, self.ontology, exclude_deprecated,
                                                                            term_type)
         else:
             ontology_signature = self._get_ontology_signature(self.ontology)
             ontology_terms = self._get_ontology_terms(ontology_signature, self.ontology, exclude_deprecated, term_type)
-        end = time.time()
-        self.logger.info("...done: collected %i ontology terms (collection time: %.2fs)", len(ontology_terms),
-                         end - start)
         return ontology_terms
 
-    def filter_terms(self, onto_terms, iris=(), excl_deprecated=False, term_type=OntologyTermType.ANY):
-        return filter_terms(onto_terms, iris, excl_deprecated, term_type)
-
     def _get_ontology_signature(self, ontology):
         signature = list(ontology.classes())
         signature.extend(list(ontology.properties()))
@@ -61,19 +143,19 @@ class OntologyTermCollector:
 
     def _get_ontology_terms(self, term_list, ontology, exclude_deprecated, term_type):
         ontology_terms = dict()
+        details_loader = self._get_term_details
+        if self._bulk_ontology is not None:
+            self._bulk_iris.update((term.storid, term.iri) for term in term_list if self._is_bulk_term(term))
         for ontology_term in term_list:
             # Parse if should include ontology classes, properties, or both
             include = _filter_term_type(ontology_term, term_type, False)
             if include and ontology_term is not Thing and ontology_term is not Nothing:
-                if (exclude_deprecated and not deprecated[ontology_term]) or (not exclude_deprecated):
+                deprecation = self._get_deprecation(ontology_term)
+                if (exclude_deprecated and not deprecation) or (not exclude_deprecated):
                     iri = ontology_term.iri
                     labels = self._get_labels(ontology_term)
                     synonyms = self._get_synonyms(ontology_term)
-                    named_parents, complex_parents = self._get_parents(ontology_term)
-                    children = self._get_children(ontology_term, ontology)
-                    instances = self._get_instances(ontology_term, ontology)
-                    definitions = self._get_definitions(ontology_term)
-                    is_deprecated = deprecated[ontology_term] == [True]
+                    is_deprecated = deprecation == [True]
                     if _filter_term_type(ontology_term, OntologyTermType.CLASS, False):
                         owl_term_type = OntologyTermType.CLASS
                     elif _filter_term_type(ontology_term, OntologyTermType.PROPERTY, False):
@@ -81,15 +163,41 @@ class OntologyTermCollector:
                     else:
                         owl_term_type = "undetermined"
                         self.logger.warn("Term has undetermined type %s %s", iri, labels)
-                    term_details = OntologyTerm(iri, labels, definitions=definitions, synonyms=synonyms,
-                                                parents=named_parents, children=children, instances=instances,
-                                                restrictions=complex_parents, deprecated=is_deprecated,
-                                                term_type=owl_term_type)
+                    if self._lean:
+                        term_details = OntologyTerm(iri, labels, synonyms=synonyms, deprecated=is_deprecated,
+                                                    term_type=owl_term_type, details_loader=details_loader)
+                    else:
+                        term_details = OntologyTerm(iri, labels, synonyms=synonyms, deprecated=is_deprecated,
+                                                    term_type=owl_term_type,
+                                                    **self._get_term_details(iri, ontology_term, ontology))
                     ontology_terms[iri] = term_details
                 else:
                     self.logger.debug("Excluding deprecated ontology term: %s", ontology_term.iri)
         return ontology_terms
 
+    def _get_term_details(self, iri, ontology_term=None, ontology=None):
+        """
+        Collect the details of the given ontology term that are not needed for mapping. Lean ontology terms call this
+        function (with the term IRI only) on first access to any of these details
+        :param iri: IRI of the ontology term
+        :param ontology_term: Ontology term, or None to look it up by its IRI in the ontology of this collector
+        :param ontology: Ontology where the children and instances of the term are asserted (by default, the ontology
+                            of this collector)
+        :return: Dictionary of the parents, restrictions, children, instances and definitions of the term
+        """
+        if self._closed:
+            raise RuntimeError("Unable to collect the details of ontology term " + iri + ": the ontology term "
+                               "collector that collected it has been closed")
+        if ontology is None:
+            ontology = self.ontology
+        if ontology_term is None:
+            ontology_term = ontology.world[iri]
+        named_parents, complex_parents = self._get_parents(ontology_term)
+        return {"parents": named_parents, "restrictions": complex_parents,
+                "children": self._get_children(ontology_term, ontology),
+                "instances": self._get_instances(ontology_term, ontology),
+                "definitions": self._get_definitions(ontology_term)}
+
     def _get_parents(self, ontology_term):
         parents = dict()  # named/atomic superclasses except owl:Thing
         restrictions = dict()  # restrictions are class expressions such as 'pancreatitis disease_has_location pancreas'
@@ -113,8 +221,9 @@ class OntologyTermCollector:
         return parents, restrictions
 
     def _add_named_parent(self, parent, parents):
-        if len(parent.label) > 0:
-            parents.update({parent.iri: parent.label[0]})
+        parent_labels = self._get_annotation(parent, "label")
+        if len(parent_labels) > 0:
+            parents.update({parent.iri: parent_labels[0]})
         else:
             parents.update({parent.iri: onto_utils.label_from_iri(parent.iri)})
 
@@ -132,6 +241,9 @@ class OntologyTermCollector:
             restrictions.update({property_iri: str(value)})
 
     def _get_children(self, ontology_term, ontology):
+        child_storids = self._get_bulk_subjects(ontology_term, ontology, is_a=True)
+        if child_storids is not None:
+            return self._get_bulk_terms(child_storids)
         children = dict()
         try:
             for child in ontology.get_children_of(ontology_term):
@@ -145,6 +257,9 @@ class OntologyTermCollector:
         return children
 
     def _get_instances(self, ontology_term, ontology):
+        instance_storids = self._get_bulk_subjects(ontology_term, ontology, is_a=False)
+        if instance_storids is not None:
+            return self._get_bulk_terms(instance_storids)
         instances = dict()
         try:
             for instance in ontology.get_instances_of(ontology_term):
@@ -207,7 +322,7 @@ class OntologyTermCollector:
         """
         rdfs_labels = []
         try:
-            for rdfs_label in ontology_term.label:
+            for rdfs_label in self._get_annotation(ontology_term, "label"):
                 rdfs_labels.append(rdfs_label)
         except (AttributeError, ValueError) as err:
             self.logger.debug(err)
@@ -221,7 +336,7 @@ class OntologyTermCollector:
         """
         skos_labels = []
         try:
-            for skos_pref_label in ontology_term.prefLabel:
+            for skos_pref_label in self._get_annotation(ontology_term, "prefLabel"):
                 skos_labels.append(skos_pref_label)
         except AttributeError as err:
             self.logger.debug(err)
@@ -230,7 +345,7 @@ class OntologyTermCollector:
     def _get_efo_alt_terms(self, ontology_term):
         efo_alt_terms = []
         try:
-            for efo_alt_term in ontology_term.alternative_term:
+            for efo_alt_term in self._get_annotation(ontology_term, "alternative_term"):
                 efo_alt_terms.append(efo_alt_term)
         except AttributeError as err:
             self.logger.debug(err)
@@ -245,7 +360,7 @@ class OntologyTermCollector:
         """
         synonyms = []
         try:
-            for synonym in ontology_term.hasExactSynonym:
+            for synonym in self._get_annotation(ontology_term, "hasExactSynonym"):
                 if hasattr(synonym, 'iri'):
                     synonym = synonym.iri
                 synonyms.append(synonym)
@@ -262,7 +377,7 @@ class OntologyTermCollector:
         """
         synonyms = []
         try:
-            for synonym in ontology_term.hasRelatedSynonym:
+            for synonym in self._get_annotation(ontology_term, "hasRelatedSynonym"):
                 if hasattr(synonym, 'iri'):
                     synonym = synonym.iri
                 synonyms.append(synonym)
@@ -279,7 +394,7 @@ class OntologyTermCollector:
         """
         synonyms = []
         try:
-            for synonym in ontology_term.hasBroadSynonym:
+            for synonym in self._get_annotation(ontology_term, "hasBroadSynonym"):
                 if hasattr(synonym, 'iri'):
                     synonym = synonym.iri
                 synonyms.append(synonym)
@@ -296,7 +411,7 @@ class OntologyTermCollector:
         """
         nci_synonyms = []
         try:
-            for synonym in ontology_term.P90:
+            for synonym in self._get_annotation(ontology_term, "P90"):
                 nci_synonyms.append(synonym)
         except AttributeError as err:
             self.logger.debug(err)
@@ -319,7 +434,7 @@ class OntologyTermCollector:
     def _get_iao_definition(self, ontology_term):
         definition = ""
         try:
-            definition = ontology_term.IAO_0000115
+            definition = self._get_annotation(ontology_term, "IAO_0000115")
         except AttributeError as err:
             self.logger.debug(err)
         return definition
@@ -327,11 +442,90 @@ class OntologyTermCollector:
     def _get_skos_definition(self, ontology_term):
         definition = ""
         try:
-            definition = ontology_term.definition
+            definition = self._get_annotation(ontology_term, "definition")
         except AttributeError as err:
             self.logger.debug(err)
         return definition
 
+    def _get_annotation(self, ontology_term, name):
+        """
+        Get the values of the annotation property with the given (owlready2 Python) name of the given ontology term, as
+        given by the owlready2 attribute of that name. During a bulk collection, the values of that annotation property
+        of all terms are read at once, except for terms or properties that owlready2 handles differently (individuals,
+        built-in entities, and properties that are not annotation properties), which are looked up as attributes
+        :param ontology_term: Ontology term
+        :param name: Python name of the annotation property, e.g. 'label' or 'hasExactSynonym'
+        :return: List of the annotation values
+        """
+        if self._is_bulk_term(ontology_term):
+            annotation_property = self._bulk_ontology.world._props.get(name)
+            if annotation_property is None:
+                raise AttributeError("'%s' property is not defined." % name)
+            if issubclass_python(annotation_property, AnnotationProperty):
+                return self._get_bulk_values(annotation_property, ontology_term.storid)
+        return getattr(ontology_term, name)
+
+    def _get_deprecation(self, ontology_term):
+        """Get the owl:deprecated values of the given ontology term"""
+        if self._is_bulk_term(ontology_term):
+            return self._get_bulk_values(deprecated, ontology_term.storid)
+        return deprecated[ontology_term]
+
+    def _is_bulk_term(self, ontology_term):
+        return (self._bulk_ontology is not None and isinstance(ontology_term, (ThingClass, PropertyClass)) and
+                ontology_term.namespace.world is self._bulk_ontology.world)
+
+    def _get_bulk_values(self, annotation_property, storid):
+        """
+        Get the values of the given annotation property of the entity with the given storid. All the (subject, value)
+        pairs of the annotation property are read from the quadstore the first time the property is requested
+        """
+        values = self._bulk_values.get(annotation_property.storid)
+        if values is None:
+            values = dict()
+            for subject, value, datatype in self._bulk_ontology.world.graph.execute(
+                    "SELECT s, o, d FROM quads WHERE p=?", (annotation_property.storid,)):
+                values.setdefault(subject, []).append(self._bulk_ontology._to_python(value, datatype))
+            self._bulk_values[annotation_property.storid] = values
+        return values.get(storid, [])
+
+    def _get_bulk_subjects(self, ontology_term, ontology, is_a):
+        """
+        Get the storids of the children (is_a=True) or instances (is_a=False) of the given ontology term asserted in the
+        given ontology, like owlready2's ontology.get_children_of() and ontology.get_instances_of(). The children and
+        instances of all terms are found in a single pass, by inverting all the (subject, object) edges of the
+        rdfs:subClassOf, rdfs:subPropertyOf or rdf:type predicate, which are read from the quadstore the first time the
+        predicate is requested. Blank nodes (e.g., class expressions in general class axioms) are left out, since they
+        have no IRI to be collected by
+        :return: List of subject storids (ordered by storid), or None outside a bulk collection
+        """
+        if ontology is not self._bulk_ontology or not self._is_bulk_term(ontology_term):
+            return None
+        predicate = ontology_term._rdfs_is_a if is_a else rdf_type
+        subjects = self._bulk_subjects.get(predicate)
+        if subjects is None:
+            subjects = dict()
+            for obj, subject in ontology.world.graph.execute(
+                    "SELECT o, s FROM objs WHERE c=? AND p=? AND s>0 ORDER BY o, s", (ontology.graph.c, predicate)):
+                subjects.setdefault(obj, []).append(subject)
+            self._bulk_subjects[predicate] = subjects
+        return subjects.get(ontology_term.storid, [])
+
+    def _get_bulk_terms(self, storids):
+        """Get a dictionary of the IRIs of the entities with the given storids and their (first) labels"""
+        terms = dict()
+        label_property = self._bulk_ontology.world._props.get("label")
+        for storid in storids:
+            iri = self._bulk_iris.get(storid)
+            if iri is None:
+                iri = self._bulk_iris[storid] = self._bulk_ontology.world._unabbreviate(storid)
+            labels = self._get_bulk_values(label_property, storid)
+            if len(labels) > 0:
+                terms.update({iri: labels[0]})
+            else:
+                terms.update({iri: onto_utils.label_from_iri(iri)})
+        return terms
+
     def _load_ontology(self, ontology_iri):
         """
         Load the ontology at the specified IRI.
@@ -343,12 +537,113 @@ class OntologyTermCollector:
         owl_link = bioregistry.get_owl_download(ontology_iri)
         if owl_link is not None:
             ontology_iri = owl_link
-        ontology = get_ontology(ontology_iri).load()
+        self._ontology_document = ontology_iri
+        if self.world_folder is None:
+            ontology = get_ontology(ontology_iri).load()
+        else:
+            ontology = self._load_persistent_ontology(ontology_iri)
         end = time.time()
         self._log_ontology_metrics(ontology)
         self.logger.info("...done (ontology loading time: %.2fs)", end - start)
         return ontology
 
+    def _get_cached_document(self, ontology_iri, download_folder, log_level):
+        """
+        Get the local copy, in the given download cache folder, of the ontology document at the specified IRI
+        :param ontology_iri: IRI of the ontology (e.g., path of ontology document in the local file system, URL)
+        :return: Path of the local copy of the ontology document, or the given IRI if it is not a URL
+        """
+        owl_link = bioregistry.get_owl_download(ontology_iri)
+        if owl_link is not None:
+            ontology_iri = owl_link
+        if not is_url(ontology_iri):
+            return ontology_iri
+        return OntologyDownloadCache(download_folder, log_level=log_level).get_document(ontology_iri)
+
+    def _load_persistent_ontology(self, ontology_iri):
+        """
+        Load the ontology at the specified IRI into its persistent world in the world folder of this collector. The
+        ontology is parsed only if the world file does not exist yet; otherwise owlready2 opens the stored quadstore
+        :param ontology_iri: IRI of the ontology (e.g., path of ontology document in the local file system, URL)
+        :return: Ontology document
+        """
+        world_file = self._get_world_file(ontology_iri)
+        self._delete_other_world_files(world_file)
+        # the world file is opened once the shared lock is held, so it is not deleted while this collector uses it
+        self._world_lock.enter_context(onto_utils.lock_file(self._get_world_lock_file(world_file), shared=True))
+        if os.path.exists(world_file):
+            self.logger.info("...opening parsed ontology from world file %s", world_file)
+        else:
+            self.logger.info("...parsing ontology into world file %s", world_file)
+        try:
+            world = World(filename=world_file)
+        except Exception:
+            self._world_lock.close()
+            raise
+        try:
+            ontology = world.get_ontology(ontology_iri).load()
+            # a reopened world gives the ontology under the IRI it was loaded from, which owlready2 stored as an alias
+            # of the IRI declared in the ontology document--the imports and properties of the ontology are only loaded
+            # when it is looked up by its declared IRI
+            for declared_ontology in list(world.ontologies.values()):
+                if declared_ontology is not ontology and declared_ontology.graph.c == ontology.graph.c:
+                    ontology = declared_ontology.load()
+                    break
+            # save the parsed ontology before any reasoning, so that the world file holds only the asserted axioms
+            world.save()
+        except Exception:
+            world.close()
+            os.remove(world_file)
+            self._world_lock.close()
+            raise
+        return ontology
+
+    def _get_world_file(self, ontology_iri):
+        """
+        Get the path of the world file of the ontology at the specified IRI, whose name is made of a hash of the IRI
+        and a hash of the version of the ontology document: the size and modification time of a local file, or none for
+        a URL (ontology release URLs are expected to point to a fixed version)
+        :param ontology_iri: IRI of the ontology (e.g., path of ontology document in the local file system, URL)
+        :return: Path of the world file
+        """
+        document_version = ""
+        if os.path.isfile(ontology_iri):
+            ontology_iri = os.path.abspath(ontology_iri)
+            document_stat = os.stat(ontology_iri)
+            document_version = str(document_stat.st_size) + "-" + str(document_stat.st_mtime_ns)
+        iri_key = hashlib.sha256(ontology_iri.encode("utf-8")).hexdigest()[:16]
+        version_key = hashlib.sha256(document_version.encode("utf-8")).hexdigest()[:8]
+        world_file_name = iri_key + "-" + version_key + ".sqlite3"
+        os.makedirs(self.world_folder, exist_ok=True)
+        return os.path.join(self.world_folder, world_file_name)
+
+    def _delete_other_world_files(self, world_file):
+        """
+        Delete the world files of other versions of the ontology of the given world file. Collectors of the ontology
+        hold a shared lock on its world files while they have one open, so the world files are deleted only if the
+        exclusive lock can be taken at once; otherwise they are left to be deleted by a later collector
+        :param world_file: Path of the world file of the current version of the ontology
+        """
+        if len(self._get_other_world_files(world_file)) == 0:
+            return
+        try:
+            with onto_utils.lock_file(self._get_world_lock_file(world_file), blocking=False):
+                for file_name in self._get_other_world_files(world_file):
+                    self.logger.info("...deleting world file of another version of the ontology: %s", file_name)
+                    os.remove(os.path.join(self.world_folder, file_name))
+        except BlockingIOError:
+            self.logger.info("...keeping world files of other versions of the ontology, which are in use")
+
+    def _get_other_world_files(self, world_file):
+        """Get the names of the world files of other versions of the ontology of the given world file"""
+        iri_key = os.path.basename(world_file).split("-")[0]
+        return [file_name for file_name in os.listdir(self.world_folder)
+                if file_name.startswith(iri_key + "-") and file_name != os.path.basename(world_file)]
+
+    def _get_world_lock_file(self, world_file):
+        """Get the path of the lock file of the world files of the ontology of the given world file"""
+        return os.path.join(self.world_folder, "." + os.path.basename(world_file).split("-")[0] + ".lock")
+
     def _classify_ontology(self, ontology):
         """
         Perform reasoning over the given ontology (consistency checking and classification)
@@ -362,6 +657,15 @@ class OntologyTermCollector:
         self.logger.info("...done (reasoning time: %.2fs)", end - start)
 
     def close(self):
+        if self.ontology is None:  # the ontology was streamed rather than loaded
+            return
+        self._closed = True
+        if self.world_folder is not None:
+            # close the persistent world of the ontology without saving it, which discards any inferences added by the
+            # reasoner, and leaves the default world untouched
+            self.ontology.world.close()
+            self._world_lock.close()
+            return
         # when multiple ontologies are loaded with owlready2, and they reference the same ontology term (IRI), a lookup
         # for that IRI returns the term from the first ontology loaded —> need to unload previously loaded ontologies
         try:
@@ -370,6 +674,9 @@ class OntologyTermCollector:
             self.logger.debug("Unable to destroy ontology: ", err)
 
     def _log_ontology_metrics(self, ontology):
+        # counting the entities of the ontology loads all of them from the quadstore, so only do so when logging them
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         self.logger.debug(" Ontology IRI: %s", ontology.base_iri)
         self.logger.debug(" Class count: %i", len(list(ontology.classes())))
         self.logger.debug(" Object property count: %i", len(list(ontology.object_properties())))
@@ -1,5 +1,6 @@
 """Provides TermMapping and TermMappingCollection classes"""
 
+import numpy as np
 import pandas as pd
 from text2term import onto_utils
 
@@ -75,3 +76,29 @@ class TermMappingCollection:
 
     def mappings_df(self):
         return pd.DataFrame([m.to_dict() for m in self.mappings])
+
+    @staticmethod
+    def from_arrays(ontology_terms, source_terms, source_terms_ids, rows, term_iris, scores):
+        """
+        Build a data frame of mappings given as parallel arrays
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :param source_terms: List of source terms
+        :param source_terms_ids: List of identifiers for the given source terms
+        :param rows: Array with the position of the source term of each mapping
+        :param term_iris: Array with the IRI of the ontology term of each mapping
+        :param scores: Array with the score of each mapping
+        :return: Data frame containing the mappings
+        """
+        # get the labels and CURIEs of the distinct ontology terms in the mappings
+        mapped_iris, mapped_iri_index = np.unique(np.asarray(term_iris, dtype=object), return_inverse=True)
+        mapped_labels = np.array([ontology_terms[iri].label for iri in mapped_iris], dtype=object)
+        mapped_curies = np.array([onto_utils.curie_from_iri(iri) if iri != "" else "" for iri in mapped_iris],
+                                 dtype=object)
+        return pd.DataFrame({
+            TermMapping.SRC_TERM_ID: np.asarray(source_terms_ids, dtype=object)[rows],
+            TermMapping.SRC_TERM: np.asarray(source_terms, dtype=object)[rows],
+            TermMapping.TGT_TERM_LBL: mapped_labels[mapped_iri_index],
+            TermMapping.TGT_TERM_CURIE: mapped_curies[mapped_iri_index],
+            TermMapping.TGT_TERM_IRI: mapped_iris[mapped_iri_index],
+            TermMapping.MAPPING_SCORE: scores
+        })
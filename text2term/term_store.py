@@ -0,0 +1,277 @@
+"""Provides OntologyTermStore class"""
+
+import os
+import json
+import mmap
+import time
+import logging
+import numpy as np
+from collections.abc import Mapping
+from text2term import onto_utils
+from text2term.term import OntologyTerm, OntologyTermType
+
+FORMAT_VERSION = 1
+METADATA_FILE = "store.json"
+STRINGS_FILE = "strings.bin"
+
+# columns of the (string to string) dictionaries of the ontology term details
+DICT_COLUMNS = ("parents", "children", "instances", "restrictions")
+
+
+class OntologyTermStore:
+
+    def __init__(self, store_folder, log_level=logging.INFO):
+        """
+        Open the columnar store of ontology terms in the given folder. The columns are NumPy arrays that are memory
+        mapped rather than read, so opening a store is nearly instantaneous regardless of the size of the ontology, and
+        processes that open the same store share its pages through the page cache of the operating system
+        :param store_folder: Folder of a store written by `OntologyTermStore.save`
+        """
+        self.logger = onto_utils.get_logger(__name__, level=log_level)
+        self.store_folder = store_folder
+        with open(os.path.join(store_folder, METADATA_FILE), "r") as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata.get("format_version") != FORMAT_VERSION:
+            raise ValueError("Unsupported ontology term store format version: " + str(metadata.get("format_version")))
+        self.term_count = metadata["term_count"]
+        self._columns = dict()
+        for file_name in os.listdir(store_folder):
+            if file_name.endswith(".npy"):
+                # a plain array view of the memory map is indexed faster than the memory map itself
+                column = np.load(os.path.join(store_folder, file_name), mmap_mode="r")
+                self._columns[file_name[:-4]] = np.asarray(column)
+        self._strings = _map_file(os.path.join(store_folder, STRINGS_FILE))
+        self._string_offsets = self._columns["string_offsets"]
+        self._mapping_string_count = metadata["mapping_string_count"]
+        self._iris = None
+        self._mapping_strings = None
+        self._mapping_columns = None
+        self._bitmaps = dict()
+        self._term_positions = dict()
+
+    def get_ontology_terms(self, base_iris=(), exclude_deprecated=False, term_type=OntologyTermType.ANY):
+        """
+        Get the stored ontology terms that satisfy the given filters. The terms are filtered on the IRI, type and
+        deprecation columns, and each ontology term is only built when it is first looked up in the returned mapping.
+        The details of a term that are not needed for mapping (definitions, parents, children, instances and
+        restrictions) are read on first access to any of them
+        :param base_iris: Limit ontology terms to those whose IRIs start with any IRI given in this tuple
+        :param exclude_deprecated: Exclude ontology terms stated as deprecated
+        :param term_type: Type of term--can be 'class' or 'property' or 'any'
+        :return: Read-only mapping of ontology term IRIs to their respective details
+        """
+        start = time.time()
+        iris = self._get_iris()
+        selected = np.ones(self.term_count, dtype=bool)
+        if exclude_deprecated:
+            selected &= ~self._get_bitmap("deprecated")
+        if term_type == OntologyTermType.CLASS:
+            selected &= self._get_bitmap("class")
+        elif term_type == OntologyTermType.PROPERTY:
+            selected &= self._get_bitmap("property")
+        elif term_type != OntologyTermType.ANY:
+            raise ValueError("Invalid term-type option. Acceptable term types are: 'class' or 'property' or 'any'")
+        if isinstance(base_iris, str):
+            base_iris = (base_iris,)
+        base_iris = tuple(iri.strip() for iri in base_iris)
+        if len(base_iris) > 0:
+            selected &= np.fromiter((iri.startswith(base_iris) for iri in iris), dtype=bool, count=self.term_count)
+        if selected.all():
+            positions = self._term_positions
+        else:
+            positions = {iris[position]: position for position in np.flatnonzero(selected).tolist()}
+        end = time.time()
+        self.logger.info("...done: selected %i of %i stored ontology terms (selection time: %.2fs)", len(positions),
+                         self.term_count, end - start)
+        return _StoredOntologyTerms(self, positions)
+
+    @staticmethod
+    def save(ontology_terms, store_folder):
+        """
+        Write the given ontology terms to a columnar store in the given folder. The store holds a table of the distinct
+        strings of the term details (null-terminated UTF-8 bytes and their offsets), which starts with the IRIs of the
+        ontology terms in order followed by their labels and synonyms, columns of the positions in that table of the
+        values of the sets and of the keys and values of the dictionaries of term details, with the offsets of the
+        values of each term in these columns, and bitmaps of the term types and deprecation
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :param store_folder: Folder where the store is written
+        """
+        os.makedirs(store_folder, exist_ok=True)
+        terms = list(ontology_terms.values())
+        # the IRIs of the ontology terms are distinct, so the position of the IRI of each term is its own position
+        string_positions = {term.iri: position for position, term in enumerate(terms)}
+        columns = dict()
+        for name in ("labels", "synonyms"):
+            columns[name + "_indptr"], columns[name] = _get_set_column(terms, name, string_positions)
+        mapping_string_count = len(string_positions)
+        columns["definitions_indptr"], columns["definitions"] = _get_set_column(terms, "definitions", string_positions)
+        for name in DICT_COLUMNS:
+            columns[name + "_indptr"], columns[name + "_keys"], columns[name + "_values"] = \
+                _get_dict_column(terms, name, string_positions)
+        columns["deprecated"] = _get_bitmap_column(term.deprecated for term in terms)
+        columns["class"] = _get_bitmap_column(term.term_type == OntologyTermType.CLASS for term in terms)
+        columns["property"] = _get_bitmap_column(term.term_type == OntologyTermType.PROPERTY for term in terms)
+        encoded_strings = [string.encode("utf-8") + b"\0" for string in string_positions]
+        columns["string_offsets"] = np.zeros(len(encoded_strings) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded_strings], out=columns["string_offsets"][1:])
+        with open(os.path.join(store_folder, STRINGS_FILE), "wb") as strings_file:
+            strings_file.writelines(encoded_strings)
+        for name, column in columns.items():
+            np.save(os.path.join(store_folder, name + ".npy"), column)
+        with open(os.path.join(store_folder, METADATA_FILE), "w") as metadata_file:
+            json.dump({"format_version": FORMAT_VERSION, "term_count": len(terms),
+                       "mapping_string_count": mapping_string_count}, metadata_file)
+
+    def _get_iris(self):
+        """
+        Decode the IRIs of the stored terms, which are the first strings of the string table, at once
+        """
+        if self._iris is None:
+            self._iris = self._decode_strings(0, self.term_count)
+            self._term_positions = {iri: position for position, iri in enumerate(self._iris)}
+        return self._iris
+
+    def _get_mapping_columns(self):
+        """
+        Decode the IRIs, labels and synonyms of the stored terms, which are at the start of the string table, at once,
+        and read the label and synonym columns. The strings of the other term details are decoded on demand
+        """
+        if self._mapping_columns is None:
+            self._mapping_strings = self._get_iris() + self._decode_strings(self.term_count,
+                                                                            self._mapping_string_count)
+            self._mapping_columns = {name: (self._columns[name + "_indptr"].tolist(), self._columns[name].tolist())
+                                     for name in ("labels", "synonyms")}
+        return self._mapping_strings, self._mapping_columns
+
+    def _decode_strings(self, begin, end):
+        """
+        Decode the strings at the given range of positions of the string table
+        """
+        if begin == end:
+            return []
+        data = str(self._strings[self._string_offsets[begin]:self._string_offsets[end]], "utf-8")
+        strings = data.split("\0")[:-1]
+        if len(strings) != end - begin:  # some strings contain null characters
+            strings = [self._get_string(position) for position in range(begin, end)]
+        return strings
+
+    def _get_bitmap(self, name):
+        if name not in self._bitmaps:
+            self._bitmaps[name] = np.unpackbits(self._columns[name], count=self.term_count).astype(bool)
+        return self._bitmaps[name]
+
+    def _get_string(self, position):
+        return str(self._strings[self._string_offsets[position]:self._string_offsets[position + 1] - 1], "utf-8")
+
+    def _get_set(self, name, position):
+        indptr = self._columns[name + "_indptr"]
+        values = self._columns[name][indptr[position]:indptr[position + 1]].tolist()
+        return {self._get_string(value) for value in values}
+
+    def _get_dict(self, name, position):
+        indptr = self._columns[name + "_indptr"]
+        begin, end = indptr[position], indptr[position + 1]
+        keys = self._columns[name + "_keys"][begin:end].tolist()
+        values = self._columns[name + "_values"][begin:end].tolist()
+        return {self._get_string(key): self._get_string(value) for key, value in zip(keys, values)}
+
+    def _get_term(self, iri, position):
+        """
+        Build the ontology term stored at the given position, whose details that are not needed for mapping are read
+        on first access to any of them
+        """
+        if self._get_bitmap("class")[position]:
+            owl_term_type = OntologyTermType.CLASS
+        elif self._get_bitmap("property")[position]:
+            owl_term_type = OntologyTermType.PROPERTY
+        else:
+            owl_term_type = "undetermined"
+        strings, columns = self._get_mapping_columns()
+        labels_indptr, labels = columns["labels"]
+        synonyms_indptr, synonyms = columns["synonyms"]
+        term_labels = {strings[label] for label in labels[labels_indptr[position]:labels_indptr[position + 1]]}
+        term_synonyms = {strings[synonym]
+                         for synonym in synonyms[synonyms_indptr[position]:synonyms_indptr[position + 1]]}
+        deprecated = bool(self._get_bitmap("deprecated")[position])
+        return OntologyTerm(iri, term_labels, synonyms=term_synonyms, deprecated=deprecated, term_type=owl_term_type,
+                            details_loader=self._get_term_details)
+
+    def _get_term_details(self, iri):
+        """
+        Read the details of the given ontology term that are not needed for mapping
+        :param iri: IRI of the ontology term
+        :return: Dictionary of the parents, children, instances, restrictions and definitions of the term
+        """
+        position = self._term_positions[iri]
+        details = {name: self._get_dict(name, position) for name in DICT_COLUMNS}
+        details["definitions"] = self._get_set("definitions", position)
+        return details
+
+
+class _StoredOntologyTerms(Mapping):
+    """
+    Read-only mapping of the IRIs of (a selection of) the ontology terms of a store to the terms, which are built on
+    first lookup and then kept
+    """
+
+    def __init__(self, store, positions):
+        self._store = store
+        self._positions = positions
+        self._terms = dict()
+
+    def __getitem__(self, iri):
+        term = self._terms.get(iri)
+        if term is None:
+            term = self._terms[iri] = self._store._get_term(iri, self._positions[iri])
+        return term
+
+    def __contains__(self, iri):
+        return iri in self._positions
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+
+def _get_string_positions(strings, string_positions):
+    """
+    Get the positions of the given strings in the given table of strings, adding the strings missing from the table
+    """
+    positions = np.zeros(len(strings), dtype=np.int32)
+    for index, string in enumerate(strings):
+        position = string_positions.get(string)
+        if position is None:
+            position = string_positions[string] = len(string_positions)
+        positions[index] = position
+    return positions
+
+
+def _get_set_column(terms, name, string_positions):
+    values = [str(value) for term in terms for value in getattr(term, name)]
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(getattr(term, name)) for term in terms], out=indptr[1:])
+    return indptr, _get_string_positions(values, string_positions)
+
+
+def _get_dict_column(terms, name, string_positions):
+    items = [(str(key), str(value)) for term in terms for key, value in getattr(term, name).items()]
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(getattr(term, name)) for term in terms], out=indptr[1:])
+    return (indptr, _get_string_positions([key for key, _ in items], string_positions),
+            _get_string_positions([value for _, value in items], string_positions))
+
+
+def _get_bitmap_column(flags):
+    return np.packbits(np.fromiter(flags, dtype=bool))
+
+
+def _map_file(file_path):
+    """
+    Map the given file into memory read-only. Slicing the memory map gives the bytes at the sliced range of the file
+    """
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:  # empty files cannot be memory mapped
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,540 @@
+"""Provides OntologyTermStreamer class"""
+
+import io
+import re
+import sys
+import gzip
+import time
+import logging
+import urllib.request
+from contextlib import contextmanager
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+import bioregistry
+from text2term import onto_utils
+from text2term.term import OntologyTerm, OntologyTermType
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+OWL = "http://www.w3.org/2002/07/owl#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+XML = "http://www.w3.org/XML/1998/namespace"
+OBO = "http://purl.obolibrary.org/obo/"
+OBO_IN_OWL = "http://www.geneontology.org/formats/oboInOwl#"
+
+RDF_TYPE = RDF + "type"
+RDFS_SUBCLASS_OF = RDFS + "subClassOf"
+RDFS_SUBPROPERTY_OF = RDFS + "subPropertyOf"
+RDFS_LABEL = RDFS + "label"
+OWL_DEPRECATED = OWL + "deprecated"
+OWL_THING = OWL + "Thing"
+OWL_NOTHING = OWL + "Nothing"
+OWL_NAMED_INDIVIDUAL = OWL + "NamedIndividual"
+OWL_ONTOLOGY = OWL + "Ontology"
+OWL_VERSION_IRI = OWL + "versionIRI"
+# statements linking a class to the named classes in an intersection that is a superclass of it are given with this
+# predicate: they are parents of the class, but the class is not one of their children in the term collector
+INTERSECTION_SUPERCLASS = OWL + "intersectionOf"
+XSD_BOOLEAN = XSD + "boolean"
+OBO_EXACT_SYNONYM = OBO_IN_OWL + "hasExactSynonym"
+IAO_DEFINITION = OBO + "IAO_0000115"
+
+CLASS_TYPES = {OWL + "Class"}
+PROPERTY_TYPES = {OWL + "ObjectProperty", OWL + "DatatypeProperty", OWL + "AnnotationProperty"}
+
+# annotation properties read by the ontology term collector, given by their owlready2 (Python) names, which are the
+# last part of their IRIs
+PREF_LABEL_NAMES = {"prefLabel"}
+SYNONYM_NAMES = {"hasExactSynonym", "P90", "alternative_term"}
+DEFINITION_NAMES = {"IAO_0000115", "definition"}
+
+BUFFER_SIZE = 1 << 16
+
+_TYPE, _PARENT, _INTERSECTION_PARENT, _LABEL, _PREF_LABEL, _SYNONYM, _DEFINITION, _DEPRECATED, _VERSION_IRI = range(9)
+
+_ABSOLUTE_IRI = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*:")
+_XML_ROOT_TAG = re.compile(r"<(?![?!])([\w.:-]+)")
+_FUNCTIONAL_SYNTAX_START = re.compile(r"\s*(Prefix|Ontology)\s*\(")
+_OBO_START = re.compile(r"^(format-version:|ontology:|\[Term\]|\[Typedef\]|\[Instance\])", re.MULTILINE)
+_FUNCTIONAL_SYNTAX_TOKEN = re.compile(r'\s*(?:(\()|(\))|<([^>]*)>|"((?:[^"\\]|\\.)*)"(?:\^\^(<[^>]*>|[^\s()<>"^@]+)|'
+                                      r'@[A-Za-z][A-Za-z0-9-]*)?|([^\s()<>"^@]+))', re.DOTALL)
+_OBO_QUOTED_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"\s*(\S*)', re.DOTALL)
+_OBO_COMMENT = re.compile(r"(?<!\\)\s+!(\s.*)?$")
+_ESCAPED_CHARACTER = re.compile(r"\\(.)", re.DOTALL)
+_FUNCTIONAL_SYNTAX_PREFIXES = {"rdf": RDF, "rdfs": RDFS, "owl": OWL, "xsd": XSD}
+
+
+class OntologyTermStreamer:
+
+    def __init__(self, ontology_iri, log_level=logging.INFO):
+        """
+        Construct an ontology term streamer, which collects the terms of the ontology at the given IRI by reading the
+        ontology document incrementally, without loading it into owlready2. The ontology document can be in RDF/XML,
+        OBO or OWL functional syntax, optionally compressed with gzip
+        :param ontology_iri: IRI of the ontology (e.g., path of ontology document in the local file system, URL)
+        """
+        self.logger = onto_utils.get_logger(__name__, level=log_level)
+        owl_link = bioregistry.get_owl_download(ontology_iri)
+        self.ontology_iri = ontology_iri if owl_link is None else owl_link
+        # IRI and version IRI declared in the ontology document, which are read along with the ontology terms
+        self.declared_iri = None
+        self.version_iri = None
+
+    def get_ontology_terms(self, base_iris=(), exclude_deprecated=False, term_type=OntologyTermType.ANY):
+        """
+        Collect the terms described in the ontology document at the IRI of this streamer. Only the statements that the
+        term details are made of are kept while reading the document, so memory use is bounded by the size of the
+        collected term details rather than by the size of the ontology. Unlike the ontology term collector, imported
+        ontologies are not read, and complex class expressions (restrictions) are not collected
+        :param base_iris: Limit ontology term collection to terms whose IRIs start with any IRI given in this tuple
+        :param exclude_deprecated: Exclude ontology terms stated as deprecated using owl:deprecated 'true'
+        :param term_type: Type of term--can be 'class' or 'property' or 'any'
+        :return: Dictionary of ontology term IRIs and their respective details in the specified ontology
+        """
+        self.logger.info("Streaming ontology term details from %s...", self.ontology_iri)
+        start = time.time()
+        records = dict()
+        predicate_kinds = dict()
+        self.declared_iri, self.version_iri = None, None
+        with self._open_document(self.ontology_iri) as document:
+            for subject, predicate, value, is_iri in self._read_triples(document):
+                self._add_triple(records, predicate_kinds, subject, predicate, value, is_iri)
+        ontology_terms = self._get_ontology_terms(records, tuple(iri.strip() for iri in base_iris), exclude_deprecated,
+                                                  term_type)
+        end = time.time()
+        self.logger.info("...done: collected %i ontology terms (collection time: %.2fs)", len(ontology_terms),
+                         end - start)
+        return ontology_terms
+
+    @contextmanager
+    def _open_document(self, ontology_iri):
+        """
+        Open the ontology document at the given IRI as a buffered binary stream, which is decompressed on the fly if
+        the document is compressed with gzip
+        """
+        if ontology_iri.startswith(("http://", "https://", "ftp://")):
+            source = urllib.request.urlopen(ontology_iri)
+        else:
+            source = open(ontology_iri.removeprefix("file://"), "rb", buffering=0)
+        with source:
+            stream = io.BufferedReader(source, buffer_size=BUFFER_SIZE)
+            if stream.peek(2)[:2] == b"\x1f\x8b":
+                stream = io.BufferedReader(gzip.GzipFile(fileobj=stream), buffer_size=BUFFER_SIZE)
+            yield stream
+
+    def _read_triples(self, document):
+        """
+        Read the (subject, predicate, value, value is IRI) statements of the given ontology document, after detecting
+        its format from the start of the document
+        """
+        head = document.peek(BUFFER_SIZE).decode("utf-8", errors="ignore").lstrip("\ufeff")
+        if head.lstrip().startswith("<"):
+            root_tag = _XML_ROOT_TAG.search(head)
+            if root_tag is not None and root_tag.group(1).rsplit(":", 1)[-1] != "RDF":
+                raise ValueError("Unsupported ontology document format (root element: %s). Only RDF/XML, OBO and OWL "
+                                 "functional syntax documents can be streamed" % root_tag.group(1))
+            return self._read_rdf_xml_triples(document)
+        lines = io.TextIOWrapper(document, encoding="utf-8-sig")
+        if _FUNCTIONAL_SYNTAX_START.match(head):
+            return self._read_functional_syntax_triples(lines)
+        if _OBO_START.search(head):
+            return self._read_obo_triples(lines)
+        raise ValueError("Unsupported ontology document format. Only RDF/XML, OBO and OWL functional syntax documents "
+                         "can be streamed")
+
+    def _read_rdf_xml_triples(self, document):
+        depth = 0
+        root, base = None, ""
+        for event, element in ElementTree.iterparse(document, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root, base = element, element.get("{%s}base" % XML, "")
+                continue
+            depth -= 1
+            if depth == 1:  # end of a top-level node element, whose statements can now be read and discarded
+                yield from self._get_rdf_xml_node_triples(element, base)
+                root.clear()
+
+    def _get_rdf_xml_node_triples(self, node, base):
+        subject = self._get_rdf_xml_node_iri(node, base)
+        for child in node:
+            if subject is None:  # statements about blank nodes (e.g., restrictions, axiom annotations) are not needed
+                break
+            predicate = _get_rdf_xml_iri(child.tag)
+            resource = child.get("{%s}resource" % RDF)
+            if resource is not None:
+                yield subject, predicate, _resolve_iri(resource, base), True
+            elif child.get("{%s}parseType" % RDF) == "Literal":
+                yield subject, predicate, "".join(child.itertext()), False
+            elif len(child) > 0:
+                nested_node_iri = self._get_rdf_xml_node_iri(child[0], base)
+                if nested_node_iri is not None:
+                    yield subject, predicate, nested_node_iri, True
+                elif predicate == RDFS_SUBCLASS_OF:
+                    # the named classes in an intersection superclass are parents too, as in the term collector
+                    for conjunct in child[0].iterfind("{%s}intersectionOf/*" % OWL):
+                        conjunct_iri = self._get_rdf_xml_node_iri(conjunct, base)
+                        if conjunct_iri is not None:
+                            yield subject, INTERSECTION_SUPERCLASS, conjunct_iri, True
+            elif child.get("{%s}datatype" % RDF) == XSD_BOOLEAN:
+                yield subject, predicate, _get_boolean(child.text or ""), False
+            else:
+                yield subject, predicate, child.text or "", False
+        if subject is not None:
+            if node.tag != "{%s}Description" % RDF:
+                yield subject, RDF_TYPE, _get_rdf_xml_iri(node.tag), True
+            for attribute, value in node.attrib.items():
+                if not attribute.startswith(("{%s}" % RDF, "{%s}" % XML)):
+                    yield subject, _get_rdf_xml_iri(attribute), value, False
+        # named nodes nested in property elements can have statements of their own
+        for child in node:
+            for nested_node in child:
+                yield from self._get_rdf_xml_node_triples(nested_node, base)
+
+    def _get_rdf_xml_node_iri(self, node, base):
+        about = node.get("{%s}about" % RDF)
+        if about is not None:
+            return _resolve_iri(about, base)
+        node_id = node.get("{%s}ID" % RDF)
+        if node_id is not None:
+            return _resolve_iri("#" + node_id, base)
+        return None
+
+    def _read_obo_triples(self, lines):
+        default_namespace, data_version = "", ""
+        stanza, subject = None, None
+        for line in lines:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("!"):
+                continue
+            if line.startswith("["):
+                if stanza is None and default_namespace != "":
+                    # the header declares the ontology, whose IRIs follow the OBO to OWL mapping of the OBO format
+                    ontology_iri = OBO + default_namespace + ".owl"
+                    yield ontology_iri, RDF_TYPE, OWL_ONTOLOGY, True
+                    if data_version != "":
+                        yield ontology_iri, OWL_VERSION_IRI, "%s%s/%s/%s.owl" % (OBO, default_namespace, data_version,
+                                                                                 default_namespace), True
+                stanza, subject = line, None
+                continue
+            tag, _, value = line.partition(":")
+            value = value.strip()
+            if stanza is None:
+                if tag == "ontology":
+                    default_namespace = value
+                elif tag == "data-version":
+                    data_version = value
+                continue
+            if tag == "id":
+                subject = _get_obo_iri(_strip_obo_comment(value), default_namespace)
+                if stanza == "[Term]":
+                    yield subject, RDF_TYPE, OWL + "Class", True
+                elif stanza == "[Typedef]":
+                    yield subject, RDF_TYPE, OWL + "ObjectProperty", True
+                elif stanza == "[Instance]":
+                    yield subject, RDF_TYPE, OWL_NAMED_INDIVIDUAL, True
+            elif subject is None:
+                continue
+            elif tag == "name":
+                yield subject, RDFS_LABEL, _unescape(_OBO_COMMENT.sub("", value)), False
+            elif tag == "def":
+                match = _OBO_QUOTED_STRING.match(value)
+                if match is not None:
+                    yield subject, IAO_DEFINITION, _unescape(match.group(1)), False
+            elif tag == "synonym":
+                match = _OBO_QUOTED_STRING.match(value)
+                if match is not None and match.group(2) == "EXACT":
+                    yield subject, OBO_EXACT_SYNONYM, _unescape(match.group(1)), False
+            elif tag == "is_a":
+                predicate = RDFS_SUBPROPERTY_OF if stanza == "[Typedef]" else RDFS_SUBCLASS_OF
+                yield subject, predicate, _get_obo_iri(_strip_obo_comment(value), default_namespace), True
+            elif tag == "instance_of":
+                yield subject, RDF_TYPE, _get_obo_iri(_strip_obo_comment(value), default_namespace), True
+            elif tag == "is_obsolete":
+                yield subject, OWL_DEPRECATED, _get_boolean(_strip_obo_comment(value)), False
+
+    def _read_functional_syntax_triples(self, lines):
+        prefixes = dict(_FUNCTIONAL_SYNTAX_PREFIXES)
+        for axiom in _read_functional_syntax_axioms(lines):
+            name, arguments = axiom[0], [argument for argument in axiom[1:] if not _is_annotation(argument)]
+            if name == "Prefix" and len(arguments) == 2:
+                prefixes[arguments[0][1].rstrip("=").rstrip(":")] = arguments[1][1]
+            elif name == "Ontology":  # given away after its axioms, with its IRI and version IRI (if any)
+                ontology_iris = [_get_functional_syntax_iri(argument, prefixes) for argument in arguments
+                                 if not isinstance(argument, list)]
+                if len(ontology_iris) > 0 and ontology_iris[0] is not None:
+                    yield ontology_iris[0], RDF_TYPE, OWL_ONTOLOGY, True
+                    if len(ontology_iris) > 1 and ontology_iris[1] is not None:
+                        yield ontology_iris[0], OWL_VERSION_IRI, ontology_iris[1], True
+            elif name == "Declaration" and len(arguments) == 1 and isinstance(arguments[0], list):
+                entity_type, entity = arguments[0][0], _get_functional_syntax_iri(arguments[0][1], prefixes)
+                if entity_type == "DataProperty":
+                    entity_type = "DatatypeProperty"
+                if entity is not None:
+                    yield entity, RDF_TYPE, OWL + entity_type, True
+            elif name == "AnnotationAssertion" and len(arguments) == 3:
+                predicate = _get_functional_syntax_iri(arguments[0], prefixes)
+                subject = _get_functional_syntax_iri(arguments[1], prefixes)
+                if predicate is None or subject is None or isinstance(arguments[2], list):
+                    continue
+                if arguments[2][0] == "literal":
+                    datatype = arguments[2][2]
+                    if datatype is not None and _get_functional_syntax_iri(("name", datatype), prefixes) == XSD_BOOLEAN:
+                        yield subject, predicate, _get_boolean(arguments[2][1]), False
+                    else:
+                        yield subject, predicate, arguments[2][1], False
+                else:
+                    value = _get_functional_syntax_iri(arguments[2], prefixes)
+                    if value is not None:
+                        yield subject, predicate, value, True
+            elif name in ("SubClassOf", "SubObjectPropertyOf", "SubDataPropertyOf", "SubAnnotationPropertyOf",
+                          "ClassAssertion") and len(arguments) == 2:
+                first = _get_functional_syntax_iri(arguments[0], prefixes)
+                second = _get_functional_syntax_iri(arguments[1], prefixes)
+                if name == "SubClassOf" and first is not None and isinstance(arguments[1], list) and \
+                        arguments[1][0] == "ObjectIntersectionOf":
+                    # the named classes in an intersection superclass are parents too, as in the term collector
+                    for conjunct in arguments[1][1:]:
+                        conjunct_iri = _get_functional_syntax_iri(conjunct, prefixes)
+                        if conjunct_iri is not None:
+                            yield first, INTERSECTION_SUPERCLASS, conjunct_iri, True
+                if first is None or second is None:  # class expressions and anonymous individuals are not needed
+                    continue
+                if name == "ClassAssertion":
+                    yield second, RDF_TYPE, first, True
+                elif name == "SubClassOf":
+                    yield first, RDFS_SUBCLASS_OF, second, True
+                else:
+                    yield first, RDFS_SUBPROPERTY_OF, second, True
+
+    def _add_triple(self, records, predicate_kinds, subject, predicate, value, is_iri):
+        """
+        Add the given statement to the record of its subject, if it is a statement the term details are made of
+        :param records: Dictionary of subject IRIs and their records
+        :param predicate_kinds: Dictionary of the predicate IRIs seen so far and the kind of statement they make
+        """
+        kind = predicate_kinds.get(predicate, -1)
+        if kind == -1:
+            kind = predicate_kinds[predicate] = _get_predicate_kind(predicate)
+        if kind is None:
+            return
+        if kind == _VERSION_IRI:
+            if is_iri:
+                self.version_iri = value
+            return
+        if kind == _TYPE and value == OWL_ONTOLOGY:
+            self.declared_iri = subject
+            return
+        record = records.get(subject)
+        if record is None:
+            record = records[subject] = _TermRecord()
+        if kind == _TYPE:
+            if value in CLASS_TYPES:
+                record.term_type = OntologyTermType.CLASS
+            elif value in PROPERTY_TYPES:
+                record.term_type = OntologyTermType.PROPERTY
+            elif value != OWL_NAMED_INDIVIDUAL and not value.startswith((OWL, RDF, RDFS)):
+                record.types.append(sys.intern(value))
+        elif kind == _PARENT:
+            if is_iri and value != OWL_THING and value != subject:
+                record.parents.append(sys.intern(value))
+        elif kind == _INTERSECTION_PARENT:
+            if value != OWL_THING and value != subject:
+                record.intersection_parents.append(sys.intern(value))
+        elif kind == _DEPRECATED:
+            # as in the term collector, only boolean values mark terms as deprecated (not the string 'true')
+            record.deprecated = record.deprecated or value is True
+        elif kind == _LABEL:
+            if not is_iri:
+                record.labels.append(value)
+        elif kind == _PREF_LABEL:
+            if not is_iri:
+                record.pref_labels.append(value)
+        elif kind == _SYNONYM:
+            record.synonyms.append(value)
+        elif not is_iri:
+            record.definitions.append(value)
+
+    def _get_ontology_terms(self, records, base_iris, exclude_deprecated, term_type):
+        """
+        Build the ontology terms of the given subject records: children and instances of terms are found by inverting
+        the parents and types of all records, and the labels of related terms are the first rdfs:label of each
+        """
+        children, instances = dict(), dict()
+        for iri, record in records.items():
+            if record.term_type is not None:
+                for parent in record.parents:
+                    children.setdefault(parent, []).append(iri)
+            else:
+                for type_iri in record.types:
+                    instances.setdefault(type_iri, []).append(iri)
+        ontology_terms = dict()
+        for iri, record in records.items():
+            if record.term_type is None or iri == OWL_THING or iri == OWL_NOTHING:
+                continue
+            if len(base_iris) > 0 and not iri.startswith(base_iris):
+                continue
+            if term_type != OntologyTermType.ANY and record.term_type != term_type:
+                continue
+            if exclude_deprecated and record.deprecated:
+                self.logger.debug("Excluding deprecated ontology term: %s", iri)
+                continue
+            labels = set(record.labels) | set(record.pref_labels)
+            if len(labels) == 0:
+                labels.add(onto_utils.label_from_iri(iri))
+            ontology_terms[iri] = OntologyTerm(iri, labels, definitions=set(record.definitions),
+                                               synonyms=set(record.synonyms),
+                                               parents=_get_term_labels(record.parents + record.intersection_parents,
+                                                                        records),
+                                               children=_get_term_labels(children.get(iri, ()), records),
+                                               instances=_get_term_labels(instances.get(iri, ()), records),
+                                               restrictions=dict(), deprecated=record.deprecated,
+                                               term_type=record.term_type)
+        return ontology_terms
+
+
+class _TermRecord:
+    """ Statements about one subject that the details of an ontology term are made of """
+    __slots__ = ("term_type", "types", "parents", "intersection_parents", "labels", "pref_labels", "synonyms",
+                 "definitions", "deprecated")
+
+    def __init__(self):
+        self.term_type = None
+        self.types = []
+        self.parents = []
+        self.intersection_parents = []
+        self.labels = []
+        self.pref_labels = []
+        self.synonyms = []
+        self.definitions = []
+        self.deprecated = False
+
+
+def _get_predicate_kind(predicate):
+    if predicate == RDF_TYPE:
+        return _TYPE
+    if predicate == RDFS_SUBCLASS_OF or predicate == RDFS_SUBPROPERTY_OF:
+        return _PARENT
+    if predicate == INTERSECTION_SUPERCLASS:
+        return _INTERSECTION_PARENT
+    if predicate == RDFS_LABEL:
+        return _LABEL
+    if predicate == OWL_DEPRECATED:
+        return _DEPRECATED
+    if predicate == OWL_VERSION_IRI:
+        return _VERSION_IRI
+    name = re.split(r"[#/]", predicate)[-1]
+    if name in PREF_LABEL_NAMES:
+        return _PREF_LABEL
+    if name in SYNONYM_NAMES:
+        return _SYNONYM
+    if name in DEFINITION_NAMES:
+        return _DEFINITION
+    return None
+
+
+def _get_term_labels(iris, records):
+    term_labels = dict()
+    for iri in iris:
+        record = records.get(iri)
+        if record is not None and len(record.labels) > 0:
+            term_labels[iri] = record.labels[0]
+        else:
+            term_labels[iri] = onto_utils.label_from_iri(iri)
+    return term_labels
+
+
+def _get_rdf_xml_iri(tag):
+    # ElementTree gives qualified names as '{namespace}name'
+    return tag[1:].replace("}", "", 1) if tag.startswith("{") else tag
+
+
+def _resolve_iri(iri, base):
+    return iri if _ABSOLUTE_IRI.match(iri) else urljoin(base, iri)
+
+
+def _get_obo_iri(identifier, default_namespace):
+    if identifier.startswith(("http://", "https://")):
+        return identifier
+    prefix, separator, local_id = identifier.partition(":")
+    if len(separator) > 0 and len(prefix) > 0:
+        return OBO + prefix + "_" + local_id
+    return OBO + default_namespace + "#" + identifier
+
+
+def _strip_obo_comment(value):
+    # trailing modifiers ('{...}') and comments ('! ...') follow the first token of identifier values
+    return value.split(maxsplit=1)[0] if len(value) > 0 else value
+
+
+def _get_boolean(literal):
+    return literal.strip() in ("true", "1")
+
+
+def _unescape(string):
+    return _ESCAPED_CHARACTER.sub(lambda match: "\n" if match.group(1) == "n" else match.group(1), string)
+
+
+def _read_functional_syntax_axioms(lines):
+    """
+    Read the axioms of an OWL functional syntax document one at a time, as nested lists whose first element is the name
+    of the axiom or expression. Tokens are ('iri', full IRI) and ('name', prefixed name) pairs, or ('literal', string,
+    datatype) triples
+    """
+    stack = [[]]
+    buffer = ""
+    for line in lines:
+        buffer += line
+        position = 0
+        while True:
+            match = _FUNCTIONAL_SYNTAX_TOKEN.match(buffer, position)
+            if match is None or match.end() == position:  # end of line, or a string that continues on the next line
+                break
+            position = match.end()
+            opening, closing, iri, literal, datatype, name = match.groups()
+            if opening is not None:
+                previous = stack[-1].pop() if len(stack[-1]) > 0 else ("name", "")
+                stack.append([previous[1]])
+            elif closing is not None:
+                expression = stack.pop()
+                if len(stack) == 0:
+                    raise ValueError("Unbalanced parentheses in OWL functional syntax document")
+                # axioms (and prefix declarations) are given away as soon as they are read
+                if len(stack) == 1 or (len(stack) == 2 and stack[1][0] == "Ontology"):
+                    yield expression
+                else:
+                    stack[-1].append(expression)
+            elif iri is not None:
+                stack[-1].append(("iri", iri))
+            elif literal is not None:
+                stack[-1].append(("literal", _unescape(literal), datatype))
+            elif name is not None:
+                stack[-1].append(("name", name))
+        buffer = buffer[position:]
+    if len(buffer.strip()) > 0 or len(stack) > 1:
+        raise ValueError("Incomplete OWL functional syntax document")
+
+
+def _is_annotation(argument):
+    return isinstance(argument, list) and argument[0] == "Annotation"
+
+
+def _get_functional_syntax_iri(token, prefixes):
+    """
+    Get the full IRI of the given token, or None if the token is not an IRI (e.g., a class expression or an anonymous
+    individual)
+    """
+    if isinstance(token, list):
+        return None
+    kind, value = token[0], token[1]
+    if kind == "iri":
+        return value
+    if kind == "name" and value.startswith("<") and value.endswith(">"):
+        return value[1:-1]
+    if kind != "name" or value.startswith("_:"):
+        return None
+    prefix, separator, local_name = value.partition(":")
+    if len(separator) == 0 or prefix not in prefixes:
+        return None
+    return prefixes[prefix] + local_name
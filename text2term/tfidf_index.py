@@ -0,0 +1,138 @@
+"""Provides TFIDFIndex class"""
+
+import copy
+import pickle
+import logging
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from text2term import onto_utils
+from text2term.label_index import LabelIndex
+
+
+class TFIDFIndex:
+
+    def __init__(self, ontology_terms, ngram_length=3, analyzer='char_wb', label_index=None):
+        """
+        Build a TF-IDF index of the distinct normalized labels and synonyms of the given ontology terms
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :param ngram_length: The gram length n for the string tokenizer
+        :param analyzer: Type of analyzer ('char_wb', 'word')
+        :param label_index: Index of the normalized labels and synonyms of the given ontology terms, if already built
+        """
+        self.logger = onto_utils.get_logger(__name__, logging.INFO)
+        self.ngram_length = ngram_length
+        self.analyzer = analyzer
+        if label_index is None:
+            label_index = LabelIndex(ontology_terms, normalize=onto_utils.normalize)
+        self.label_index = label_index
+        count_vectorizer = CountVectorizer(analyzer=analyzer, ngram_range=(ngram_length, ngram_length))
+        self.target_counts = count_vectorizer.fit_transform(self.label_index.labels).tocsr()
+        self.vocabulary = count_vectorizer.vocabulary_
+        self._fit_target_matrix()
+
+    def transform(self, source_terms):
+        """
+        Compute TF-IDF vectors of the given (normalized) source terms over the vocabulary of this index. The n-grams of
+        the source terms are weighted by the IDF weights of the target labels, so the vector of a source term does not
+        depend on the other source terms. N-grams that do not occur in any target label get the IDF weight of an n-gram
+        with document frequency 0, and contribute to the norm of a source vector although they are dropped from the
+        returned matrix
+        :param source_terms: List of source terms to be vectorized
+        :return: Sparse matrix with one row per source term and one column per n-gram in the index vocabulary
+        """
+        count_vectorizer = CountVectorizer(analyzer=self.analyzer, ngram_range=(self.ngram_length, self.ngram_length))
+        try:
+            source_counts = count_vectorizer.fit_transform(source_terms).tocoo()
+        except ValueError:  # none of the source terms contains any n-gram
+            return csr_matrix((len(source_terms), len(self.vocabulary)), dtype=self.target_matrix.dtype)
+        column_map = np.full(len(count_vectorizer.vocabulary_), -1, dtype=np.int64)
+        for ngram, column in count_vectorizer.vocabulary_.items():
+            column_map[column] = self.vocabulary.get(ngram, -1)
+        target_columns = column_map[source_counts.col]
+        in_vocabulary = target_columns >= 0
+        # smoothed IDF weight of an n-gram that occurs in no target label (as computed by TfidfTransformer)
+        unseen_idf = np.log(self.target_counts.shape[0] + 1) + 1
+        weights = source_counts.data * np.where(in_vocabulary, self.idf[np.maximum(target_columns, 0)], unseen_idf)
+        norms = np.sqrt(np.bincount(source_counts.row, weights=weights ** 2, minlength=len(source_terms)))
+        weights /= norms[source_counts.row]
+        return csr_matrix((weights[in_vocabulary], (source_counts.row[in_vocabulary], target_columns[in_vocabulary])),
+                          shape=(len(source_terms), len(self.vocabulary)), dtype=self.target_matrix.dtype)
+
+    def subset(self, ontology_terms):
+        """
+        Get an index restricted to the labels and synonyms of the given ontology terms. The IDF weights are recomputed
+        over the remaining labels, so the scores are the same as those of an index built from the given terms directly
+        :param ontology_terms: Dictionary of ontology term IRIs and their respective details
+        :return: TFIDFIndex
+        """
+        label_index, kept_labels = self.label_index.subset(ontology_terms)
+        if label_index is self.label_index:
+            return self
+        index = copy.copy(self)
+        index.label_index = label_index
+        index.target_counts = self.target_counts[kept_labels]
+        index._fit_target_matrix()
+        return index
+
+    def update(self, label_index):
+        """
+        Build the index of the labels and synonyms of the given label index, which indexes a new version of the ontology
+        terms of this index. Only the labels that are not in this index are vectorized; the n-gram counts of the other
+        labels are reused, so the index is the same as an index built from the new version of the ontology terms
+        :param label_index: Index of the normalized labels and synonyms of the new version of the ontology terms
+        :return: TFIDFIndex
+        """
+        old_rows = np.fromiter((self.label_index.label_positions.get(label, -1) for label in label_index.labels),
+                               dtype=np.int64, count=label_index.label_count)
+        new_rows = np.flatnonzero(old_rows < 0)
+        vocabulary = dict(self.vocabulary)
+        new_counts = csr_matrix((len(new_rows), len(vocabulary)), dtype=self.target_counts.dtype)
+        if len(new_rows) > 0:
+            count_vectorizer = CountVectorizer(analyzer=self.analyzer,
+                                               ngram_range=(self.ngram_length, self.ngram_length))
+            try:
+                new_label_counts = count_vectorizer.fit_transform([label_index.labels[row] for row in new_rows])
+                # the n-grams that are not in the vocabulary of this index are added to it
+                column_map = np.zeros(len(count_vectorizer.vocabulary_), dtype=np.int64)
+                for ngram, column in count_vectorizer.vocabulary_.items():
+                    column_map[column] = vocabulary.setdefault(ngram, len(vocabulary))
+                new_label_counts = new_label_counts.tocoo()
+                new_counts = csr_matrix((new_label_counts.data, (new_label_counts.row,
+                                                                 column_map[new_label_counts.col])),
+                                        shape=(len(new_rows), len(vocabulary)), dtype=self.target_counts.dtype)
+            except ValueError:  # none of the new labels contains any n-gram
+                pass
+        old_counts = self.target_counts[old_rows[old_rows >= 0]]
+        old_counts.resize((old_counts.shape[0], len(vocabulary)))
+        # the rows of the reused and new labels are put in the order of the labels of the given label index
+        row_order = np.argsort(np.concatenate([np.flatnonzero(old_rows >= 0), new_rows]), kind='stable')
+        counts = vstack([old_counts, new_counts], format='csr')[row_order]
+        # the n-grams that no longer occur in any label are dropped, and the columns are sorted by n-gram (as done by
+        # CountVectorizer)
+        column_counts = np.bincount(counts.indices, minlength=len(vocabulary))
+        ngrams = sorted(ngram for ngram, column in vocabulary.items() if column_counts[column] > 0)
+        columns = np.fromiter((vocabulary[ngram] for ngram in ngrams), dtype=np.int64, count=len(ngrams))
+        index = copy.copy(self)
+        index.label_index = label_index
+        index.target_counts = counts[:, columns].tocsr()
+        index.target_counts.sort_indices()
+        index.vocabulary = {ngram: column for column, ngram in enumerate(ngrams)}
+        index._fit_target_matrix()
+        return index
+
+    def save(self, file_path):
+        with open(file_path, 'wb+') as out_file:
+            pickle.dump(self, out_file)
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, 'rb') as in_file:
+            return pickle.load(in_file)
+
+    def _fit_target_matrix(self):
+        """Compute the IDF weights of the target labels, and the transposed TF-IDF matrix of the target labels"""
+        transformer = TfidfTransformer()
+        target_mtx = transformer.fit_transform(self.target_counts)
+        self.idf = transformer.idf_
+        self.target_matrix = target_mtx.transpose().tocsr()
@@ -1,23 +1,34 @@
 """Provides TFIDFMapper class"""
 
 import logging
+import numpy as np
 import sparse_dot_topn as ct
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from text2term import onto_utils
-from text2term.term_mapping import TermMapping, TermMappingCollection
+from text2term.tfidf_index import TFIDFIndex
+from text2term.term_mapping import TermMappingCollection
+
+# Maximum number of target labels/synonyms scored at once; larger targets are scored in shards of this size
+TARGET_SHARD_SIZE = 250000
+
+# Number of candidate labels/synonyms initially retrieved for each source term, per requested mapping
+CANDIDATES_PER_MAPPING = 5
 
 
 class TFIDFMapper:
 
-    def __init__(self, target_ontology_terms):
+    def __init__(self, target_ontology_terms, index=None):
         """
         :param target_ontology_terms: Collection of ontology terms to be mapped against
+        :param index: TF-IDF index previously built for (a superset of) the given ontology terms, e.g. the index stored
+                        in the ontology cache. If not given, the index is built from the given ontology terms
         """
         self.logger = onto_utils.get_logger(__name__, logging.INFO)
         self.target_ontology_terms = target_ontology_terms
-        self.target_labels, self.target_terms = self._get_target_labels_terms(target_ontology_terms)
+        if index is None:
+            index = TFIDFIndex(target_ontology_terms)
+        self._set_index(index.subset(target_ontology_terms))
 
-    def map(self, source_terms, source_terms_ids, max_mappings=3, min_score=0.3, ngram_length=3):
+    def map(self, source_terms, source_terms_ids, max_mappings=3, min_score=0.3, ngram_length=3, n_jobs=1):
         """
         Main mapping function. Default settings return only the top candidate for every source string.
         :param source_terms: List of source terms to be mapped with ontology terms
@@ -26,70 +37,113 @@ class TFIDFMapper:
         :param min_score: The lower-bound threshold for keeping a candidate term mapping, between 0-1.
                             Default set to 0, so consider all candidates
         :param ngram_length: The gram length n for the string tokenizer
+        :param n_jobs: The number of threads used to compute the similarity scores (-1 to use all processors)
         """
+        if ngram_length != self.index.ngram_length:
+            self._set_index(TFIDFIndex(self.target_ontology_terms, ngram_length=ngram_length))
         source_terms_norm = onto_utils.normalize_list(source_terms)
-        vectorizer = self._tokenize(source_terms_norm, self.target_labels, n=ngram_length)
-        results_mtx = self._sparse_dot_top(vectorizer, source_terms_norm, self.target_labels, min_score)
-        results_df = self._get_mappings(results_mtx, max_mappings, source_terms, source_terms_ids, self.target_terms)
+        source_mtx = self.index.transform(source_terms_norm)
+        rows, terms, scores = self._get_top_terms(source_mtx, max_mappings, min_score, n_jobs=n_jobs)
+        results_df = self._get_mappings(rows, terms, scores, source_terms, source_terms_ids)
         return results_df
 
-    def _tokenize(self, source_terms, target_labels, analyzer='char_wb', n=3):
+    def get_candidates(self, source_terms, max_candidates, n_jobs=1):
         """
-        Tokenizes the (source) input strings and the target labels based on the selected analyzer
-        :param source_terms: List of source terms to be matched
-        :param target_labels: List of labels from ontology terms to be matched against
-        :param analyzer: Type of analyzer ('char_wb', 'word')
-        :param n: The gram length n (when using n-gram analyzer)
-        :return TF-IDF Vectorizer
+        Get the top 'max_candidates' ontology terms of each source term by TF-IDF score, e.g. to be rescored by another
+        (more expensive) similarity metric
+        :param source_terms: List of source terms
+        :param max_candidates: The maximum number of ontology terms retrieved per source term
+        :param n_jobs: The number of threads used to compute the similarity scores (-1 to use all processors)
+        :return: Pair of arrays of source term rows and ontology term IRIs, ordered by row and decreasing score
         """
-        # Create count vectorizer and fit it on both lists to get vocabulary
-        count_vectorizer = CountVectorizer(analyzer=analyzer, ngram_range=(n, n))
-        vocabulary = count_vectorizer.fit(source_terms + target_labels).vocabulary_
-        return TfidfVectorizer(vocabulary=vocabulary, analyzer=analyzer, ngram_range=(n, n))
+        source_mtx = self.index.transform(onto_utils.normalize_list(source_terms))
+        rows, terms, _ = self._get_top_terms(source_mtx, max_candidates, min_score=0, n_jobs=n_jobs)
+        return rows, self.target_term_iris[terms]
 
-    def _sparse_dot_top(self, vectorizer, source_terms, target_labels, min_score):
-        src_mtx = vectorizer.fit_transform(source_terms).tocsr()
-        tgt_mtx = vectorizer.fit_transform(target_labels).transpose().tocsr()
+    def _set_index(self, index):
+        self.index = index
+        self._target_shards = None
+        self.label_index = index.label_index
+        self.target_labels = self.label_index.labels
+        self.target_term_iris = np.asarray(self.label_index.term_iris, dtype=object)
+
+    def _get_top_terms(self, source_mtx, max_mappings, min_score, n_jobs=1):
+        """
+        Get the top 'max_mappings' ontology terms of each source term, where the score of an ontology term is the
+        maximum score of its labels/synonyms. Each source term is first scored against a budget of candidate labels
+        that scales with 'max_mappings'. Source terms whose candidates all came from fewer than 'max_mappings' distinct
+        ontology terms, while using up the budget, are scored again with a larger budget
+        :return: Arrays of source term rows, ontology term positions and scores, ordered by row and decreasing score
+        """
+        nr_labels = self.label_index.label_count
+        ntop = min(max_mappings * CANDIDATES_PER_MAPPING, max(nr_labels, 1))
+        rows_to_score = np.arange(source_mtx.shape[0])
+        top_rows, top_terms, top_scores = [], [], []
+        while True:
+            results_mtx = self._sparse_dot_top(source_mtx[rows_to_score], min_score, ntop, n_jobs=n_jobs)
+            rows, terms, scores = self._get_top_terms_of_rows(results_mtx, max_mappings)
+            nr_terms = np.bincount(rows, minlength=len(rows_to_score))
+            nr_candidates = np.diff(results_mtx.indptr)
+            incomplete = (nr_terms < max_mappings) & (nr_candidates >= ntop) & (ntop < nr_labels)
+            complete = ~incomplete[rows]
+            top_rows.append(rows_to_score[rows[complete]])
+            top_terms.append(terms[complete])
+            top_scores.append(scores[complete])
+            rows_to_score = rows_to_score[incomplete]
+            if len(rows_to_score) == 0:
+                break
+            ntop = min(ntop * 4, nr_labels)
+        rows, terms, scores = np.concatenate(top_rows), np.concatenate(top_terms), np.concatenate(top_scores)
+        order = np.argsort(rows, kind='stable')
+        return rows[order], terms[order], scores[order]
+
+    def _get_top_terms_of_rows(self, results_mtx, max_mappings):
+        """
+        Aggregate the label/synonym scores in the given results matrix into ontology term scores (i.e., the maximum
+        score of the labels/synonyms of each term), and keep the top 'max_mappings' ontology terms of each row
+        """
+        coo_mtx = results_mtx.tocoo()
+        # each distinct label/synonym may be owned by multiple ontology terms
+        positions, terms = self.label_index.label_terms(coo_mtx.col)
+        rows, scores = coo_mtx.row[positions], coo_mtx.data[positions]
+        # sort the candidates of each source term by decreasing score (stable, so ties keep their order)
+        order = np.lexsort((-scores, rows))
+        rows, terms, scores = rows[order], terms[order], scores[order]
+        # keep only the best scoring label/synonym of each ontology term mapped to by a source term
+        _, first_indices = np.unique(rows.astype(np.int64) * len(self.target_term_iris) + terms, return_index=True)
+        first_indices.sort()
+        rows, terms, scores = rows[first_indices], terms[first_indices], scores[first_indices]
+        # keep the top 'max_mappings' ontology terms of each source term
+        positions = np.arange(len(rows))
+        row_starts = np.maximum.accumulate(np.where(np.r_[True, rows[1:] != rows[:-1]], positions, 0))
+        top = (positions - row_starts) < max_mappings
+        return rows[top], terms[top], scores[top]
+
+    def _sparse_dot_top(self, source_mtx, min_score, ntop, n_jobs=1):
+        tgt_mtx = self.index.target_matrix
+        n_threads = onto_utils.get_thread_count(n_jobs)
         # 'ntop' specifies the maximum number of labels/synonyms that should be considered
         # multiple labels/synonyms in the 'ntop' matches may be from the same ontology term
-        return ct.awesome_cossim_topn(src_mtx, tgt_mtx, ntop=50, lower_bound=min_score)
+        # the source rows are split across the given number of threads. Large targets are also split into shards of
+        # target labels, whose top-n results are merged into the exact top-n results over all target labels
+        if tgt_mtx.shape[1] <= TARGET_SHARD_SIZE:
+            return ct.sp_matmul_topn(source_mtx, tgt_mtx, top_n=ntop, threshold=min_score, sort=True,
+                                     n_threads=n_threads)
+        shard_results = []
+        for shard_mtx in self._get_target_shards():
+            shard_results.append(ct.sp_matmul_topn(source_mtx, shard_mtx, top_n=ntop, threshold=min_score, sort=True,
+                                                   n_threads=n_threads))
+        return ct.zip_sp_matmul_topn(top_n=ntop, C_mats=shard_results)
 
-    def _get_mappings(self, results_mtx, max_mappings, source_terms, source_terms_ids, target_terms):
-        """ Build and return dataframe for mapping results along with term graphs for the obtained mappings """
-        coo_mtx = results_mtx.tocoo()
-        mappings = []
-        last_source_term = ""
-        top_mappings = set()
-        for row, col, score in zip(coo_mtx.row, coo_mtx.col, coo_mtx.data):
-            source_term = source_terms[row]
-            source_term_id = source_terms_ids[row]
-            onto_term = target_terms[col]
-            self.logger.debug("Source term: %s maps to %s (%f)", source_term, onto_term.label, score)
-            if source_term == last_source_term:
-                if len(top_mappings) == max_mappings:
-                    continue
-            else:
-                last_source_term = source_term
-                top_mappings.clear()
-            if onto_term.iri not in top_mappings:
-                mappings.append(TermMapping(source_term, source_term_id, onto_term.label, onto_term.iri, score))
-                top_mappings.add(onto_term.iri)
-        return TermMappingCollection(mappings).mappings_df()
+    def _get_target_shards(self):
+        if self._target_shards is None:
+            self.logger.debug("Splitting target labels into shards of %i labels", TARGET_SHARD_SIZE)
+            tgt_mtx = self.index.target_matrix.tocsc()
+            self._target_shards = [tgt_mtx[:, shard_start:shard_start + TARGET_SHARD_SIZE].tocsr()
+                                   for shard_start in range(0, tgt_mtx.shape[1], TARGET_SHARD_SIZE)]
+        return self._target_shards
 
-    def _get_target_labels_terms(self, ontology_terms):
-        """Get lists of labels and terms to enable retrieving terms from their labels"""
-        target_labels, target_terms = [], []
-        for term in ontology_terms.values():
-            for label in term.labels:
-                if not isinstance(label, str):
-                    self.logger.debug(f"ontology term label {label} is not a string")
-                else:
-                    target_labels.append(label)
-                    target_terms.append(term)
-            for synonym in term.synonyms:
-                if not isinstance(synonym, str):
-                    self.logger.debug(f"ontology term synonym {synonym} is not a string")
-                else:
-                    target_labels.append(synonym)
-                    target_terms.append(term)
-        return target_labels, target_terms
+    def _get_mappings(self, rows, terms, scores, source_terms, source_terms_ids):
+        """ Build and return dataframe for mapping results along with term graphs for the obtained mappings """
+        return TermMappingCollection.from_arrays(self.target_ontology_terms, source_terms, source_terms_ids, rows,
+                                                 self.target_term_iris[terms], scores)